@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Company, Vendor, Product, Quotation, OrderRequest, ComparisonResult
+from .models import Company, Vendor, Product, Quotation, OrderRequest, ComparisonResult, CompareJob
 
 
 @admin.register(Company)
@@ -42,3 +42,9 @@ class ComparisonResultAdmin(admin.ModelAdmin):
     list_display = ['order_request', 'vendor', 'rank', 'total_cost_per_unit', 'total_order_cost', 'score']
     search_fields = ['vendor__name']
     list_filter = ['rank', 'created_at']
+
+
+@admin.register(CompareJob)
+class CompareJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'total_lines', 'completed_lines', 'failed_lines', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
@@ -0,0 +1,344 @@
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+import numpy as np
+from .comparison import SURCHARGE_DENOMINATOR, SURCHARGE_NUMERATOR
+from .states import normalize_state
+from .sweep import COST_KEY_SCALE, CENT, _cents
+
+
+def _money(key):
+    return str((Decimal(int(key)) / COST_KEY_SCALE).quantize(CENT))
+
+
+class BasketOptimizer:
+    """
+    Assign a basket of order lines to vendors at the lowest total landed cost.
+
+    Lines bought from the same vendor ship together: a vendor's freight is the
+    largest (interstate-adjusted) delivery price among its assigned quotations,
+    instead of one delivery charge per line as in per-line ranking.
+
+    The solver starts from the per-line winners (exactly what ``compare_vendors``
+    would pick) and improves them with local search: single-line moves to the
+    cheapest vendor given current freight, whole-vendor closing moves that fold
+    a vendor's lines into vendors already shipping, and consolidation moves that
+    pull several lines into one vendor. A few seeded restarts then evict one
+    open vendor and descend again, keeping the best assignment. Costs are exact
+    integer keys (paise x 5), the same units as the ranking engines.
+    """
+
+    def __init__(self, lines, quotations, delivery_location, time_limit=2.0, max_passes=50, restarts=20):
+        self.lines = lines
+        self.quotations = quotations
+        self.delivery_state_normalized = normalize_state(delivery_location)
+        self.time_limit = time_limit
+        self.max_passes = max_passes
+        self.restarts = restarts
+
+    def _build_options(self):
+        by_product = defaultdict(list)
+        for position, quotation in enumerate(self.quotations):
+            by_product[quotation['product_id']].append(position)
+
+        self.vendor_ids = []
+        vendor_index = {}
+        for quotation in self.quotations:
+            if quotation['vendor_id'] not in vendor_index:
+                vendor_index[quotation['vendor_id']] = len(self.vendor_ids)
+                self.vendor_ids.append(quotation['vendor_id'])
+
+        interstate = np.array(
+            [q['vendor__state_normalized'] != self.delivery_state_normalized for q in self.quotations]
+        )
+        price_cents = _cents([q['product_price'] for q in self.quotations])
+        delivery_cents = _cents([q['delivery_price'] for q in self.quotations])
+        self.interstate = interstate
+        self.freight_keys = delivery_cents * np.where(interstate, SURCHARGE_NUMERATOR, SURCHARGE_DENOMINATOR)
+        lead_time = np.array([q['lead_time_days'] for q in self.quotations], dtype=np.int64)
+        vendors = np.array([vendor_index[q['vendor_id']] for q in self.quotations], dtype=np.int64)
+
+        # Per active line: candidate quotation positions, their vendors and item cost keys
+        self.active = []
+        self.unassigned = []
+        self.options = {}
+        for index, line in enumerate(self.lines):
+            positions = by_product.get(line['product_id'])
+            if not positions:
+                self.unassigned.append(index)
+                continue
+            positions = np.array(positions, dtype=np.int64)
+            item_keys = price_cents[positions] * line['order_qty'] * SURCHARGE_DENOMINATOR
+            freight = self.freight_keys[positions]
+            # Per-line winner uses compare_vendors ordering: cost, lead time, queryset order
+            best = np.lexsort((positions, lead_time[positions], item_keys + freight))[0]
+            self.options[index] = {
+                'positions': positions,
+                'vendors': vendors[positions],
+                'items': item_keys,
+                'freight': freight,
+                'per_line_best': int(best),
+            }
+            self.active.append(index)
+
+        # Per vendor: the (line, option) pairs it can serve, for consolidation moves
+        vendor_options = defaultdict(lambda: ([], []))
+        for line in self.active:
+            for option, vendor in enumerate(self.options[line]['vendors']):
+                lines, options = vendor_options[int(vendor)]
+                lines.append(line)
+                options.append(option)
+        self.vendor_options = {}
+        for vendor, (lines, options) in vendor_options.items():
+            self.vendor_options[vendor] = (
+                np.array(lines, dtype=np.int64),
+                np.array(options, dtype=np.int64),
+                np.array([self.options[l]['items'][o] for l, o in zip(lines, options)], dtype=np.int64),
+                np.array([self.options[l]['freight'][o] for l, o in zip(lines, options)], dtype=np.int64),
+            )
+
+    def _vendor_freight(self, vendor, exclude=None):
+        return max(
+            (self.options[line]['freight'][self.assign[line]]
+             for line in self.vendor_lines[vendor] if line != exclude),
+            default=0
+        )
+
+    def _move(self, line, option):
+        old_vendor = int(self.options[line]['vendors'][self.assign[line]])
+        new_vendor = int(self.options[line]['vendors'][option])
+        self.vendor_lines[old_vendor].discard(line)
+        self.assign[line] = option
+        self.vendor_lines[new_vendor].add(line)
+        self.freight[old_vendor] = self._vendor_freight(old_vendor)
+        self.freight[new_vendor] = self._vendor_freight(new_vendor)
+
+    def _improve_lines(self):
+        improved = False
+        for line in self.active:
+            opts = self.options[line]
+            current = self.assign[line]
+            vendor = int(opts['vendors'][current])
+            freight_without = self._vendor_freight(vendor, exclude=line)
+
+            base = self.freight[opts['vendors']]
+            base = np.where(opts['vendors'] == vendor, freight_without, base)
+            delta = (
+                opts['items'] - opts['items'][current]
+                + np.maximum(base, opts['freight']) - base
+                - (self.freight[vendor] - freight_without)
+            )
+            best = int(np.argmin(delta))
+            if delta[best] < 0:
+                self._move(line, best)
+                improved = True
+        return improved
+
+    def _close_vendors(self):
+        improved = False
+        open_vendors = sorted(
+            (v for v, lines in self.vendor_lines.items() if lines),
+            key=lambda v: -self.freight[v]
+        )
+        for vendor in open_vendors:
+            lines = list(self.vendor_lines[vendor])
+            if not lines:
+                continue
+            is_open = np.zeros(len(self.vendor_ids), dtype=bool)
+            is_open[[v for v, assigned in self.vendor_lines.items() if assigned and v != vendor]] = True
+            freight = self.freight.copy()
+            freight[vendor] = 0
+            delta = -int(self.freight[vendor])
+            moves = []
+            for line in lines:
+                opts = self.options[line]
+                allowed = is_open[opts['vendors']]
+                if not allowed.any():
+                    break
+                base = freight[opts['vendors']]
+                cost = opts['items'] + np.maximum(base, opts['freight']) - base
+                cost = np.where(allowed, cost, np.iinfo(np.int64).max)
+                best = int(np.argmin(cost))
+                delta += int(cost[best] - opts['items'][self.assign[line]])
+                target = int(opts['vendors'][best])
+                freight[target] = max(freight[target], opts['freight'][best])
+                moves.append((line, best))
+            else:
+                if delta < 0:
+                    for line, option in moves:
+                        self._move(line, option)
+                    improved = True
+        return improved
+
+    def _line_state(self):
+        """Current item cost, freight saved by leaving, and vendor of every line."""
+        line_count = len(self.lines)
+        current_items = np.zeros(line_count, dtype=np.int64)
+        removal_gain = np.zeros(line_count, dtype=np.int64)
+        current_vendor = np.full(line_count, -1, dtype=np.int64)
+        for line in self.active:
+            opts = self.options[line]
+            owner = int(opts['vendors'][self.assign[line]])
+            current_items[line] = opts['items'][self.assign[line]]
+            removal_gain[line] = self.freight[owner] - self._vendor_freight(owner, exclude=line)
+            current_vendor[line] = owner
+        return current_items, removal_gain, current_vendor
+
+    def _consolidate_into_vendors(self):
+        """
+        Pull lines into one vendor when the item and freight savings across
+        those lines outweigh the freight that vendor must then charge.
+        """
+        improved = False
+        line_state = None
+        for vendor, (lines, options, items, freights) in self.vendor_options.items():
+            if line_state is None:
+                line_state = self._line_state()
+            current_items, removal_gain, current_vendor = line_state
+
+            gains = current_items[lines] + removal_gain[lines] - items
+            gains = np.where(current_vendor[lines] == vendor, 0, np.maximum(gains, 0))
+            if not gains.any():
+                continue
+
+            # Try every freight threshold: take all profitable lines at or below it
+            order = np.argsort(freights, kind='stable')
+            cumulative = np.cumsum(gains[order])
+            current_freight = int(self.freight[vendor])
+            net = cumulative - (np.maximum(freights[order], current_freight) - current_freight)
+            best = int(np.argmax(net))
+            if net[best] <= 0:
+                continue
+
+            chosen = order[:best + 1]
+            chosen = chosen[gains[chosen] > 0]
+            before = self.total_key()
+            previous = {int(lines[i]): self.assign[int(lines[i])] for i in chosen}
+            for i in chosen:
+                self._move(int(lines[i]), int(options[i]))
+            if self.total_key() < before:
+                improved = True
+                line_state = None
+            else:
+                for line, option in previous.items():
+                    self._move(line, option)
+        return improved
+
+    def total_key(self):
+        items = sum(int(self.options[line]['items'][self.assign[line]]) for line in self.active)
+        return items + int(self.freight.sum())
+
+    def _load(self, assign):
+        self.assign = dict(assign)
+        self.freight = np.zeros(len(self.vendor_ids), dtype=np.int64)
+        self.vendor_lines = defaultdict(set)
+        for line in self.active:
+            vendor = int(self.options[line]['vendors'][self.assign[line]])
+            self.vendor_lines[vendor].add(line)
+        for vendor in list(self.vendor_lines):
+            self.freight[vendor] = self._vendor_freight(vendor)
+
+    def _evict(self, vendor):
+        """Perturbation: move every line off ``vendor`` to its cheapest alternative."""
+        for line in list(self.vendor_lines[vendor]):
+            opts = self.options[line]
+            base = self.freight[opts['vendors']]
+            cost = opts['items'] + np.maximum(base, opts['freight']) - base
+            cost = np.where(opts['vendors'] != vendor, cost, np.iinfo(np.int64).max)
+            best = int(np.argmin(cost))
+            if opts['vendors'][best] != vendor:
+                self._move(line, best)
+
+    def _descend(self, deadline):
+        passes = 0
+        while passes < self.max_passes and time.perf_counter() < deadline:
+            passes += 1
+            improved = self._improve_lines()
+            if not improved:
+                improved = self._close_vendors()
+            if not improved:
+                improved = self._consolidate_into_vendors()
+            if not improved:
+                break
+        return passes
+
+    def solve(self):
+        started = time.perf_counter()
+        deadline = started + self.time_limit
+        self._build_options()
+
+        self._load({line: self.options[line]['per_line_best'] for line in self.active})
+        per_line_key = sum(
+            int(self.options[line]['items'][self.assign[line]] + self.options[line]['freight'][self.assign[line]])
+            for line in self.active
+        )
+
+        passes = self._descend(deadline)
+        best_key, best_assign = self.total_key(), dict(self.assign)
+
+        # Iterated local search: evict an open vendor and descend again, keeping the best
+        rng = random.Random(0)
+        for _ in range(self.restarts):
+            open_vendors = sorted(v for v, assigned in self.vendor_lines.items() if assigned)
+            if len(open_vendors) < 2 or time.perf_counter() >= deadline:
+                break
+            self._evict(rng.choice(open_vendors))
+            passes += self._descend(deadline)
+            key = self.total_key()
+            if key < best_key:
+                best_key, best_assign = key, dict(self.assign)
+            else:
+                self._load(best_assign)
+
+        return self._result(per_line_key, best_key, passes, time.perf_counter() - started)
+
+    def _result(self, per_line_key, total_key, passes, elapsed):
+        lines = []
+        for index in self.active:
+            opts = self.options[index]
+            chosen = int(opts['positions'][self.assign[index]])
+            per_line = int(opts['positions'][opts['per_line_best']])
+            quotation = self.quotations[chosen]
+            lines.append({
+                'line': index,
+                'product_id': quotation['product_id'],
+                'order_qty': self.lines[index]['order_qty'],
+                'quotation': quotation['id'],
+                'vendor': quotation['vendor_id'],
+                'vendor_name': quotation['vendor__name'],
+                'product_cost': _money(opts['items'][self.assign[index]]),
+                'per_line_quotation': self.quotations[per_line]['id'],
+                'per_line_vendor': self.quotations[per_line]['vendor_id'],
+            })
+
+        vendors = []
+        for vendor, assigned in self.vendor_lines.items():
+            if not assigned:
+                continue
+            assigned = sorted(assigned)
+            position = int(self.options[assigned[0]]['positions'][self.assign[assigned[0]]])
+            items = sum(int(self.options[line]['items'][self.assign[line]]) for line in assigned)
+            vendors.append({
+                'vendor': self.vendor_ids[vendor],
+                'vendor_name': self.quotations[position]['vendor__name'],
+                'is_interstate': bool(self.interstate[position]),
+                'lines': assigned,
+                'product_cost': _money(items),
+                'freight': _money(self.freight[vendor]),
+                'total_cost': _money(items + int(self.freight[vendor])),
+            })
+        vendors.sort(key=lambda v: v['lines'][0])
+
+        savings = per_line_key - total_key
+        return {
+            'lines': lines,
+            'vendors': vendors,
+            'unassigned': self.unassigned,
+            'total_cost': _money(total_key),
+            'per_line_total_cost': _money(per_line_key),
+            'savings': _money(savings),
+            'savings_percent': round(savings * 100 / per_line_key, 2) if per_line_key else 0.0,
+            'passes': passes,
+            'solve_time_ms': round(elapsed * 1000, 2),
+        }
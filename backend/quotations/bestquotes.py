@@ -0,0 +1,153 @@
+import threading
+from itertools import islice
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from .conditional import bump_model_version
+from .models import Product, ProductBestQuote, Quotation
+
+
+# Products recomputed per ranking query
+REFRESH_CHUNK_SIZE = 500
+
+def _chunks(values, size):
+    values = iter(values)
+    while chunk := list(islice(values, size)):
+        yield chunk
+
+
+def _top_two(product_ids):
+    """
+    The two cheapest quotations by landing price per product, ties going to
+    the newest like the compare ranking, plus each product's quotation count.
+    One window-function query for the whole chunk.
+    """
+    ranked = Quotation.objects.filter(
+        product_id__in=product_ids,
+        vendor__company_id=F('product__company_id'),
+        landing_price__isnull=False
+    ).annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=[F('product_id')],
+            order_by=[F('landing_price').asc(), F('created_at').desc(), F('id').desc()]
+        ),
+        quotation_count=Window(expression=Count('id'), partition_by=[F('product_id')]),
+    ).filter(position__lte=2).order_by('product_id', 'position').values(
+        'product_id', 'id', 'vendor_id', 'landing_price', 'product_price', 'lead_time_days', 'quotation_count'
+    )
+
+    top = {}
+    for row in ranked:
+        top.setdefault(row['product_id'], []).append(row)
+    return top
+
+
+def _best_quote(product_id, company_id, rows):
+    best = rows[0]
+    runner_up = rows[1] if len(rows) > 1 else {}
+    return ProductBestQuote(
+        product_id=product_id,
+        company_id=company_id,
+        best_quotation_id=best['id'],
+        best_vendor_id=best['vendor_id'],
+        best_landing_price=best['landing_price'],
+        best_product_price=best['product_price'],
+        best_lead_time_days=best['lead_time_days'],
+        runner_up_quotation_id=runner_up.get('id'),
+        runner_up_vendor_id=runner_up.get('vendor_id'),
+        runner_up_landing_price=runner_up.get('landing_price'),
+        runner_up_product_price=runner_up.get('product_price'),
+        runner_up_lead_time_days=runner_up.get('lead_time_days'),
+        quotation_count=best['quotation_count'],
+    )
+
+
+def refresh_best_quotes(product_ids):
+    """
+    Recompute the best-quote rows of the given products. Products without a
+    priced quotation, or that no longer exist, lose their row. Returns the
+    number of rows written.
+    """
+    written = 0
+    for chunk in _chunks(sorted(set(product_ids)), REFRESH_CHUNK_SIZE):
+        companies = dict(Product.objects.filter(id__in=chunk).values_list('id', 'company_id'))
+        top = _top_two(list(companies))
+        rows = [
+            _best_quote(product_id, companies[product_id], top[product_id])
+            for product_id in companies if product_id in top
+        ]
+        with transaction.atomic():
+            ProductBestQuote.objects.filter(product_id__in=chunk).exclude(product_id__in=top).delete()
+            ProductBestQuote.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=[
+                    field.name for field in ProductBestQuote._meta.concrete_fields if not field.primary_key
+                ]
+            )
+        written += len(rows)
+    bump_model_version(ProductBestQuote)
+    return written
+
+
+class _PendingRefresh:
+    """Products and quotations touched in one transaction, refreshed once at commit."""
+
+    def __init__(self):
+        self.product_ids = set()
+        self.quotation_ids = set()
+
+    def __call__(self):
+        _refresh_affected(self.product_ids, self.quotation_ids)
+
+
+_pending = threading.local()
+
+
+def _refresh_affected(product_ids, quotation_ids):
+    ids = set(product_ids)
+    # Products whose best or runner-up is one of the quotations, which covers
+    # a quotation moved to another product or deleted
+    for chunk in _chunks(sorted(quotation_ids), REFRESH_CHUNK_SIZE):
+        ids.update(ProductBestQuote.objects.filter(
+            Q(best_quotation_id__in=chunk) | Q(runner_up_quotation_id__in=chunk)
+        ).values_list('product_id', flat=True))
+    if ids:
+        refresh_best_quotes(ids)
+
+
+def schedule_best_quote_refresh(product_ids, quotation_id=None):
+    """
+    Refresh the given products' best quotes once the current transaction
+    commits. With ``quotation_id``, products whose best or runner-up is that
+    quotation are refreshed too.
+
+    Every call within one transaction adds to a single pending refresh, so
+    a cascade deleting many quotations recomputes each product once.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _refresh_affected(product_ids, [] if quotation_id is None else [quotation_id])
+        return
+    pending = getattr(_pending, 'refresh', None)
+    # A committed or rolled-back transaction took its callback with it
+    if pending is None or not any(func is pending for _, func, _ in connection.run_on_commit):
+        pending = _pending.refresh = _PendingRefresh()
+        transaction.on_commit(pending)
+    pending.product_ids.update(product_ids)
+    if quotation_id is not None:
+        pending.quotation_ids.add(quotation_id)
+
+
+def rebuild_best_quotes(company_id=None):
+    """Recompute the whole table (or one company's rows). Returns the rows written."""
+    products = Product.objects.order_by('id')
+    existing = ProductBestQuote.objects.all()
+    if company_id is not None:
+        products = products.filter(company_id=company_id)
+        existing = existing.filter(company_id=company_id)
+    # Rows of deleted products are never reached by the refresh below
+    existing.exclude(product__in=products).delete()
+    return refresh_best_quotes(products.values_list('id', flat=True).iterator(chunk_size=REFRESH_CHUNK_SIZE))
@@ -0,0 +1,507 @@
+import csv
+import io
+import time
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from .models import Quotation, Vendor, Product
+from .signals import quotations_bulk_changed
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # optional dependency; XLSX uploads are refused without it
+    load_workbook = None
+
+
+# Quotation columns taken from input rows; landing prices are always recomputed
+VALUE_FIELDS = ('product_price', 'quantity', 'delivery_price', 'kilo_price', 'grade_spec', 'lead_time_days')
+
+# Value columns a new quotation cannot do without (NOT NULL, no default)
+REQUIRED_FIELDS = tuple(
+    name for name in VALUE_FIELDS
+    if not Quotation._meta.get_field(name).null and not Quotation._meta.get_field(name).has_default()
+)
+
+UPDATE_FIELDS = VALUE_FIELDS + ('total_landing_price', 'landing_price', 'updated_at')
+
+# Everything a PATCH item may change
+PATCH_FIELDS = UPDATE_FIELDS + ('vendor', 'product', 'product_group')
+
+# Vendor/product pairs per upsert lookup query, well inside SQLite's expression depth limit
+MATCH_CHUNK_SIZE = 200
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _name_key(value):
+    return str(value).strip().lower()
+
+
+def _id_key(value):
+    # Spreadsheets hand back whole numbers as floats
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def update_rows(quotations, fields):
+    """
+    Write ``fields`` of existing quotations with one parametrized UPDATE run
+    through ``executemany``.
+
+    QuerySet.bulk_update builds a CASE expression per field over the whole
+    batch, which costs milliseconds per row to compile; the plain statement
+    is prepared once. Values go through the model fields' own adaptation.
+    """
+    meta = Quotation._meta
+    columns = [meta.get_field(name) for name in fields]
+    quote_name = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote_name(meta.db_table),
+        ', '.join(f'{quote_name(field.column)} = %s' for field in columns),
+        quote_name(meta.pk.column)
+    )
+    params = [
+        [field.get_db_prep_save(getattr(quotation, field.attname), connection) for field in columns] + [quotation.pk]
+        for quotation in quotations
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+class RowErrors(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class ReferenceMaps:
+    """
+    In-memory vendor and product lookups for one company.
+
+    References are resolved a batch at a time: only ids and names not seen
+    before are queried, so each distinct vendor or product costs one lookup
+    per import, however many rows use it. ``product_groups`` maps each
+    resolved product to its group, which quotations copy.
+    """
+
+    def __init__(self, company_id):
+        self.company_id = company_id
+        self.vendor_ids, self.vendor_names = {}, {}
+        self.product_ids, self.product_names = {}, {}
+        self.product_groups = {}
+
+    def load(self, rows):
+        wanted = {label: (set(), set()) for label in ('vendor', 'product')}
+        for row in rows:
+            for label, (ids, names) in wanted.items():
+                if not _blank(row.get(label)):
+                    ids.add(_id_key(row[label]))
+                elif not _blank(row.get(f'{label}_name')):
+                    names.add(_name_key(row[f'{label}_name']))
+
+        for label, model in (('vendor', Vendor), ('product', Product)):
+            ids, names = wanted[label]
+            found_ids, found_names = self._maps(label)
+            self._load_ids(model, ids, found_ids)
+            self._load_names(model, names, found_names)
+        self._load_product_groups()
+
+    def _load_product_groups(self):
+        products = {pk for pk in self.product_ids.values() if pk is not None}
+        products.update(pk for matches in self.product_names.values() for pk in matches)
+        missing = products - self.product_groups.keys()
+        if missing:
+            self.product_groups.update(
+                Product.objects.filter(pk__in=missing).values_list('pk', 'product_group_id')
+            )
+
+    def _maps(self, label):
+        if label == 'vendor':
+            return self.vendor_ids, self.vendor_names
+        return self.product_ids, self.product_names
+
+    def _load_ids(self, model, ids, found):
+        missing = [value for value in ids if value not in found]
+        if not missing:
+            return
+        for value in missing:
+            found[value] = None
+        numeric = [int(value) for value in missing if value.isdigit()]
+        for pk in model.objects.filter(company_id=self.company_id, pk__in=numeric).values_list('pk', flat=True):
+            found[str(pk)] = pk
+
+    def _load_names(self, model, names, found):
+        missing = [value for value in names if value not in found]
+        if not missing:
+            return
+        for value in missing:
+            found[value] = []
+        rows = model.objects.filter(company_id=self.company_id).annotate(
+            name_key=Lower('name')
+        ).filter(name_key__in=missing).values_list('name_key', 'pk')
+        for key, pk in rows:
+            found[key].append(pk)
+
+    def resolve(self, row, label):
+        """Return the company-owned pk that ``row`` references as ``label``, or raise RowErrors."""
+        ids, names = self._maps(label)
+        if not _blank(row.get(label)):
+            pk = ids.get(_id_key(row[label]))
+            if pk is None:
+                raise RowErrors({label: [f"No {label} with id {row[label]} in this company"]})
+            return pk
+        if not _blank(row.get(f'{label}_name')):
+            matches = names.get(_name_key(row[f'{label}_name']), [])
+            if len(matches) == 1:
+                return matches[0]
+            if not matches:
+                raise RowErrors({f'{label}_name': [f"No {label} named {row[f'{label}_name']!r} in this company"]})
+            raise RowErrors({f'{label}_name': [f"{len(matches)} {label}s are named {row[f'{label}_name']!r}; use the {label} id"]})
+        raise RowErrors({label: [f"Either {label} or {label}_name is required"]})
+
+
+def clean_values(row, fields=VALUE_FIELDS, required=()):
+    """
+    Convert the quotation value columns of ``row`` with the model fields, or
+    raise RowErrors. Columns in ``required`` must be present.
+    """
+    values, errors = {}, {}
+    for name in fields:
+        if name not in row:
+            if name in required:
+                errors[name] = ["This field is required."]
+            continue
+        field = Quotation._meta.get_field(name)
+        raw = row[name]
+        if _blank(raw):
+            raw = None
+        elif isinstance(raw, str):
+            raw = raw.strip()
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    if errors:
+        raise RowErrors(errors)
+    return values
+
+
+class QuotationBatchWriter:
+    """
+    Validate and write quotation rows in batches.
+
+    Rows are plain dicts (CSV/XLSX lines or JSON items) that reference the
+    vendor and product by id (``vendor``/``product``) or by name
+    (``vendor_name``/``product_name``). Each batch resolves its references
+    through ReferenceMaps, converts values with the model fields, computes
+    landing prices in Python and writes with ``bulk_create`` (and
+    update_rows for upserts). ``quotations_bulk_changed`` is sent per
+    batch, since bulk writes skip the post_save receivers.
+
+    ``mode='upsert'`` updates the newest quotation for the same vendor and
+    product instead of adding another one; of several rows for one pair in
+    a batch the last is kept and the others count as ``superseded``.
+    ``mode='update'`` patches existing quotations named by ``id`` with the
+    fields each row carries.
+
+    Errors are reported by ``position_label`` (spreadsheet ``row``, or
+    list ``index`` for JSON payloads). With ``keep_ids`` the written
+    primary keys are kept in ``written_ids``, in input order.
+    """
+
+    def __init__(self, company_id, mode='create', batch_size=None, max_errors=None,
+                 position_label='row', keep_ids=False):
+        self.company_id = company_id
+        self.mode = mode
+        self.position_label = position_label
+        self.written_ids = [] if keep_ids else None
+        self.batch_size = batch_size or settings.QUOTATION_IMPORT['BATCH_SIZE']
+        self.max_errors = max_errors if max_errors is not None else settings.QUOTATION_IMPORT['MAX_ERRORS']
+        self.references = ReferenceMaps(company_id)
+        self.rows = self.created = self.updated = self.failed = self.superseded = 0
+        self.errors = []
+        self.rolled_back = False
+        self.started = time.perf_counter()
+
+    def write(self, rows):
+        """Validate and write ``(row_number, row)`` pairs, one batch at a time."""
+        batch = []
+        for item in rows:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+
+    def write_batch(self, batch):
+        self.rows += len(batch)
+        self.references.load(row for _, row in batch if isinstance(row, dict))
+        if self.mode == 'update':
+            return self._update_batch(batch)
+
+        pending = {}
+        for number, row in batch:
+            try:
+                quotation = self._build(row)
+            except RowErrors as exc:
+                self.add_error(number, exc.errors)
+                continue
+            # Within a batch a later row for the same vendor and product wins in upsert mode
+            key = (quotation.vendor_id, quotation.product_id) if self.mode == 'upsert' else number
+            if key in pending:
+                self.superseded += 1
+            pending[key] = quotation
+
+        quotations = list(pending.values())
+        if not quotations:
+            return
+        updates = self._match_existing(quotations) if self.mode == 'upsert' else []
+        creates = [quotation for quotation in quotations if quotation.pk is None]
+
+        with transaction.atomic():
+            if creates:
+                Quotation.objects.bulk_create(creates, batch_size=self.batch_size)
+            if updates:
+                update_rows(updates, UPDATE_FIELDS)
+            # Receivers write in the same transaction as the rows
+            quotations_bulk_changed.send(
+                sender=Quotation, created=creates, updated=updates,
+                product_ids={quotation.product_id for quotation in quotations}
+            )
+        self.created += len(creates)
+        self.updated += len(updates)
+        if self.written_ids is not None:
+            self.written_ids.extend(quotation.pk for quotation in quotations)
+
+    def _update_batch(self, batch):
+        ids = [
+            int(_id_key(row['id'])) for _, row in batch
+            if isinstance(row, dict) and not _blank(row.get('id')) and _id_key(row['id']).isdigit()
+        ]
+        # One query loads every quotation the batch patches, scoped to the company's vendors
+        existing = Quotation.objects.filter(vendor__company_id=self.company_id).in_bulk(ids)
+        # A patch can move a quotation to another product; both products change
+        product_ids = {quotation.pk: {quotation.product_id} for quotation in existing.values()}
+
+        now = timezone.now()
+        changed = {}
+        for number, row in batch:
+            try:
+                quotation = self._patch(row, existing)
+            except RowErrors as exc:
+                self.add_error(number, exc.errors)
+                continue
+            product_ids[quotation.pk].add(quotation.product_id)
+            quotation.updated_at = now
+            changed[quotation.pk] = quotation
+            if self.written_ids is not None:
+                self.written_ids.append(quotation.pk)
+        if not changed:
+            return
+
+        updates = list(changed.values())
+        with transaction.atomic():
+            update_rows(updates, PATCH_FIELDS)
+            quotations_bulk_changed.send(
+                sender=Quotation, created=[], updated=updates,
+                product_ids=set().union(*(product_ids[pk] for pk in changed))
+            )
+        self.updated += len(updates)
+
+    def _patch(self, row, existing):
+        if not isinstance(row, dict):
+            raise RowErrors({'non_field_errors': ["Expected an object"]})
+        if _blank(row.get('id')):
+            raise RowErrors({'id': ["This field is required."]})
+        quotation = existing.get(int(_id_key(row['id']))) if _id_key(row['id']).isdigit() else None
+        if quotation is None:
+            raise RowErrors({'id': [f"No quotation with id {row['id']} in this company"]})
+
+        errors, references = {}, {}
+        for label in ('vendor', 'product'):
+            if label in row or f'{label}_name' in row:
+                try:
+                    references[f'{label}_id'] = self.references.resolve(row, label)
+                except RowErrors as exc:
+                    errors.update(exc.errors)
+        try:
+            values = clean_values(row)
+        except RowErrors as exc:
+            errors.update(exc.errors)
+        if errors:
+            raise RowErrors(errors)
+
+        if 'product_id' in references:
+            references['product_group_id'] = self.references.product_groups[references['product_id']]
+        for name, value in {**references, **values}.items():
+            setattr(quotation, name, value)
+        quotation.calculate_landing_prices()
+        return quotation
+
+    def _build(self, row):
+        if not isinstance(row, dict):
+            raise RowErrors({'non_field_errors': ["Expected an object"]})
+        errors = {}
+        references = {}
+        for label in ('vendor', 'product'):
+            try:
+                references[f'{label}_id'] = self.references.resolve(row, label)
+            except RowErrors as exc:
+                errors.update(exc.errors)
+        try:
+            # Created and upserted rows are whole quotations
+            values = clean_values(row, required=REQUIRED_FIELDS)
+        except RowErrors as exc:
+            errors.update(exc.errors)
+        if errors:
+            raise RowErrors(errors)
+
+        quotation = Quotation(
+            company_id=self.company_id,
+            product_group_id=self.references.product_groups[references['product_id']],
+            **references, **values
+        )
+        quotation.calculate_landing_prices()
+        return quotation
+
+    def _match_existing(self, quotations):
+        by_key = {(quotation.vendor_id, quotation.product_id): quotation for quotation in quotations}
+        keys = list(by_key)
+        now = timezone.now()
+        matched = []
+        # Exact (vendor, product) pairs; vendor IN x product IN would match their cross product
+        for start in range(0, len(keys), MATCH_CHUNK_SIZE):
+            pairs = Q()
+            for vendor_id, product_id in keys[start:start + MATCH_CHUNK_SIZE]:
+                pairs |= Q(vendor_id=vendor_id, product_id=product_id)
+            existing = Quotation.objects.filter(pairs).order_by(
+                'vendor_id', 'product_id', '-created_at', '-id'
+            ).values_list('vendor_id', 'product_id', 'id', 'created_at')
+            for vendor_id, product_id, pk, created_at in existing:
+                quotation = by_key[(vendor_id, product_id)]
+                if quotation.pk is None:
+                    # Rows come newest first, so the first hit per pair is the one updated
+                    quotation.pk, quotation.created_at, quotation.updated_at = pk, created_at, now
+                    matched.append(quotation)
+        return matched
+
+    def add_error(self, position, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({self.position_label: position, 'errors': errors})
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'superseded': self.superseded,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'rolled_back': self.rolled_back,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows / elapsed, 1) if elapsed else None,
+        }
+
+
+class UnreadableFile(Exception):
+    pass
+
+
+def read_rows(file, filename):
+    """
+    Yield ``(row_number, row)`` pairs from an uploaded CSV or XLSX file
+    without loading it whole; row numbers match the spreadsheet (header is 1).
+    """
+    if filename.lower().endswith('.xlsx'):
+        if load_workbook is None:
+            raise UnreadableFile("XLSX import needs openpyxl (pip install openpyxl); upload a CSV instead")
+        return _read_xlsx(file)
+    return _read_csv(file)
+
+
+def _read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        for number, row in enumerate(csv.DictReader(text), start=2):
+            yield number, {key.strip(): value for key, value in row.items() if key}
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise UnreadableFile(f"Unreadable CSV: {exc}")
+    finally:
+        # Leave the underlying upload open for its owner
+        text.detach()
+
+
+def _read_xlsx(file):
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as exc:
+        raise UnreadableFile(f"Unreadable XLSX: {exc}")
+    try:
+        lines = workbook.active.iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else None for name in next(lines, ())]
+        for number, line in enumerate(lines, start=2):
+            if all(value is None for value in line):
+                continue
+            yield number, {name: value for name, value in zip(header, line) if name}
+    finally:
+        workbook.close()
+
+
+def import_quotations(file, filename, company_id, mode='create', atomic=False, batch_size=None):
+    """
+    Import a CSV/XLSX price list and return the writer's report.
+
+    Valid rows are written and invalid ones reported, unless ``atomic`` is
+    set: then any invalid row rolls the whole import back. A file that stops
+    parsing part way is reported as an error on ``row: null``; batches
+    before it stay written unless ``atomic`` is set.
+    """
+    writer = QuotationBatchWriter(company_id, mode=mode, batch_size=batch_size)
+    _run(writer, lambda: _write_file(writer, file, filename), atomic)
+    return writer.report()
+
+
+def write_items(company_id, items, mode='create', partial=False):
+    """
+    Create (``mode='create'``) or patch (``mode='update'``) quotations from a
+    list of JSON objects and return the writer, whose ``written_ids`` list
+    the written rows.
+
+    All-or-nothing by default; ``partial`` keeps the valid items.
+    """
+    writer = QuotationBatchWriter(company_id, mode=mode, position_label='index', keep_ids=True)
+    _run(writer, lambda: writer.write(enumerate(items)), atomic=not partial)
+    return writer
+
+
+def _run(writer, write, atomic):
+    if not atomic:
+        # Each batch commits on its own, so a long import holds no long transaction
+        write()
+        return
+
+    with transaction.atomic():
+        write()
+        if writer.failed:
+            transaction.set_rollback(True)
+            writer.rolled_back = True
+            writer.created = writer.updated = 0
+            if writer.written_ids is not None:
+                writer.written_ids.clear()
+
+
+def _write_file(writer, file, filename):
+    try:
+        writer.write(read_rows(file, filename))
+    except UnreadableFile as exc:
+        writer.add_error(None, {'file': [str(exc)]})
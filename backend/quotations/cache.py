@@ -0,0 +1,83 @@
+import threading
+import time
+from urllib.parse import quote
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+COMPARE_CACHE_ALIAS = 'compare'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _compare_cache():
+    return caches[COMPARE_CACHE_ALIAS]
+
+
+def _version_key(product_id):
+    return f'compare:version:{product_id}'
+
+
+def quotation_version(product_id):
+    """
+    Current quotation version for a product. Missing counters start from a
+    timestamp so an evicted counter can never reuse an older version.
+    """
+    cache = _compare_cache()
+    key = _version_key(product_id)
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def bump_quotation_versions(product_ids):
+    """
+    Invalidate cached comparisons for the given products once the current
+    transaction commits. Bumping earlier would let a concurrent compare cache
+    the rows from before the commit under the new version.
+    """
+    product_ids = set(product_ids)
+
+    def bump():
+        cache = _compare_cache()
+        for product_id in product_ids:
+            key = _version_key(product_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def _ranking_key(product_id, order_qty, delivery_state, top_k, offset):
+    version = quotation_version(product_id)
+    # Quote the state so keys stay valid on memcached-style backends
+    return (
+        f'compare:ranking:{product_id}:{version}:{order_qty}:{quote(delivery_state)}'
+        f':{top_k or "all"}:{offset}'
+    )
+
+
+def get_cached_ranking(product_id, order_qty, delivery_state, top_k=None, offset=0):
+    """Return the cached (results, total_ranked) for a compare, or None on a miss."""
+    result = _compare_cache().get(_ranking_key(product_id, order_qty, delivery_state, top_k, offset))
+    with _stats_lock:
+        _stats['hits' if result is not None else 'misses'] += 1
+    return result
+
+
+def set_cached_ranking(product_id, order_qty, delivery_state, top_k, offset, ranking):
+    _compare_cache().set(
+        _ranking_key(product_id, order_qty, delivery_state, top_k, offset),
+        ranking,
+        timeout=settings.COMPARE_CACHE_TIMEOUT
+    )
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
@@ -0,0 +1,397 @@
+import heapq
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import BigIntegerField, BooleanField, Case, Count, DecimalField, ExpressionWrapper, F, Func, Q, Value, When, Window
+from django.db.models.functions import Cast, Rank, Round
+from rest_framework import serializers
+from .models import ComparisonResult, OrderRequest, Product, Quotation
+from .cache import get_cached_ranking, set_cached_ranking
+from .conditional import bump_model_version
+from .states import normalize_state
+
+
+# Interstate deliveries carry a 20% shipping surcharge on the quoted delivery price
+INTERSTATE_SURCHARGE = Decimal('1.20')
+
+# Surcharge as an exact integer ratio (6/5) for the integer ranking key
+SURCHARGE_NUMERATOR = 6
+SURCHARGE_DENOMINATOR = 5
+
+# Output type for computed costs; wide enough for total order costs on SQLite too
+COST_FIELD = DecimalField(max_digits=28, decimal_places=6)
+
+
+def rank_quotations(quotations, order_qty, delivery_location, top_k=None, offset=0):
+    """
+    Rank quotations for a single order line.
+
+    Quotations without a delivery price or lead time are skipped. Returns a tuple
+    of (results, total_ranked) where results are dicts sorted by best value, each
+    carrying its ``rank`` and ``score``. With ``top_k`` only ranks
+    ``offset + 1 .. offset + top_k`` are kept, selected with a bounded heap.
+    """
+    comparison_results = []
+
+    # Vendor states are normalized on save, so only the destination needs normalizing
+    delivery_state_normalized = normalize_state(delivery_location)
+
+    for quotation in quotations:
+        # Skip quotations that don't have complete data for comparison
+        if quotation.delivery_price is None or quotation.lead_time_days is None:
+            continue
+
+        base_delivery_price = quotation.delivery_price
+
+        # Check if it's interstate delivery (vendor state != delivery state)
+        if quotation.vendor.state_normalized != delivery_state_normalized:
+            adjusted_delivery_price = base_delivery_price * INTERSTATE_SURCHARGE
+            is_interstate = True
+        else:
+            # Local delivery - use base price
+            adjusted_delivery_price = base_delivery_price
+            is_interstate = False
+
+        delivery_per_unit = adjusted_delivery_price / Decimal(order_qty)
+        total_cost_per_unit = quotation.product_price + delivery_per_unit
+        total_order_cost = total_cost_per_unit * Decimal(order_qty)
+
+        comparison_results.append({
+            'quotation': quotation,
+            'total_cost_per_unit': total_cost_per_unit,
+            'total_order_cost': total_order_cost,
+            'lead_time_days': quotation.lead_time_days,
+            'is_interstate': is_interstate,
+            'base_delivery_price': base_delivery_price,
+            'adjusted_delivery_price': adjusted_delivery_price
+        })
+
+    # Sort by: 1st Total Landing Price, 2nd Landing Price per kg, 3rd Lead Time
+    def sort_key(x):
+        return (
+            float(x['total_order_cost']),      # 1st priority: Total Landing Price (lowest wins)
+            float(x['total_cost_per_unit']),   # 2nd priority: Landing Price per kg (lowest wins)
+            x['lead_time_days']                # 3rd priority: Lead Time (shortest wins)
+        )
+
+    total_ranked = len(comparison_results)
+    if top_k is None:
+        comparison_results.sort(key=sort_key)
+        comparison_results = comparison_results[offset:]
+    else:
+        # nsmallest is stable like sort(), so ties keep the same order
+        comparison_results = heapq.nsmallest(offset + top_k, comparison_results, key=sort_key)[offset:]
+
+    for rank, result in enumerate(comparison_results, start=offset + 1):
+        # Calculate score for historical tracking (lower is better)
+        # Priority: Total Landing Price > Landing Price per kg > Lead Time
+        result['score'] = float(result['total_order_cost']) + float(result['total_cost_per_unit']) + (result['lead_time_days'] * 0.01)
+        result['rank'] = rank
+
+    return comparison_results, total_ranked
+
+
+class ExactDivide(Func):
+    """
+    Decimal division that does not truncate on SQLite, where whole-number
+    decimals are stored as integers and ``/`` would do integer division.
+    """
+    arg_joiner = ' / '
+    template = '(%(expressions)s)'
+    output_field = COST_FIELD
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='(1.0 * %(expressions)s)', **extra_context)
+
+
+def _cents(field_name):
+    return Cast(Round(F(field_name) * 100), BigIntegerField())
+
+
+def ranked_quotations_queryset(quotations, order_qty, delivery_location, tiebreak=('created_at', 'id')):
+    """
+    Annotate a Quotation queryset with order costs, the interstate surcharge
+    and a window-function rank for a single order line, ordered by rank.
+
+    Any queryset with the quotation value fields and a ``vendor`` relation
+    works (price history rows too); ``tiebreak`` names its creation time and
+    id fields, newest first breaking ties.
+    """
+    created_field, id_field = tiebreak
+    delivery_state_normalized = normalize_state(delivery_location)
+    local = Q(vendor__state_normalized=delivery_state_normalized)
+
+    return quotations.filter(
+        delivery_price__isnull=False,
+        lead_time_days__isnull=False
+    ).annotate(
+        is_interstate=Case(When(local, then=Value(False)), default=Value(True), output_field=BooleanField()),
+        adjusted_delivery_price=Case(
+            When(local, then=F('delivery_price')),
+            default=F('delivery_price') * Value(INTERSTATE_SURCHARGE),
+            output_field=COST_FIELD
+        ),
+        # Total order cost scaled to integer units (paise x 5) so ties are exact on
+        # every backend; with a fixed quantity it also orders the per-unit cost
+        cost_key=ExpressionWrapper(
+            _cents('product_price') * Value(order_qty * SURCHARGE_DENOMINATOR)
+            + _cents('delivery_price') * Case(
+                When(local, then=Value(SURCHARGE_DENOMINATOR)),
+                default=Value(SURCHARGE_NUMERATOR)
+            ),
+            output_field=BigIntegerField()
+        ),
+    ).annotate(
+        total_order_cost=ExpressionWrapper(
+            F('product_price') * Value(order_qty) + F('adjusted_delivery_price'),
+            output_field=COST_FIELD
+        ),
+        total_cost_per_unit=ExpressionWrapper(
+            F('product_price') + ExactDivide(F('adjusted_delivery_price'), Value(order_qty)),
+            output_field=COST_FIELD
+        ),
+        # Sort by: 1st Total Landing Price, 2nd Landing Price per kg, 3rd Lead Time,
+        # then the queryset's newest-first order like the stable Python sort
+        rank=Window(
+            expression=Rank(),
+            order_by=[
+                F('cost_key').asc(),
+                F('lead_time_days').asc(),
+                F(created_field).desc(),
+                F(id_field).desc(),
+            ]
+        ),
+        total_ranked=Window(expression=Count('id')),
+    ).order_by('rank')
+
+
+def rank_quotations_in_db(quotations, order_qty, delivery_location, top_k=None, offset=0,
+                          tiebreak=('created_at', 'id')):
+    """
+    Rank a Quotation queryset for a single order line inside the database.
+
+    Costs, the interstate surcharge and the rank are computed with annotations
+    and a window function, so only the ranked rows are materialized. ``top_k``
+    and ``offset`` become a LIMIT/OFFSET on the ranked query. Returns the same
+    (results, total_ranked) tuple as ``rank_quotations``.
+    """
+    queryset = ranked_quotations_queryset(quotations, order_qty, delivery_location, tiebreak)
+
+    if top_k is not None:
+        ranked = list(queryset[offset:offset + top_k])
+    else:
+        ranked = list(queryset[offset:])
+
+    if ranked:
+        total_ranked = ranked[0].total_ranked
+    else:
+        total_ranked = queryset.count() if offset else 0
+
+    comparison_results = []
+    for quotation in ranked:
+        base_delivery_price = quotation.delivery_price
+        adjusted_delivery_price = (
+            base_delivery_price * INTERSTATE_SURCHARGE if quotation.is_interstate else base_delivery_price
+        )
+        comparison_results.append({
+            'quotation': quotation,
+            'total_cost_per_unit': quotation.total_cost_per_unit,
+            'total_order_cost': quotation.total_order_cost,
+            'lead_time_days': quotation.lead_time_days,
+            'is_interstate': quotation.is_interstate,
+            'base_delivery_price': base_delivery_price,
+            'adjusted_delivery_price': adjusted_delivery_price,
+            'score': float(quotation.total_order_cost) + float(quotation.total_cost_per_unit) + (quotation.lead_time_days * 0.01),
+            'rank': quotation.rank
+        })
+
+    return comparison_results, total_ranked
+
+
+# Field instances matching ComparisonResultSerializer, so payloads built from
+# in-memory results render exactly like serialized rows
+_price_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+_order_cost_field = serializers.DecimalField(max_digits=12, decimal_places=2)
+_datetime_field = serializers.DateTimeField()
+_adjusted_price_field = serializers.DecimalField(max_digits=12, decimal_places=4)
+
+
+def build_comparison_results(order_request, comparison_results):
+    """
+    Build unsaved ComparisonResult rows for ranked results, ready for
+    bulk_create, with the vendor and quotation values snapshotted.
+    """
+    rows = []
+    for result in comparison_results:
+        quotation = result['quotation']
+        vendor = quotation.vendor
+        rows.append(ComparisonResult(
+            order_request=order_request,
+            vendor=vendor,
+            quotation=quotation,
+            total_cost_per_unit=result['total_cost_per_unit'],
+            total_order_cost=result['total_order_cost'],
+            score=result['score'],
+            rank=result['rank'],
+            vendor_name=vendor.name,
+            vendor_city=vendor.city,
+            vendor_state=vendor.state,
+            product_price=quotation.product_price,
+            delivery_price=quotation.delivery_price,
+            kilo_price=quotation.kilo_price,
+            grade_spec=quotation.grade_spec,
+            lead_time_days=quotation.lead_time_days,
+            is_interstate=result['is_interstate'],
+            base_delivery_price=result['base_delivery_price'],
+            adjusted_delivery_price=result['adjusted_delivery_price']
+        ))
+    return rows
+
+
+def comparison_payload(result, comparison=None):
+    """
+    Render a ranked result exactly as ComparisonResultSerializer renders the
+    saved row, without touching the database. ``comparison`` is the saved
+    row, if any.
+    """
+    quotation = result['quotation']
+    vendor = quotation.vendor
+    kilo_price = quotation.kilo_price
+    return {
+        'id': comparison.id if comparison else None,
+        'vendor_name': vendor.name,
+        'vendor_city': vendor.city,
+        'vendor_state': vendor.state,
+        'product_price': _price_field.to_representation(quotation.product_price),
+        'delivery_price': _price_field.to_representation(quotation.delivery_price),
+        'kilo_price': _price_field.to_representation(kilo_price) if kilo_price is not None else None,
+        'grade_spec': quotation.grade_spec,
+        'lead_time_days': quotation.lead_time_days,
+        'total_cost_per_unit': _price_field.to_representation(result['total_cost_per_unit']),
+        'total_order_cost': _order_cost_field.to_representation(result['total_order_cost']),
+        'score': result['score'],
+        'rank': result['rank'],
+        'created_at': _datetime_field.to_representation(comparison.created_at) if comparison else None,
+        'order_request': comparison.order_request_id if comparison else None,
+        'vendor': vendor.id,
+        'quotation': quotation.id,
+        'is_interstate': result['is_interstate'],
+        'base_delivery_price': _price_field.to_representation(result['base_delivery_price']),
+        'adjusted_delivery_price': _adjusted_price_field.to_representation(result['adjusted_delivery_price']),
+    }
+
+
+def compare_order_lines(lines, company, persist=True, job=None, line_offset=0):
+    """
+    Compare vendors for many order lines at once.
+
+    All quotations for the requested products are loaded in one query (after
+    the compare cache), each line is ranked in memory and, when ``persist`` is
+    set, every order request and comparison result is written with bulk inserts
+    inside a single transaction. Lines that cannot be compared are reported with
+    an error. ``line_offset`` numbers the lines of a chunk within a larger job.
+    """
+    product_ids = {line['product_id'] for line in lines}
+    products = Product.objects.filter(id__in=product_ids, company=company).in_bulk()
+
+    # Serve what we can from the compare cache; only the remaining products are scanned
+    cached_rankings = {}
+    for index, line in enumerate(lines):
+        if line['product_id'] in products:
+            ranking = get_cached_ranking(
+                line['product_id'], line['order_qty'], normalize_state(line['delivery_location'])
+            )
+            if ranking is not None:
+                cached_rankings[index] = ranking[0]
+
+    # One query for every quotation still needed by the batch, grouped per product
+    uncached_product_ids = {
+        line['product_id'] for index, line in enumerate(lines)
+        if index not in cached_rankings and line['product_id'] in products
+    }
+    quotations_by_product = defaultdict(list)
+    if uncached_product_ids:
+        quotations = Quotation.objects.filter(
+            product_id__in=uncached_product_ids,
+            vendor__company=company
+        ).select_related('vendor').order_by('-created_at', '-id')
+        for quotation in quotations:
+            quotations_by_product[quotation.product_id].append(quotation)
+
+    ranked_lines = []
+    line_responses = []
+
+    for index, line in enumerate(lines):
+        product = products.get(line['product_id'])
+        if product is None:
+            line_responses.append({
+                'line': line_offset + index,
+                'product_id': line['product_id'],
+                'error': "Product not found or does not belong to your company"
+            })
+            continue
+        
+        comparison_results = cached_rankings.get(index)
+        if comparison_results is None:
+            ranking = rank_quotations(
+                quotations_by_product[product.id], line['order_qty'], line['delivery_location']
+            )
+            comparison_results = ranking[0]
+            if comparison_results:
+                set_cached_ranking(
+                    product.id, line['order_qty'], normalize_state(line['delivery_location']), None, 0, ranking
+                )
+        
+        if not comparison_results:
+            line_responses.append({
+                'line': line_offset + index,
+                'product_id': product.id,
+                'error': "No quotations with complete data (delivery price and lead time) found for comparison"
+            })
+            continue
+        
+        order_request = OrderRequest(
+            company=company,
+            product=product,
+            job=job,
+            order_qty=line['order_qty'],
+            delivery_location=line['delivery_location'],
+            required_date=line.get('required_date') or '2025-12-31'
+        )
+        ranked_lines.append((index, order_request, comparison_results))
+
+    saved = {}
+    if persist and ranked_lines:
+        with transaction.atomic():
+            OrderRequest.objects.bulk_create([order_request for _, order_request, _ in ranked_lines])
+            for index, order_request, comparison_results in ranked_lines:
+                saved[index] = build_comparison_results(order_request, comparison_results)
+            ComparisonResult.objects.bulk_create(
+                [comparison for comparisons in saved.values() for comparison in comparisons]
+            )
+            # bulk_create sends no post_save; move the order request version on
+            bump_model_version(OrderRequest)
+
+    for index, order_request, comparison_results in ranked_lines:
+        comparisons = saved.get(index, [None] * len(comparison_results))
+        line_responses.append({
+            'line': line_offset + index,
+            'order_request_id': order_request.id,
+            'product_id': order_request.product_id,
+            'product_name': order_request.product.name,
+            'order_qty': order_request.order_qty,
+            'delivery_location': order_request.delivery_location,
+            'comparisons': [
+                comparison_payload(result, comparison)
+                for result, comparison in zip(comparison_results, comparisons)
+            ]
+        })
+
+    line_responses.sort(key=lambda x: x['line'])
+
+    return {
+        'compared': len(ranked_lines),
+        'failed': len(lines) - len(ranked_lines),
+        'cached': len(cached_rankings),
+        'lines': line_responses
+    }
@@ -0,0 +1,132 @@
+import hashlib
+import time
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+VERSION_CACHE_ALIAS = 'default'
+
+
+def _version_key(model):
+    return f'conditional:version:{model._meta.label_lower}'
+
+
+def model_versions(models):
+    """
+    Current version of each model as a nanosecond timestamp. Missing counters
+    start from the current time, so an evicted counter never repeats a value.
+
+    Versions are only shared between processes through a shared cache
+    (REDIS_URL); with the per-process LocMem default, a process does not
+    see writes made by another one.
+    """
+    cache = caches[VERSION_CACHE_ALIAS]
+    keys = {_version_key(model): model for model in models}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+        versions[key] = cache.get(key)
+    return [versions[_version_key(model)] for model in models]
+
+
+def bump_model_version(model):
+    """
+    Move a model's version forward once the current transaction commits.
+    Deletes and changes to joined rows are invisible to max(updated_at), so
+    collection validators include this version as well.
+    """
+    def bump():
+        cache = caches[VERSION_CACHE_ALIAS]
+        key = _version_key(model)
+        cache.set(key, max(time.time_ns(), (cache.get(key) or 0) + 1), timeout=None)
+    transaction.on_commit(bump)
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified validators for list and retrieve.
+
+    Validators come from one aggregate query (max ``last_modified_field`` and
+    row count of the filtered queryset), the query parameters and the
+    versions of ``conditional_models`` (the viewset's model and every model
+    its serializer reads names from, plus ``expand_conditional_models`` for
+    each ``?expand=`` relation). A matching ``If-None-Match`` or
+    ``If-Modified-Since`` gets a 304 before anything is serialized.
+    """
+    conditional_models = ()
+    # ?expand= name -> further models the nested serializer reads
+    expand_conditional_models = {}
+    last_modified_field = 'updated_at'
+
+    def get_conditional_models(self):
+        models = list(self.conditional_models)
+        for name in self.request.query_params.get('expand', '').split(','):
+            for model in self.expand_conditional_models.get(name.strip(), ()):
+                if model not in models:
+                    models.append(model)
+        return models
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional_response(queryset, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # A malformed id: get_object() answers 404
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional_response(
+            queryset, super().retrieve, request, *args, require_rows=True, **kwargs
+        )
+
+    def _conditional_response(self, queryset, respond, request, *args, require_rows=False, **kwargs):
+        etag, last_modified, count = self.get_validators(queryset)
+        if require_rows and not count:
+            return respond(request, *args, **kwargs)
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = respond(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        elif not isinstance(response, HttpResponseNotModified):
+            # 412 for a failed If-Match / If-Unmodified-Since
+            return response
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Without this browsers may reuse a cached list without asking
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_validators(self, queryset):
+        """Return the (quoted ETag, Last-Modified timestamp, row count) for ``queryset``."""
+        state = queryset.order_by().aggregate(
+            last_modified=Max(self.last_modified_field),
+            count=Count('pk')
+        )
+        versions = model_versions(self.get_conditional_models())
+        request = self.request
+        digest = hashlib.md5(repr((
+            queryset.model._meta.label_lower,
+            request.company_id,
+            getattr(self, 'action', None),
+            sorted(self.kwargs.items()),
+            sorted(request.query_params.lists()),
+            request.accepted_renderer.format,
+            state['count'],
+            state['last_modified'],
+            versions,
+        )).encode(), usedforsecurity=False).hexdigest()
+
+        timestamps = [version / 1e9 for version in versions]
+        if state['last_modified'] is not None:
+            timestamps.append(state['last_modified'].timestamp())
+        return quote_etag(digest), int(max(timestamps, default=0)), state['count']
@@ -0,0 +1,201 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, F, Func, IntegerField, Min, Q, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rest_framework import serializers
+from .conditional import VERSION_CACHE_ALIAS, model_versions
+from .models import Company, OrderRequest, Product, ProductCategory, ProductGroup, Quotation, Vendor
+
+
+# Every model the stats read; their versions (bumped by signals) key the cache
+STATS_MODELS = (Company, Vendor, Product, ProductGroup, ProductCategory, Quotation, OrderRequest)
+
+# Products with the most quotations listed in landing_price_by_product, by
+# default and at most (?top_products=)
+TOP_PRODUCTS = 50
+MAX_TOP_PRODUCTS = 500
+MONTHS = 6
+ACTIVITY_DAYS = 14
+RECENT_COMPARES = 5
+
+_price_field = serializers.DecimalField(max_digits=12, decimal_places=2)
+_datetime_field = serializers.DateTimeField()
+
+
+def _price(value):
+    return _price_field.to_representation(value) if value is not None else None
+
+
+def _average(row):
+    # Mean landing price over the quotations that have one, like Avg()
+    return _price(row['landing_total'] / row['priced']) if row['priced'] else None
+
+
+def _count(queryset):
+    # Scalar COUNT subquery: no GROUP BY, so it is a single value
+    return Subquery(
+        queryset.order_by().annotate(total=Func(F('pk'), function='COUNT')).values('total'),
+        output_field=IntegerField()
+    )
+
+
+def _months_back(now, months):
+    month = now.month - months
+    year = now.year + (month - 1) // 12
+    return now.replace(year=year, month=(month - 1) % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def compute_dashboard_stats(company_id, top_products=TOP_PRODUCTS):
+    """
+    Every dashboard number for a company from a handful of grouped queries:
+    entity counts (one query of scalar subqueries), vendors per city,
+    quotations per month, product group and category, landing prices of the
+    ``top_products`` most quoted products and recent compare activity.
+    """
+    now = timezone.now()
+    quotations = Quotation.objects.filter(vendor__company_id=company_id).order_by()
+    order_requests = OrderRequest.objects.filter(company_id=company_id).order_by()
+
+    totals = {
+        'vendors': Vendor.objects.filter(company_id=company_id),
+        'products': Product.objects.filter(company_id=company_id),
+        'product_groups': ProductGroup.objects.filter(company_id=company_id),
+        'product_categories': ProductCategory.objects.filter(company_id=company_id),
+        'quotations': quotations,
+        'order_requests': order_requests,
+    }
+    # Prefixed aliases: the plain names clash with Company's reverse relations
+    row = Company.objects.filter(pk=company_id).values(
+        **{f'total_{name}': _count(queryset) for name, queryset in totals.items()}
+    ).first()
+    # Single-tenant mode: the company list only ever shows the default company
+    counts = {'companies': 1 if row else 0}
+    counts.update({name: row[f'total_{name}'] if row else 0 for name in totals})
+
+    vendors_by_city = [
+        {'city': row['city'], 'count': row['count']}
+        for row in Vendor.objects.filter(company_id=company_id).order_by().values('city')
+        .annotate(count=Count('id')).order_by('-count', 'city')
+    ]
+
+    # One filtered count per month over the created_at index range, rather than
+    # truncating every row's timestamp
+    months = [_months_back(now, back) for back in range(MONTHS - 1, -1, -1)]
+    bounds = list(zip(months, months[1:] + [None]))
+    month_counts = quotations.filter(created_at__gte=months[0]).aggregate(**{
+        f'month_{index}': Count('id', filter=Q(created_at__gte=begin, **({'created_at__lt': end} if end else {})))
+        for index, (begin, end) in enumerate(bounds)
+    })
+    quotations_by_month = [
+        {'month': begin.strftime('%Y-%m'), 'count': month_counts[f'month_{index}']}
+        for index, (begin, _) in enumerate(bounds)
+    ]
+
+    # One grouped scan per product; groups and categories are rolled up from it
+    per_product = list(quotations.values(
+        'product_id', 'product__name',
+        'product__product_group_id', 'product__product_group__name',
+        'product__product_category_id', 'product__product_category__name',
+    ).annotate(
+        count=Count('id'),
+        priced=Count('landing_price'),
+        landing_total=Sum('landing_price'),
+        min_landing_price=Min('landing_price'),
+    ))
+
+    def roll_up(field):
+        groups = {}
+        for row in per_product:
+            key = row[f'product__{field}_id']
+            group = groups.setdefault(key, {
+                'id': key, 'name': row[f'product__{field}__name'],
+                'count': 0, 'priced': 0, 'landing_total': 0, 'min_landing_price': None,
+            })
+            group['count'] += row['count']
+            group['priced'] += row['priced']
+            group['landing_total'] += row['landing_total'] or 0
+            if row['min_landing_price'] is not None and (
+                group['min_landing_price'] is None or row['min_landing_price'] < group['min_landing_price']
+            ):
+                group['min_landing_price'] = row['min_landing_price']
+        return [
+            {
+                'id': group['id'],
+                'name': group['name'],
+                'count': group['count'],
+                'avg_landing_price': _average(group),
+                'min_landing_price': _price(group['min_landing_price']),
+            }
+            for group in sorted(groups.values(), key=lambda group: (-group['count'], group['id'] or 0))
+        ]
+
+    landing_price_by_product = [
+        {
+            'product_id': row['product_id'],
+            'product_name': row['product__name'],
+            'quotations': row['count'],
+            'avg_landing_price': _average(row),
+            'min_landing_price': _price(row['min_landing_price']),
+        }
+        for row in sorted(per_product, key=lambda row: (-row['count'], row['product_id']))[:top_products]
+    ]
+
+    compares_by_day = [
+        {'date': row['day'].isoformat(), 'order_requests': row['count']}
+        for row in order_requests.filter(created_at__gte=now - timedelta(days=ACTIVITY_DAYS))
+        .annotate(day=TruncDate('created_at')).values('day')
+        .annotate(count=Count('id')).order_by('day')
+    ]
+
+    recent = [
+        {
+            'order_request_id': row['id'],
+            'product_name': row['product__name'],
+            'order_qty': row['order_qty'],
+            'delivery_location': row['delivery_location'],
+            'created_at': _datetime_field.to_representation(row['created_at']),
+        }
+        # order_company_created_idx
+        for row in order_requests.order_by('-created_at').values(
+            'id', 'product__name', 'order_qty', 'delivery_location', 'created_at'
+        )[:RECENT_COMPARES]
+    ]
+
+    return {
+        'counts': counts,
+        'vendors_by_city': vendors_by_city,
+        'quotations_by_month': quotations_by_month,
+        'quotations_by_group': roll_up('product_group'),
+        'quotations_by_category': roll_up('product_category'),
+        'landing_price_by_product': landing_price_by_product,
+        # Every quoted product; the list above holds the most quoted ones only
+        'products_quoted': len(per_product),
+        'landing_price_by_product_truncated': len(per_product) > len(landing_price_by_product),
+        'compare_activity': {
+            'days': ACTIVITY_DAYS,
+            'order_requests': sum(day['order_requests'] for day in compares_by_day),
+            'by_day': compares_by_day,
+            'recent': recent,
+        },
+        'generated_at': _datetime_field.to_representation(now),
+    }
+
+
+def dashboard_stats(company_id, top_products=TOP_PRODUCTS):
+    """
+    Cached dashboard stats and whether they came from the cache. The key
+    holds the versions of ``STATS_MODELS``, which the conditional-GET
+    signals bump on every write, so any change is picked up at once;
+    ``DASHBOARD_STATS_TIMEOUT`` bounds how long the date windows can lag.
+    """
+    cache = caches[VERSION_CACHE_ALIAS]
+    versions = ':'.join(str(version) for version in model_versions(STATS_MODELS))
+    key = f'dashboard:stats:{company_id}:{top_products}:{versions}'
+    stats = cache.get(key)
+    if stats is not None:
+        return stats, True
+    stats = compute_dashboard_stats(company_id, top_products)
+    cache.set(key, stats, timeout=settings.DASHBOARD_STATS_TIMEOUT)
+    return stats, False
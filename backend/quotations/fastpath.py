@@ -0,0 +1,251 @@
+import decimal
+import json
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import empty
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .fieldsets import resolve_source_field
+from .pagination import KeysetPagination
+
+try:
+    import orjson
+except ImportError:  # optional dependency; the stdlib encoder is used instead
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer using orjson when it is installed, else compact stdlib json."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _decimal_converter(field):
+    if (not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            or field.normalize_output or field.localize or field.decimal_places is None):
+        return field.to_representation
+
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(quantum, rounding=rounding, context=context):f}'
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if timezone.is_aware(value):
+            value = value.astimezone(field_timezone)
+        else:
+            return field.to_representation(value)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+# Fields whose representation of a database value is the value itself
+_PASSTHROUGH = (
+    serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+    serializers.FloatField, serializers.ChoiceField, serializers.PrimaryKeyRelatedField,
+)
+
+
+def _converter(field):
+    """Precompiled value converter for a serializer field; None means no conversion."""
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return _date_converter(field)
+    if isinstance(field, _PASSTHROUGH):
+        return None
+    return field.to_representation
+
+
+class ValuesPlan:
+    """
+    The ``.values()`` columns and per-field converters that reproduce a
+    serializer's list output from plain rows.
+    """
+
+    def __init__(self, spec, extra_columns=()):
+        self.spec = spec
+        columns = []
+        for _, column, _, guards in spec:
+            columns.extend(guards)
+            columns.append(column)
+        self.columns = list(dict.fromkeys(columns + list(extra_columns)))
+
+    def render(self, rows):
+        spec = self.spec
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert, guards in spec:
+                # DRF skips a field whose source crosses a null relation
+                if guards and any(row[guard] is None for guard in guards):
+                    continue
+                value = row[column]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+def _null_relation_columns(model, attrs):
+    """
+    The ``.values()`` columns of the nullable relations a dotted source
+    crosses; when one is None the serializer leaves the field out.
+    """
+    columns = []
+    for index, attr in enumerate(attrs[:-1]):
+        relation = model._meta.get_field(attr)
+        if relation.null:
+            columns.append('__'.join(attrs[:index + 1]))
+        model = relation.related_model
+    return tuple(columns)
+
+
+# Plans per serializer and field selection; ?fields= combinations are bounded by MAX_PLANS
+_plans = {}
+MAX_PLANS = 512
+
+
+def values_plan(serializer, queryset, extra_columns=()):
+    """
+    Build (and cache) the ValuesPlan for ``serializer`` over ``queryset``, or
+    return None when a field cannot be read from ``.values()`` (nested or
+    method fields without a matching annotation).
+    """
+    fields = [field for field in serializer.fields.values() if not field.write_only]
+    annotations = tuple(sorted(queryset.query.annotations))
+    key = (
+        type(serializer),
+        tuple((field.field_name, type(field)) for field in fields),
+        annotations,
+        tuple(extra_columns)
+    )
+    if key in _plans:
+        return _plans[key]
+
+    spec = []
+    for field in fields:
+        if isinstance(field, serializers.BaseSerializer) or field.source == '*':
+            spec = None
+            break
+        if isinstance(field, serializers.SerializerMethodField):
+            if field.field_name not in annotations:
+                spec = None
+                break
+            spec.append((field.field_name, field.field_name, None, ()))
+            continue
+        attrs = field.source.split('.')
+        model_field = resolve_source_field(queryset.model, attrs)
+        if model_field is None or model_field.many_to_many:
+            spec = None
+            break
+        guards = () if field.allow_null else _null_relation_columns(queryset.model, attrs)
+        if guards and field.default is not empty:
+            spec = None
+            break
+        spec.append((field.field_name, '__'.join(attrs), _converter(field), guards))
+
+    plan = ValuesPlan(spec, extra_columns) if spec is not None else None
+    if len(_plans) >= MAX_PLANS:
+        _plans.clear()
+    _plans[key] = plan
+    return plan
+
+
+class CountedRows:
+    """
+    A ``.values()`` queryset whose ``count()`` runs on the base queryset.
+
+    Counting the values queryset would keep the joins added for name
+    fields; the base queryset counts the same rows without them.
+    """
+
+    def __init__(self, rows, base):
+        self.rows = rows
+        self.base = base
+
+    @property
+    def ordered(self):
+        return self.rows.ordered
+
+    def count(self):
+        return self.base.count()
+
+    def __getitem__(self, key):
+        return self.rows[key]
+
+
+class FastListMixin:
+    """
+    Opt-in fast list mode (``?fast=true``) for model viewsets.
+
+    Rows are fetched with ``.values()`` for the serializer's fields, including
+    joined name fields, converted with precompiled per-field converters and
+    rendered with FastJSONRenderer. The JSON shape matches the regular list
+    response; serializers that cannot be expressed as ``.values()`` fall back
+    to the regular path.
+    """
+
+    def fast_list_requested(self):
+        return (
+            getattr(self, 'action', None) == 'list'
+            and self.request.query_params.get('fast', '').lower() in ('1', 'true', 'yes')
+        )
+
+    def get_renderers(self):
+        if self.fast_list_requested():
+            return [FastJSONRenderer()]
+        return super().get_renderers()
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list_requested():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # Keyset pagination reads its ordering columns from each page's last row
+        ordering = [name.lstrip('-') for name in getattr(self, 'keyset_ordering', ())]
+        plan = values_plan(self.get_serializer(), queryset, ordering)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = queryset.values(*plan.columns)
+        if self.paginator is not None and not isinstance(self.paginator, KeysetPagination):
+            page = self.paginate_queryset(CountedRows(rows, queryset))
+        else:
+            page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(plan.render(page))
+        return Response(plan.render(rows))
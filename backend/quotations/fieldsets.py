@@ -0,0 +1,102 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _query_list(request, name):
+    value = request.query_params.get(name, '')
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin for ``?fields=`` and ``?expand=`` on read requests.
+
+    ``?fields=id,name`` keeps only the listed fields. ``?expand=vendor``
+    replaces a relation's primary key with the nested object, using the
+    serializer named in ``Meta.expandable_fields``. Without either
+    parameter the output is unchanged.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in _query_list(request, 'expand'):
+            if name in expandable:
+                self.fields[name] = expandable[name](read_only=True)
+
+        requested = _query_list(request, 'fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+def resolve_source_field(model, attrs):
+    """Resolve a dotted serializer source to a concrete model field, or None."""
+    for index, attr in enumerate(attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if index < len(attrs) - 1:
+            if not field.is_relation or field.many_to_many or field.one_to_many:
+                return None
+            model = field.related_model
+    return field if field.concrete else None
+
+
+def restrict_queryset(queryset, serializer, extra_columns=()):
+    """
+    Load only the columns ``serializer`` renders (plus ``extra_columns``), and
+    join only the relations its fields read (joined name fields and expanded
+    objects).
+    """
+    columns, joins = set(extra_columns), set()
+
+    def collect(serializer, model, prefix):
+        columns.add(prefix + model._meta.pk.name)
+        for field in serializer.fields.values():
+            if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+                continue
+            attrs = field.source.split('.')
+            if isinstance(field, serializers.BaseSerializer):
+                relation = resolve_source_field(model, attrs)
+                if relation is None or not relation.is_relation:
+                    continue
+                path = prefix + '__'.join(attrs)
+                joins.add(path)
+                collect(field, relation.related_model, path + '__')
+                continue
+            if resolve_source_field(model, attrs) is None:
+                continue
+            if len(attrs) > 1:
+                joins.add(prefix + '__'.join(attrs[:-1]))
+            columns.add(prefix + '__'.join(attrs))
+
+    collect(serializer, queryset.model, '')
+    queryset = queryset.select_related(None)
+    if joins:
+        # select_related() with no arguments would follow every foreign key
+        queryset = queryset.select_related(*joins)
+    return queryset.only(*columns)
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin that narrows the SQL to what ``?fields=`` / ``?expand=``
+    render: ``.only()`` for the selected columns and ``select_related`` for
+    expanded or requested joined fields only.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        if self.request.method in SAFE_METHODS and ('fields' in params or 'expand' in params):
+            # Keyset pagination reads its ordering columns from the last row
+            ordering = [name.lstrip('-') for name in getattr(self, 'keyset_ordering', ())]
+            queryset = restrict_queryset(queryset, self.get_serializer(), ordering)
+        return queryset
@@ -0,0 +1,123 @@
+import threading
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .comparison import rank_quotations_in_db
+from .models import Quotation, QuotationPriceHistory
+
+
+HISTORY_FIELDS = (
+    'product_price', 'quantity', 'delivery_price', 'total_landing_price', 'landing_price',
+    'kilo_price', 'grade_spec', 'lead_time_days'
+)
+
+
+def record_quotation_history(quotations, deleted=False):
+    """
+    Append one history row per quotation with its current values, in one
+    insert. A deleted quotation gets a tombstone valid from now; otherwise a
+    row is valid from the quotation's ``updated_at``.
+    """
+    now = timezone.now()
+    QuotationPriceHistory.objects.bulk_create([
+        QuotationPriceHistory(
+            quotation_id=quotation.pk,
+            vendor_id=quotation.vendor_id,
+            product_id=quotation.product_id,
+            quotation_created_at=quotation.created_at,
+            valid_from=now if deleted else quotation.updated_at,
+            deleted=deleted,
+            **{field: getattr(quotation, field) for field in HISTORY_FIELDS}
+        )
+        for quotation in quotations
+    ])
+
+
+# Quotations tombstoned ahead of a cascade, whose own post_delete is then skipped
+_recorded_deletes = threading.local()
+
+
+def _recorded_ids():
+    if not hasattr(_recorded_deletes, 'ids'):
+        _recorded_deletes.ids = set()
+    return _recorded_deletes.ids
+
+
+def record_deleted_quotations(quotations):
+    """
+    Tombstone every quotation in ``quotations``, a queryset about to be
+    deleted by a cascade, with one insert. Their per-instance post_delete
+    receivers then find them in ``take_recorded_delete`` and write nothing.
+    """
+    recorded = _recorded_ids()
+    deleting = [quotation for quotation in quotations if quotation.pk not in recorded]
+    record_quotation_history(deleting, deleted=True)
+    recorded.update(quotation.pk for quotation in deleting)
+
+
+def take_recorded_delete(quotation_id):
+    """Whether the quotation's tombstone was already written by ``record_deleted_quotations``."""
+    recorded = _recorded_ids()
+    if quotation_id in recorded:
+        recorded.discard(quotation_id)
+        return True
+    return False
+
+
+def forget_recorded_deletes():
+    # The cascade is over (its parent is gone); nothing recorded can still be pending
+    _recorded_ids().clear()
+
+
+def history_as_of(product_id, company_id, as_of):
+    """
+    History rows in effect at ``as_of`` for a product: the latest row per
+    quotation with ``valid_from <= as_of``, minus deleted quotations.
+
+    The latest row is picked by a correlated subquery that reads the
+    (quotation_id, valid_from) index backwards, one seek per quotation.
+    """
+    latest = QuotationPriceHistory.objects.filter(
+        quotation_id=OuterRef('quotation_id'),
+        valid_from__lte=as_of
+    ).order_by('-valid_from', '-id').values('id')[:1]
+
+    return QuotationPriceHistory.objects.filter(
+        product_id=product_id,
+        vendor__company_id=company_id,
+        valid_from__lte=as_of,
+        id=Subquery(latest)
+    ).exclude(deleted=True).select_related('vendor')
+
+
+def _as_quotation(row):
+    # An unsaved Quotation carrying the historical values, so results render
+    # through comparison_payload like a live compare
+    quotation = Quotation(
+        id=row.quotation_id,
+        vendor=row.vendor,
+        product_id=row.product_id,
+        created_at=row.quotation_created_at,
+        updated_at=row.valid_from,
+        **{field: getattr(row, field) for field in HISTORY_FIELDS}
+    )
+    for name in ('is_interstate', 'total_cost_per_unit', 'total_order_cost', 'rank', 'total_ranked'):
+        setattr(quotation, name, getattr(row, name))
+    return quotation
+
+
+def rank_quotations_as_of(product_id, company_id, as_of, order_qty, delivery_location, top_k=None, offset=0):
+    """
+    Rank a product's quotations as they stood at ``as_of``.
+
+    Prices, quantities and lead times come from the price history; the
+    interstate surcharge uses each vendor's current state, which is not
+    versioned. Returns the same (results, total_ranked) tuple as
+    ``rank_quotations_in_db``.
+    """
+    results, total_ranked = rank_quotations_in_db(
+        history_as_of(product_id, company_id, as_of), order_qty, delivery_location,
+        top_k=top_k, offset=offset, tiebreak=('quotation_created_at', 'quotation_id')
+    )
+    for result in results:
+        result['quotation'] = _as_quotation(result['quotation'])
+    return results, total_ranked
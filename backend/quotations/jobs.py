@@ -0,0 +1,138 @@
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+from .comparison import compare_order_lines
+from .models import CompareJob
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+# Ids of the jobs queued or running in this process
+_held_jobs = set()
+
+
+class QueueFull(Exception):
+    """Raised when the in-process compare job queue is at its configured depth."""
+
+
+def _job_settings():
+    return settings.COMPARE_JOBS
+
+
+def _get_executor():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is not None:
+            return _executor
+        config = _job_settings()
+        _executor = ThreadPoolExecutor(
+            max_workers=config['MAX_WORKERS'],
+            thread_name_prefix='compare-job'
+        )
+        # Queued plus running jobs this process will accept
+        _slots = threading.BoundedSemaphore(config['MAX_QUEUE_DEPTH'])
+    # Jobs of a previous run of this process can never finish now
+    fail_stale_jobs()
+    return _executor
+
+
+def submit_compare_job(job):
+    """
+    Queue a CompareJob on the in-process worker pool.
+
+    Raises QueueFull if the process already holds MAX_QUEUE_DEPTH queued or
+    running jobs. No external broker is involved: jobs run in this process.
+    """
+    executor = _get_executor()
+    if not _slots.acquire(blocking=False):
+        raise QueueFull()
+    with _executor_lock:
+        _held_jobs.add(job.id)
+    try:
+        executor.submit(_run_and_release, job.id)
+    except Exception:
+        _release(job.id)
+        raise
+
+
+def _release(job_id):
+    with _executor_lock:
+        _held_jobs.discard(job_id)
+    _slots.release()
+
+
+def _run_and_release(job_id):
+    try:
+        run_compare_job(job_id)
+    finally:
+        _release(job_id)
+
+
+def fail_stale_jobs():
+    """
+    Mark failed the queued or running jobs that made no progress for
+    COMPARE_JOBS['STALE_AFTER'] seconds and are not held by this process:
+    their worker process exited, and nothing will resume them. Returns the
+    number of jobs marked.
+    """
+    now = timezone.now()
+    with _executor_lock:
+        held = list(_held_jobs)
+    return CompareJob.objects.filter(
+        status__in=('queued', 'running'),
+        updated_at__lt=now - timedelta(seconds=_job_settings()['STALE_AFTER'])
+    ).exclude(id__in=held).update(
+        status='failed',
+        error="Interrupted: the process running this job stopped",
+        finished_at=now,
+        updated_at=now
+    )
+
+
+def run_compare_job(job_id):
+    """Rank every line of a job in chunks, storing results against OrderRequest."""
+    close_old_connections()
+    try:
+        job = CompareJob.objects.select_related('company').get(id=job_id)
+        CompareJob.objects.filter(id=job_id).update(
+            status='running', started_at=timezone.now(), updated_at=timezone.now()
+        )
+
+        chunk_size = _job_settings()['CHUNK_SIZE']
+        line_errors = []
+        for offset in range(0, len(job.lines), chunk_size):
+            chunk = job.lines[offset:offset + chunk_size]
+            result = compare_order_lines(chunk, job.company, persist=True, job=job, line_offset=offset)
+            errors = [line for line in result['lines'] if 'error' in line]
+            line_errors.extend(errors)
+            CompareJob.objects.filter(id=job_id).update(
+                completed_lines=F('completed_lines') + len(chunk),
+                failed_lines=F('failed_lines') + len(errors),
+                updated_at=timezone.now()
+            )
+
+        # A job given up for stale in the meantime stays failed
+        CompareJob.objects.filter(id=job_id, status='running').update(
+            status='completed',
+            line_errors=line_errors,
+            finished_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+    except Exception as exc:
+        logger.exception("Compare job %s failed", job_id)
+        CompareJob.objects.filter(id=job_id).update(
+            status='failed',
+            error=str(exc),
+            finished_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+    finally:
+        connection.close()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from backend.quotations.models import Vendor
+from backend.quotations.states import normalize_state
+
+
+class Command(BaseCommand):
+    help = "Recompute Vendor.state_normalized for existing vendors."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = []
+        updated = 0
+
+        for vendor in Vendor.objects.only('id', 'state', 'state_normalized').iterator(chunk_size=batch_size):
+            normalized = normalize_state(vendor.state)
+            if vendor.state_normalized != normalized:
+                vendor.state_normalized = normalized
+                pending.append(vendor)
+            if len(pending) >= batch_size:
+                Vendor.objects.bulk_update(pending, ['state_normalized'])
+                updated += len(pending)
+                pending = []
+
+        if pending:
+            Vendor.objects.bulk_update(pending, ['state_normalized'])
+            updated += len(pending)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated normalized state for {updated} vendor(s)"))
@@ -0,0 +1,49 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from backend.quotations.bulk import import_quotations
+from backend.quotations.tenancy import DEFAULT_COMPANY_ID
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a vendor price list (CSV, or XLSX with openpyxl installed) with batched "
+        "validation and bulk inserts. Uses the same columns as POST /api/quotations/import/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or XLSX file")
+        parser.add_argument('--company', type=int, default=DEFAULT_COMPANY_ID,
+                            help="Company whose vendors and products the rows reference")
+        parser.add_argument('--mode', choices=['create', 'upsert'], default='create',
+                            help="upsert updates the newest quotation for the same vendor and product")
+        parser.add_argument('--atomic', action='store_true', help="Write nothing if any row is invalid")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows validated and written per batch")
+        parser.add_argument('--errors-output', default=None, help="Write the full JSON report to this file")
+
+    def handle(self, *args, **options):
+        try:
+            file = open(options['path'], 'rb')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        with file:
+            report = import_quotations(
+                file, options['path'], options['company'],
+                mode=options['mode'], atomic=options['atomic'], batch_size=options['batch_size']
+            )
+
+        for error in report['errors'][:20]:
+            self.stdout.write(self.style.WARNING(f"row {error['row']}: {json.dumps(error['errors'])}"))
+        if report['failed'] > 20:
+            self.stdout.write(f"... {report['failed'] - 20} more row error(s)")
+        if options['errors_output']:
+            with open(options['errors_output'], 'w') as fh:
+                fh.write(json.dumps(report, indent=2) + '\n')
+
+        summary = (
+            f"{report['rows']} rows: {report['created']} created, {report['updated']} updated, "
+            f"{report['failed']} failed in {report['seconds']} s ({report['rows_per_second']} rows/s)"
+        )
+        if report['rolled_back']:
+            raise CommandError(f"{summary}; rolled back")
+        self.stdout.write(self.style.SUCCESS(summary) if not report['failed'] else summary)
@@ -0,0 +1,141 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+from backend.quotations.comparison import ranked_quotations_queryset
+from backend.quotations.models import Product, Quotation, OrderRequest
+from backend.quotations.tenancy import DEFAULT_COMPANY_ID
+from backend.quotations.views import (
+    VendorViewSet, ProductViewSet, ProductGroupViewSet, ProductCategoryViewSet,
+    QuotationViewSet, OrderRequestViewSet, ComparisonResultViewSet
+)
+
+
+# Plan lines that mean a full table read or a sort the index could have avoided
+SQLITE_SCAN = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY)')
+SQLITE_TABLE = re.compile(r'\b(?:SCAN|SEARCH) (\w+)')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+POSTGRES_SORT = re.compile(r'^\s*(?:->\s*)?Sort\b', re.MULTILINE)
+POSTGRES_TABLE = re.compile(r'\bon (\w+)')
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on each list viewset's queryset and on the compare ranking query, "
+        "and flag sequential scans and sorts that no index serves. Run it against a "
+        "seeded database (see seed_synthetic_data) so the planner sees realistic sizes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help="Ignore sequential scans of tables smaller than this, and sorts in plans "
+                                 "that only read such tables")
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not only flagged ones")
+        parser.add_argument('--fail-on-findings', action='store_true', help="Exit non-zero when anything is flagged")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"EXPLAIN parsing is only implemented for SQLite and PostgreSQL, not {connection.vendor}")
+
+        self.min_rows = options['min_rows']
+        self.table_rows = {}
+        findings = 0
+        for label, queryset, expected in self._scenarios():
+            plan = queryset.explain()
+            flags = [flag for flag in self._flags(plan) if flag not in expected]
+            findings += len(flags)
+
+            if flags:
+                self.stdout.write(self.style.WARNING(f"{label}: {'; '.join(flags)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{label}: ok"))
+            if flags or options['verbose_plans']:
+                self.stdout.write(self._indent(plan))
+
+        summary = f"{findings} finding(s)"
+        if findings and options['fail_on_findings']:
+            raise CommandError(summary)
+        self.stdout.write(summary)
+
+    def _scenarios(self):
+        product = Product.objects.filter(company_id=DEFAULT_COMPANY_ID, quotations__isnull=False).first()
+        order_request = OrderRequest.objects.filter(
+            company_id=DEFAULT_COMPANY_ID, comparison_results__isnull=False
+        ).first()
+        vendor_id = Quotation.objects.values_list('vendor_id', flat=True).first()
+
+        yield from self._list('vendors', VendorViewSet)
+        yield from self._list('products', ProductViewSet)
+        yield from self._list('product-groups', ProductGroupViewSet, expected={'sort'})
+        yield from self._list('product-categories', ProductCategoryViewSet, expected={'sort'})
+        yield from self._list('orders', OrderRequestViewSet)
+        yield from self._list('quotations', QuotationViewSet)
+        yield from self._list('quotations (cursor)', QuotationViewSet, {'pagination': 'cursor'})
+        if product is not None:
+            yield from self._list('quotations ?product_id', QuotationViewSet, {'product_id': product.id})
+            if product.product_group_id:
+                yield from self._list(
+                    'quotations ?product_group_id', QuotationViewSet,
+                    {'product_group_id': product.product_group_id}
+                )
+        if vendor_id is not None:
+            yield from self._list('quotations ?vendor_id', QuotationViewSet, {'vendor_id': vendor_id})
+        if order_request is not None:
+            yield from self._list(
+                'comparison-results ?order_request_id', ComparisonResultViewSet,
+                {'order_request_id': order_request.id}
+            )
+
+        if product is not None:
+            quotations = Quotation.objects.filter(product=product, vendor__company_id=DEFAULT_COMPANY_ID)
+            # Ranking sorts computed costs, which no index can provide
+            yield 'compare ranking', ranked_quotations_queryset(quotations, 100, 'Telangana')[:10], {'sort'}
+
+    def _list(self, label, viewset_class, params=None, expected=frozenset()):
+        view = viewset_class()
+        request = Request(APIRequestFactory().get('/', params or {}))
+        request.company_id = DEFAULT_COMPANY_ID
+        view.request = request
+        view.action = 'list'
+        view.format_kwarg = None
+        view.kwargs = {}
+
+        queryset = view.filter_queryset(view.get_queryset())
+        ordering = getattr(view, 'keyset_ordering', None) if (params or {}).get('pagination') == 'cursor' else None
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        yield f"list {label}", queryset[:api_settings.PAGE_SIZE], expected
+
+    def _flags(self, plan):
+        if connection.vendor == 'sqlite':
+            scan, sort, table = SQLITE_SCAN, SQLITE_SORT, SQLITE_TABLE
+        else:
+            scan, sort, table = POSTGRES_SCAN, POSTGRES_SORT, POSTGRES_TABLE
+        flags = [
+            f"sequential scan on {name}"
+            for name in dict.fromkeys(scan.findall(plan))
+            if self._row_count(name) >= self.min_rows
+        ]
+        # Sorting a handful of rows is cheaper than any index walk; with one
+        # seeded tenant the planner rightly sorts small per-company lists
+        if sort.search(plan) and any(self._row_count(name) >= self.min_rows for name in table.findall(plan)):
+            flags.append('sort')
+        return flags
+
+    def _row_count(self, table):
+        # Scanning a small table is what the planner should do; only big ones count
+        if table not in self.table_rows:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                    self.table_rows[table] = cursor.fetchone()[0]
+            except DatabaseError:
+                # A subquery alias rather than a table: always report it
+                self.table_rows[table] = self.min_rows
+        return self.table_rows[table]
+
+    def _indent(self, plan):
+        return '\n'.join(f"    {line}" for line in plan.splitlines())
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from backend.quotations.bestquotes import rebuild_best_quotes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the best and runner-up quotation per product (/api/best-quotes/). "
+        "Quotation changes keep the table current; run this after loading data with "
+        "signals off, or after moving vendors or products between companies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, default=None, help="Only rebuild this company's products")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_best_quotes(options['company'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Wrote best quotes for {written} product(s) in {elapsed:.2f} s"))
@@ -0,0 +1,259 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from urllib.parse import quote
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from backend.quotations.cache import COMPARE_CACHE_ALIAS
+from backend.quotations.models import Vendor, Product, Quotation, OrderRequest
+from backend.quotations.states import normalize_state
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the compare path and the main list endpoints against the current "
+        "database (see seed_synthetic_data). Reports wall time, query count and peak "
+        "memory per scenario and writes the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per scenario")
+        parser.add_argument('--warmup', type=int, default=1, help="Untimed runs per scenario")
+        parser.add_argument('--order-qty', type=int, default=500)
+        parser.add_argument('--delivery-location', default='Telangana')
+        parser.add_argument('--batch-lines', type=int, default=50)
+        parser.add_argument('--bulk-items', type=int, default=500, help="Quotations per /api/quotations/bulk/ request")
+        parser.add_argument('--only', nargs='*', default=None, help="Run only these scenario names")
+        parser.add_argument('--output', default='bench_output.json', help="JSON results path ('-' for stdout only)")
+
+    def handle(self, *args, **options):
+        product = (
+            Product.objects.filter(company_id=1)
+            .annotate(quote_count=Count('quotations'))
+            .order_by('-quote_count', 'id')
+            .first()
+        )
+        if product is None or not product.quote_count:
+            raise CommandError("No quoted products for company 1; run seed_synthetic_data first")
+
+        self.client = Client()
+        self.etags = {}
+        self.options = options
+        compare_body = {
+            'product_id': product.id,
+            'order_qty': options['order_qty'],
+            'delivery_location': options['delivery_location'],
+        }
+        # The first letters of the product name, as typed into a search box
+        search_prefix = quote(product.name[:3])
+        batch_products = list(
+            Product.objects.filter(company_id=1, quotations__isnull=False)
+            .distinct().order_by('id').values_list('id', flat=True)[:options['batch_lines']]
+        )
+        batch_body = {
+            'persist': False,
+            'lines': [
+                {'product_id': pid, 'order_qty': options['order_qty'],
+                 'delivery_location': options['delivery_location']}
+                for pid in batch_products
+            ]
+        }
+        order_request = OrderRequest.objects.filter(company_id=1, comparison_results__isnull=False).first()
+        # A vendor's price list pushed through /api/quotations/bulk/
+        bulk_quotations = list(
+            Quotation.objects.filter(vendor__company_id=1).order_by('id')
+            .values('id', 'vendor', 'product', 'product_price', 'quantity', 'delivery_price')[:options['bulk_items']]
+        )
+        bulk_create_body = [
+            {key: str(value) if value is not None else None for key, value in item.items() if key != 'id'}
+            for item in bulk_quotations
+        ]
+        bulk_patch_body = [{'id': item['id'], 'product_price': str(item['product_price'])} for item in bulk_quotations]
+
+        scenarios = [
+            ('normalize_state', lambda: normalize_state(options['delivery_location']), None),
+            ('compare_uncached', lambda: self._post('/api/compare/', dict(compare_body, persist=False)), self._clear_compare_cache),
+            ('compare_cached', lambda: self._post('/api/compare/', dict(compare_body, persist=False)), None),
+            ('compare_top10', lambda: self._post('/api/compare/', dict(compare_body, persist=False, top_k=10)), self._clear_compare_cache),
+            ('compare_persisted', lambda: self._rolled_back(lambda: self._post('/api/compare/', compare_body)), self._clear_compare_cache),
+            ('bulk_create_quotations',
+             lambda: self._rolled_back(lambda: self._post('/api/quotations/bulk/', bulk_create_body)), None),
+            ('bulk_patch_quotations',
+             lambda: self._rolled_back(lambda: self._patch('/api/quotations/bulk/', bulk_patch_body)), None),
+            ('compare_batch', lambda: self._post('/api/compare/batch/', batch_body), self._clear_compare_cache),
+            ('list_quotations', lambda: self._get('/api/quotations/'), None),
+            ('list_quotations_fast', lambda: self._get('/api/quotations/?fast=true'), None),
+            ('list_quotations_cursor', lambda: self._get('/api/quotations/?pagination=cursor'), None),
+            ('list_quotations_cursor_fast', lambda: self._get('/api/quotations/?pagination=cursor&fast=true'), None),
+            ('list_quotations_by_product', lambda: self._get(f'/api/quotations/?product_id={product.id}'), None),
+            ('list_quotations_by_product_fast', lambda: self._get(f'/api/quotations/?product_id={product.id}&fast=true'), None),
+            ('list_quotations_by_product_not_modified',
+             lambda: self._revalidate(f'/api/quotations/?product_id={product.id}'), None),
+            ('export_quotations_csv', lambda: self._stream('/api/quotations/export/'), None),
+            ('export_quotations_ndjson', lambda: self._stream('/api/quotations/export/?format=ndjson'), None),
+            ('list_best_quotes', lambda: self._get('/api/best-quotes/'), None),
+            ('dashboard_stats', lambda: self._get('/api/dashboard/stats/'), None),
+            ('search_typeahead', lambda: self._get(f'/api/search/?q={search_prefix}'), None),
+            ('list_vendors', lambda: self._get('/api/vendors/'), None),
+            ('list_vendors_not_modified', lambda: self._revalidate('/api/vendors/'), None),
+            ('list_products', lambda: self._get('/api/products/'), None),
+            ('list_products_fast', lambda: self._get('/api/products/?fast=true'), None),
+            ('list_products_not_modified', lambda: self._revalidate('/api/products/'), None),
+            ('list_product_groups', lambda: self._get('/api/product-groups/'), None),
+            ('list_product_categories', lambda: self._get('/api/product-categories/'), None),
+            ('list_orders', lambda: self._get('/api/orders/'), None),
+            ('list_users', lambda: self._get('/api/users/'), None),
+            ('list_user_profiles', lambda: self._get('/api/user-profiles/'), None),
+        ]
+        if order_request is not None:
+            scenarios.append((
+                'list_comparison_results',
+                lambda: self._get(f'/api/comparison-results/?order_request_id={order_request.id}'),
+                None
+            ))
+        if options['only']:
+            scenarios = [s for s in scenarios if s[0] in options['only']]
+
+        results = {}
+        for name, run, setup in scenarios:
+            results[name] = self._measure(run, setup)
+            r = results[name]
+            self.stdout.write(
+                f"{name:30s} median {r['wall_ms']['median']:9.2f} ms  "
+                f"queries {r['queries']:4d}  peak {r['peak_memory_kb']:9.1f} KB"
+            )
+
+        # Regular vs ?fast=true list paths
+        fast_paths = {}
+        for name in results:
+            if name.endswith('_fast') and name[:-len('_fast')] in results:
+                regular = results[name[:-len('_fast')]]['wall_ms']['median']
+                fast = results[name]['wall_ms']['median']
+                fast_paths[name[:-len('_fast')]] = round(regular / fast, 2) if fast else None
+                self.stdout.write(f"{name[:-len('_fast')]:30s} fast path speedup x{fast_paths[name[:-len('_fast')]]}")
+
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'git_sha': self._git_sha(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'dataset': {
+                'vendors': Vendor.objects.count(),
+                'products': Product.objects.count(),
+                'quotations': Quotation.objects.count(),
+                'benchmark_product_id': product.id,
+                'benchmark_product_quotations': product.quote_count,
+                'batch_lines': len(batch_body['lines']),
+            },
+            'repeat': options['repeat'],
+            'scenarios': results,
+            'fast_path_speedup': fast_paths,
+        }
+        payload = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(payload)
+        else:
+            with open(options['output'], 'w') as fh:
+                fh.write(payload + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def _measure(self, run, setup):
+        for _ in range(self.options['warmup']):
+            if setup:
+                setup()
+            run()
+
+        timings = []
+        queries = 0
+        for _ in range(self.options['repeat']):
+            if setup:
+                setup()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(captured)
+
+        # Memory is traced in a separate run so tracemalloc overhead stays out of the timings
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'wall_ms': {
+                'min': round(min(timings), 3),
+                'median': round(statistics.median(timings), 3),
+                'max': round(max(timings), 3),
+            },
+            'queries': queries,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def _post(self, path, body):
+        response = self.client.post(path, data=json.dumps(body), content_type='application/json')
+        self._check(path, response)
+        return response
+
+    def _patch(self, path, body):
+        response = self.client.patch(path, data=json.dumps(body), content_type='application/json')
+        self._check(path, response)
+        return response
+
+    def _get(self, path):
+        response = self.client.get(path)
+        self._check(path, response)
+        return response
+
+    def _stream(self, path):
+        # Consume the whole body; peak memory should not grow with the row count
+        response = self.client.get(path)
+        self._check(path, response)
+        for _ in response.streaming_content:
+            pass
+        return response
+
+    def _revalidate(self, path):
+        # A client re-fetching a list it already holds: If-None-Match with the last ETag
+        etag = self.client.get(path)['ETag'] if path not in self.etags else self.etags[path]
+        self.etags[path] = etag
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        if response.status_code != 304:
+            raise CommandError(f"{path} returned {response.status_code} for its own ETag")
+        return response
+
+    def _check(self, path, response):
+        if response.status_code >= 400:
+            raise CommandError(f"{path} returned {response.status_code}: {response.content[:200]!r}")
+
+    def _rolled_back(self, run):
+        # Persisted compares write rows; roll them back so repeats see the same data
+        with transaction.atomic():
+            run()
+            transaction.set_rollback(True)
+
+    def _clear_compare_cache(self):
+        caches[COMPARE_CACHE_ALIAS].clear()
+
+    def _git_sha(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,187 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from backend.quotations.cache import bump_quotation_versions
+from backend.quotations.conditional import bump_model_version
+from backend.quotations.models import (
+    Company, Vendor, ProductGroup, ProductCategory, Product, Quotation, OrderRequest, ComparisonResult,
+    QuotationPriceHistory, ProductBestQuote
+)
+from backend.quotations.signals import quotations_bulk_changed
+from backend.quotations.states import STATE_MAPPINGS, normalize_state
+
+
+CITIES = ['Hyderabad', 'Chennai', 'Bengaluru', 'Mumbai', 'Pune', 'Ahmedabad', 'Kolkata', 'Delhi', 'Jaipur', 'Kochi']
+MATERIALS = ['HDPE', 'LDPE', 'PP', 'PVC', 'PET', 'ABS', 'PS', 'Nylon', 'PC', 'EVA']
+GRADES = ['Injection', 'Blow Moulding', 'Film', 'Extrusion', 'Raffia', 'Pipe']
+UNITS = ['kg', 'ton', 'bag']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a reproducible synthetic dataset (companies, vendors across states, "
+        "product groups/categories, products and quotations) for benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=1,
+                            help="Companies to spread data across; company 1 is the app's default company")
+        parser.add_argument('--vendors', type=int, default=500)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--quotations', type=int, default=50000, help="Up to about 1,000,000")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete existing vendors, products, groups, categories and orders first")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        if options['clear']:
+            self.stdout.write("Clearing existing data...")
+            self._clear()
+
+        companies = self._companies(options['companies'])
+        states = sorted(set(STATE_MAPPINGS.values()))
+
+        vendors = []
+        for i in range(options['vendors']):
+            state = rng.choice(states).title()
+            vendors.append(Vendor(
+                company=companies[i % len(companies)],
+                name=f"Vendor {i + 1:06d}",
+                city=rng.choice(CITIES),
+                state=state,
+                state_normalized=normalize_state(state),
+                rating=round(rng.uniform(2.5, 5.0), 1),
+                contact=f"+91-9{rng.randint(100000000, 999999999)}"
+            ))
+        vendors = Vendor.objects.bulk_create(vendors, batch_size=batch_size)
+
+        groups = ProductGroup.objects.bulk_create([
+            ProductGroup(company=companies[i % len(companies)], name=f"Group {i + 1:04d}")
+            for i in range(options['groups'])
+        ], batch_size=batch_size)
+        categories = ProductCategory.objects.bulk_create([
+            ProductCategory(company=companies[i % len(companies)], name=f"Category {i + 1:04d}")
+            for i in range(options['categories'])
+        ], batch_size=batch_size)
+
+        products = []
+        for i in range(options['products']):
+            company = companies[i % len(companies)]
+            material = rng.choice(MATERIALS)
+            products.append(Product(
+                company=company,
+                product_group=rng.choice(groups) if groups else None,
+                product_category=rng.choice(categories) if categories else None,
+                name=f"{material} {i + 1:06d}",
+                category=material,
+                grade_spec=rng.choice(GRADES),
+                unit_type=rng.choice(UNITS),
+                unit_price=Decimal(rng.randint(5000, 20000)) / 100
+            ))
+        products = Product.objects.bulk_create(products, batch_size=batch_size)
+        self.stdout.write(
+            f"Created {len(vendors)} vendors, {len(groups)} groups, "
+            f"{len(categories)} categories, {len(products)} products"
+        )
+
+        # Quotations only pair vendors and products of the same company
+        vendors_by_company = {}
+        for vendor in vendors:
+            vendors_by_company.setdefault(vendor.company_id, []).append(vendor)
+
+        total = options['quotations']
+        # One transaction, so the best-quote refresh runs once, after the last batch
+        with transaction.atomic():
+            created = self._quotations(rng, products, vendors_by_company, total, batch_size)
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {created} quotations in {time.perf_counter() - started:.1f}s (seed {options['seed']})"
+        ))
+
+    def _quotations(self, rng, products, vendors_by_company, total, batch_size):
+        created = 0
+        while created < total and products:
+            batch = []
+            for _ in range(min(batch_size, total - created)):
+                product = rng.choice(products)
+                company_vendors = vendors_by_company.get(product.company_id)
+                if not company_vendors:
+                    continue
+                quotation = Quotation(
+                    company_id=product.company_id,
+                    vendor=rng.choice(company_vendors),
+                    product=product,
+                    product_group_id=product.product_group_id,
+                    product_price=Decimal(rng.randint(5000, 25000)) / 100,
+                    quantity=rng.choice([100, 250, 500, 1000, 5000]),
+                    delivery_price=Decimal(rng.randint(500, 50000)) / 100 if rng.random() > 0.02 else None,
+                    lead_time_days=rng.randint(1, 30) if rng.random() > 0.02 else None,
+                    grade_spec=product.grade_spec
+                )
+                # bulk_create skips save(), so apply its landing price calculation here
+                quotation.calculate_landing_prices()
+                batch.append(quotation)
+            if not batch:
+                break
+            Quotation.objects.bulk_create(batch, batch_size=batch_size)
+            # bulk_create skips post_save: record price history, invalidate
+            # compare caches and refresh best quotes like the bulk endpoints
+            quotations_bulk_changed.send(
+                sender=Quotation, created=batch, updated=[],
+                product_ids={quotation.product_id for quotation in batch}
+            )
+            created += len(batch)
+            self.stdout.write(f"  {created}/{total} quotations", ending='\r')
+            self.stdout.flush()
+        return created
+
+    def _clear(self):
+        # Plain DELETEs: a model delete would load every row and run the
+        # per-row receivers (history tombstones, best-quote refreshes) only
+        # to empty the derived tables afterwards. Dependents go first.
+        models = (
+            QuotationPriceHistory, ProductBestQuote, ComparisonResult, OrderRequest, Quotation,
+            Product, ProductGroup, ProductCategory, Vendor
+        )
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        with transaction.atomic():
+            for model in models:
+                queryset = model.objects.all()
+                queryset._raw_delete(queryset.db)
+            # The receivers were skipped; invalidate the caches once
+            bump_quotation_versions(product_ids)
+            for model in models:
+                bump_model_version(model)
+
+    def _companies(self, count):
+        companies = [Company.objects.get_or_create(
+            id=1,
+            defaults={
+                'name': 'My Company',
+                'industry_type': 'Manufacturing',
+                'address': 'Company Address',
+                'contact_email': 'contact@mycompany.com'
+            }
+        )[0]]
+        for i in range(2, count + 1):
+            company, _ = Company.objects.get_or_create(
+                name=f"Synthetic Company {i}",
+                defaults={
+                    'industry_type': 'Manufacturing',
+                    'address': 'Synthetic Address',
+                    'state': 'Telangana',
+                    'contact_email': f'contact{i}@example.com'
+                }
+            )
+            companies.append(company)
+        return companies
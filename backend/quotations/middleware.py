@@ -0,0 +1,61 @@
+import logging
+import time
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Database execute wrapper that counts queries and sums their wall time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """
+    Record the query count and SQL time of every request.
+
+    The totals are returned in the X-Query-Count and X-Query-Time-Ms response
+    headers, and requests over settings.QUERY_BUDGET['MAX_QUERIES'] or
+    ['MAX_SQL_MS'] are logged as warnings. Counting uses an execute wrapper,
+    so it works with DEBUG off.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = settings.QUERY_BUDGET
+        self.enabled = config['ENABLED']
+        self.max_queries = config['MAX_QUERIES']
+        self.max_sql_ms = config['MAX_SQL_MS']
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        sql_ms = counter.duration * 1000
+        response['X-Query-Count'] = str(counter.count)
+        response['X-Query-Time-Ms'] = f'{sql_ms:.2f}'
+
+        if counter.count > self.max_queries or sql_ms > self.max_sql_ms:
+            logger.warning(
+                "Query budget exceeded: %s %s ran %d queries in %.2f ms (budget %d queries, %d ms)",
+                request.method, request.path, counter.count, sql_ms,
+                self.max_queries, self.max_sql_ms
+            )
+        return response
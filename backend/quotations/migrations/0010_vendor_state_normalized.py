@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+from backend.quotations.states import normalize_state
+
+
+def backfill_state_normalized(apps, schema_editor):
+    Vendor = apps.get_model('quotations', 'Vendor')
+    vendors = list(Vendor.objects.only('id', 'state'))
+    for vendor in vendors:
+        vendor.state_normalized = normalize_state(vendor.state)
+    Vendor.objects.bulk_update(vendors, ['state_normalized'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0009_alter_quotation_delivery_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='state_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_state_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0011_comparejob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comparisonresult',
+            index=models.Index(fields=['order_request', 'rank', 'id'], name='comparison_order_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['-created_at', '-id'], name='quotation_created_id_idx'),
+        ),
+    ]
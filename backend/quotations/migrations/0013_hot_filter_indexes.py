@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0012_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderrequest',
+            index=models.Index(fields=['company', '-created_at'], name='order_company_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', '-created_at'], name='product_company_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['product', '-created_at', '-id'], name='quotation_product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['vendor', '-created_at', '-id'], name='quotation_vendor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['company', '-created_at'], name='vendor_company_created_idx'),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:12
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+from backend.quotations.states import normalize_state
+
+
+# Frozen copy of comparison.INTERSTATE_SURCHARGE at the time of this migration
+INTERSTATE_SURCHARGE = Decimal('1.20')
+
+
+def backfill_snapshots(apps, schema_editor):
+    # Existing rows can only be backfilled from current vendor/quotation values
+    ComparisonResult = apps.get_model('quotations', 'ComparisonResult')
+    rows = ComparisonResult.objects.select_related('vendor', 'quotation', 'order_request')
+    batch = []
+    fields = [
+        'vendor_name', 'vendor_city', 'vendor_state', 'product_price', 'delivery_price', 'kilo_price',
+        'grade_spec', 'lead_time_days', 'is_interstate', 'base_delivery_price', 'adjusted_delivery_price'
+    ]
+    for row in rows.iterator(chunk_size=2000):
+        vendor, quotation = row.vendor, row.quotation
+        row.vendor_name = vendor.name
+        row.vendor_city = vendor.city
+        row.vendor_state = vendor.state
+        row.product_price = quotation.product_price
+        row.delivery_price = quotation.delivery_price
+        row.kilo_price = quotation.kilo_price
+        row.grade_spec = quotation.grade_spec
+        row.lead_time_days = quotation.lead_time_days
+        row.is_interstate = normalize_state(vendor.state) != normalize_state(row.order_request.delivery_location)
+        row.base_delivery_price = quotation.delivery_price
+        if quotation.delivery_price is not None:
+            row.adjusted_delivery_price = (
+                quotation.delivery_price * INTERSTATE_SURCHARGE if row.is_interstate else quotation.delivery_price
+            )
+        batch.append(row)
+        if len(batch) >= 2000:
+            ComparisonResult.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        ComparisonResult.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0013_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='adjusted_delivery_price',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='base_delivery_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='delivery_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='grade_spec',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='is_interstate',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='kilo_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='lead_time_days',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='product_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='vendor_city',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='vendor_name',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='comparisonresult',
+            name='vendor_state',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0014_comparisonresult_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['vendor', 'product', '-created_at', '-id'], name='quotation_vendor_product_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+HISTORY_FIELDS = [
+    'product_price', 'quantity', 'delivery_price', 'total_landing_price', 'landing_price',
+    'kilo_price', 'grade_spec', 'lead_time_days'
+]
+
+
+def backfill_history(apps, schema_editor):
+    # Earlier values are gone; every quotation starts its history at its last update
+    Quotation = apps.get_model('quotations', 'Quotation')
+    QuotationPriceHistory = apps.get_model('quotations', 'QuotationPriceHistory')
+    batch = []
+    for quotation in Quotation.objects.order_by('id').iterator(chunk_size=2000):
+        batch.append(QuotationPriceHistory(
+            quotation_id=quotation.id,
+            vendor_id=quotation.vendor_id,
+            product_id=quotation.product_id,
+            quotation_created_at=quotation.created_at,
+            valid_from=quotation.updated_at,
+            **{field: getattr(quotation, field) for field in HISTORY_FIELDS}
+        ))
+        if len(batch) >= 2000:
+            QuotationPriceHistory.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        QuotationPriceHistory.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0015_quotation_vendor_product_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotationPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quotation_id', models.BigIntegerField()),
+                ('product_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('quantity', models.IntegerField(blank=True, null=True)),
+                ('delivery_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('total_landing_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('landing_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('kilo_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('grade_spec', models.CharField(blank=True, max_length=200, null=True)),
+                ('lead_time_days', models.IntegerField(blank=True, null=True)),
+                ('quotation_created_at', models.DateTimeField()),
+                ('valid_from', models.DateTimeField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('product', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='quotations.product')),
+                ('vendor', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='quotations.vendor')),
+            ],
+            options={
+                'ordering': ['valid_from', 'id'],
+                'indexes': [models.Index(fields=['product', 'vendor', 'valid_from'], name='price_history_product_idx'), models.Index(fields=['quotation_id', 'valid_from'], name='price_history_quotation_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+
+def backfill_best_quotes(apps, schema_editor):
+    # Frozen copy of bestquotes.refresh_best_quotes at the time of this migration
+    Product = apps.get_model('quotations', 'Product')
+    Quotation = apps.get_model('quotations', 'Quotation')
+    ProductBestQuote = apps.get_model('quotations', 'ProductBestQuote')
+    products = list(Product.objects.order_by('id').values_list('id', 'company_id'))
+    for start in range(0, len(products), 500):
+        companies = dict(products[start:start + 500])
+        ranked = Quotation.objects.filter(
+            product_id__in=companies,
+            vendor__company_id=F('product__company_id'),
+            landing_price__isnull=False
+        ).annotate(
+            position=Window(
+                expression=RowNumber(),
+                partition_by=[F('product_id')],
+                order_by=[F('landing_price').asc(), F('created_at').desc(), F('id').desc()]
+            ),
+            quotation_count=Window(expression=Count('id'), partition_by=[F('product_id')]),
+        ).filter(position__lte=2).order_by('product_id', 'position').values(
+            'product_id', 'id', 'vendor_id', 'landing_price', 'product_price', 'lead_time_days', 'quotation_count'
+        )
+        top = {}
+        for row in ranked:
+            top.setdefault(row['product_id'], []).append(row)
+        rows = []
+        for product_id, (best, *rest) in top.items():
+            runner_up = rest[0] if rest else {}
+            rows.append(ProductBestQuote(
+                product_id=product_id,
+                company_id=companies[product_id],
+                best_quotation_id=best['id'],
+                best_vendor_id=best['vendor_id'],
+                best_landing_price=best['landing_price'],
+                best_product_price=best['product_price'],
+                best_lead_time_days=best['lead_time_days'],
+                runner_up_quotation_id=runner_up.get('id'),
+                runner_up_vendor_id=runner_up.get('vendor_id'),
+                runner_up_landing_price=runner_up.get('landing_price'),
+                runner_up_product_price=runner_up.get('product_price'),
+                runner_up_lead_time_days=runner_up.get('lead_time_days'),
+                quotation_count=best['quotation_count'],
+            ))
+        ProductBestQuote.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0016_quotationpricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductBestQuote',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='best_quote', serialize=False, to='quotations.product')),
+                ('best_quotation_id', models.BigIntegerField(db_index=True)),
+                ('best_landing_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('best_product_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('best_lead_time_days', models.IntegerField(blank=True, null=True)),
+                ('runner_up_quotation_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('runner_up_landing_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('runner_up_product_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('runner_up_lead_time_days', models.IntegerField(blank=True, null=True)),
+                ('quotation_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('best_vendor', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='quotations.vendor')),
+                ('company', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='quotations.company')),
+                ('runner_up_vendor', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='quotations.vendor')),
+            ],
+            options={
+                'ordering': ['product_id'],
+                'indexes': [models.Index(fields=['company', 'product'], name='best_quote_company_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_best_quotes, migrations.RunPython.noop),
+    ]
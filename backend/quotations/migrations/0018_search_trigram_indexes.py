@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+# (index name, table, column) for the postgres search backend
+TRIGRAM_INDEXES = [
+    ('product_name_trgm_idx', 'quotations_product', 'name'),
+    ('product_grade_spec_trgm_idx', 'quotations_product', 'grade_spec'),
+    ('product_category_trgm_idx', 'quotations_product', 'category'),
+    ('vendor_name_trgm_idx', 'quotations_vendor', 'name'),
+    ('vendor_city_trgm_idx', 'quotations_vendor', 'city'),
+    ('vendor_state_trgm_idx', 'quotations_vendor', 'state'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Only PostgreSQL has pg_trgm; other databases use the in-memory search index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # pg_trgm is a trusted extension (PostgreSQL 13+), so the database owner can create it
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0017_productbestquote'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
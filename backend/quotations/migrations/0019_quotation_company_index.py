@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:26
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_quotation_company(apps, schema_editor):
+    # Quotation listings now filter on quotation.company; take it from the vendor
+    Quotation = apps.get_model('quotations', 'Quotation')
+    Vendor = apps.get_model('quotations', 'Vendor')
+    Quotation.objects.filter(company__isnull=True).update(
+        company_id=Subquery(Vendor.objects.filter(id=OuterRef('vendor_id')).values('company_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0018_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_quotation_company, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='quotation',
+            name='quotation_created_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['company', '-created_at', '-id'], name='quotation_company_created_idx'),
+        ),
+    ]
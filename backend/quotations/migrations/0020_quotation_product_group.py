@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_quotation_product_group(apps, schema_editor):
+    Quotation = apps.get_model('quotations', 'Quotation')
+    Product = apps.get_model('quotations', 'Product')
+    Quotation.objects.filter(product__product_group__isnull=False).update(
+        product_group_id=Subquery(Product.objects.filter(id=OuterRef('product_id')).values('product_group_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotations', '0019_quotation_company_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotation',
+            name='product_group',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quotations', to='quotations.productgroup'),
+        ),
+        migrations.RunPython(backfill_quotation_product_group, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['company', 'product_group', '-created_at', '-id'], name='quotation_group_created_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from .states import normalize_state
 
 class UserProfile(models.Model):
     ROLE_CHOICES = [
@@ -46,6 +47,8 @@ class Vendor(models.Model):
     name = models.CharField(max_length=200)
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
+    # Normalized copy of state used for interstate classification, kept in sync on save
+    state_normalized = models.CharField(max_length=100, blank=True, default='', editable=False, db_index=True)
     rating = models.FloatField(null=True, blank=True)
     contact = models.CharField(max_length=200, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -53,10 +56,20 @@ class Vendor(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', '-created_at'], name='vendor_company_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.city}"
 
+    def save(self, *args, **kwargs):
+        self.state_normalized = normalize_state(self.state)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'state' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'state_normalized'}
+        super().save(*args, **kwargs)
+
 
 class ProductGroup(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='product_groups')
@@ -103,6 +116,9 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', '-created_at'], name='product_company_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.grade_spec})"
@@ -112,6 +128,10 @@ class Quotation(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='quotations', null=True, blank=True)
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='quotations')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='quotations')
+    # Copy of product.product_group so ?product_group_id= listings are served by an index
+    product_group = models.ForeignKey(
+        ProductGroup, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='quotations'
+    )
     product_price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.IntegerField(null=True, blank=True)
     delivery_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
@@ -125,22 +145,148 @@ class Quotation(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination key for a company's quotation listings
+            models.Index(fields=['company', '-created_at', '-id'], name='quotation_company_created_idx'),
+            models.Index(fields=['company', 'product_group', '-created_at', '-id'], name='quotation_group_created_idx'),
+            # QuotationViewSet ?product_id= / ?vendor_id= filters and the compare scan
+            models.Index(fields=['product', '-created_at', '-id'], name='quotation_product_created_idx'),
+            models.Index(fields=['vendor', '-created_at', '-id'], name='quotation_vendor_created_idx'),
+            # Newest quotation per (vendor, product): import upserts
+            models.Index(fields=['vendor', 'product', '-created_at', '-id'], name='quotation_vendor_product_idx'),
+        ]
 
     def __str__(self):
         return f"{self.vendor.name} - {self.product.name} - ₹{self.product_price}"
     
-    def save(self, *args, **kwargs):
+    def calculate_landing_prices(self):
         # Auto-calculate total landing price and landing price per kg
         if self.product_price and self.quantity and self.delivery_price is not None:
             self.total_landing_price = (self.product_price * self.quantity) + self.delivery_price
             if self.quantity > 0:
                 self.landing_price = self.total_landing_price / self.quantity
+
+    def save(self, *args, **kwargs):
+        self.calculate_landing_prices()
+        # Listings filter on the quotation's own company column; it follows the vendor
+        if self.company_id is None and self.vendor_id is not None:
+            self.company_id = self.vendor.company_id
+        if self.product_id is not None:
+            self.product_group_id = self.product.product_group_id
         super().save(*args, **kwargs)
 
 
+class QuotationPriceHistory(models.Model):
+    """
+    Append-only log of quotation values. A row is added on every quotation
+    save (and bulk write), and a ``deleted`` tombstone on delete; rows are
+    never updated. The row in effect at a moment is the latest one per
+    quotation with ``valid_from`` at or before it.
+    """
+    # Plain ids without constraints: history outlives the quotation, vendor and product
+    quotation_id = models.BigIntegerField()
+    vendor = models.ForeignKey(Vendor, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    # price_history_product_idx leads with product, so no separate FK index
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    product_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    quantity = models.IntegerField(null=True, blank=True)
+    delivery_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    total_landing_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    landing_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    kilo_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    grade_spec = models.CharField(max_length=200, null=True, blank=True)
+    lead_time_days = models.IntegerField(null=True, blank=True)
+    # The quotation's own created_at, which breaks ranking ties like the live compare
+    quotation_created_at = models.DateTimeField()
+    valid_from = models.DateTimeField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['valid_from', 'id']
+        indexes = [
+            # As-of compares: a product's history up to a moment
+            models.Index(fields=['product', 'vendor', 'valid_from'], name='price_history_product_idx'),
+            # Latest row per quotation at a moment, and one quotation's price trend
+            models.Index(fields=['quotation_id', 'valid_from'], name='price_history_quotation_idx'),
+        ]
+
+    def __str__(self):
+        return f"Quotation {self.quotation_id} from {self.valid_from}"
+
+
+class ProductBestQuote(models.Model):
+    """
+    Derived table: the cheapest quotation by ``landing_price`` for each
+    product, plus the runner-up, among quotations from the product's
+    company's vendors. Maintained by ``bestquotes.refresh_best_quotes`` from
+    quotation signals; ``manage.py rebuild_best_quotes`` recomputes it.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='best_quote')
+    # best_quote_company_idx leads with company, so no separate FK index
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, db_index=False, related_name='+')
+    # Quotation values are copied so reads only join products and vendors; the
+    # refresh after a quotation change or delete keeps them current. The ids are
+    # indexed to find the products a moved or deleted quotation led
+    best_quotation_id = models.BigIntegerField(db_index=True)
+    best_vendor = models.ForeignKey(Vendor, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    best_landing_price = models.DecimalField(max_digits=10, decimal_places=2)
+    best_product_price = models.DecimalField(max_digits=10, decimal_places=2)
+    best_lead_time_days = models.IntegerField(null=True, blank=True)
+    runner_up_quotation_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    runner_up_vendor = models.ForeignKey(
+        Vendor, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    runner_up_landing_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    runner_up_product_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    runner_up_lead_time_days = models.IntegerField(null=True, blank=True)
+    quotation_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['product_id']
+        indexes = [
+            # /api/best-quotes/: one range scan per company in product order
+            models.Index(fields=['company', 'product'], name='best_quote_company_idx'),
+        ]
+
+    def __str__(self):
+        return f"Best quote for product {self.product_id}: {self.best_landing_price}"
+
+
+class CompareJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='compare_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    lines = models.JSONField()
+    total_lines = models.IntegerField(default=0)
+    completed_lines = models.IntegerField(default=0)
+    failed_lines = models.IntegerField(default=0)
+    line_errors = models.JSONField(default=list, blank=True)
+    error = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Compare job {self.id} ({self.status})"
+
+
 class OrderRequest(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='order_requests')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='order_requests')
+    job = models.ForeignKey(CompareJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_requests')
     order_qty = models.IntegerField()
     delivery_location = models.CharField(max_length=200)
     required_date = models.DateField()
@@ -149,6 +295,9 @@ class OrderRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['company', '-created_at'], name='order_company_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.product.name} x {self.order_qty}"
@@ -162,10 +311,27 @@ class ComparisonResult(models.Model):
     total_order_cost = models.DecimalField(max_digits=12, decimal_places=2)
     score = models.FloatField()
     rank = models.IntegerField()
+    # Vendor and quotation values as they were at compare time; later edits
+    # to the vendor or quotation do not change comparison history
+    vendor_name = models.CharField(max_length=200, blank=True, default='')
+    vendor_city = models.CharField(max_length=100, blank=True, default='')
+    vendor_state = models.CharField(max_length=100, blank=True, default='')
+    product_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    delivery_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    kilo_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    grade_spec = models.CharField(max_length=200, null=True, blank=True)
+    lead_time_days = models.IntegerField(null=True, blank=True)
+    is_interstate = models.BooleanField(null=True, blank=True)
+    base_delivery_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    adjusted_delivery_price = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['rank']
+        indexes = [
+            # Ranked history of one order request, and its keyset pagination key
+            models.Index(fields=['order_request', 'rank', 'id'], name='comparison_order_rank_idx'),
+        ]
 
     def __str__(self):
-        return f"Rank {self.rank}: {self.vendor.name} - ₹{self.total_order_cost}"
+        return f"Rank {self.rank}: {self.vendor_name or self.vendor.name} - ₹{self.total_order_cost}"
@@ -0,0 +1,390 @@
+import re
+import sys
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from .conditional import VERSION_CACHE_ALIAS
+from .models import Product, Vendor
+
+
+# Indexed text fields per document type, name first (it labels the result)
+SEARCH_FIELDS = {
+    'product': ('name', 'grade_spec', 'category'),
+    'vendor': ('name', 'city', 'state'),
+}
+SEARCH_MODELS = {'product': Product, 'vendor': Vendor}
+
+# Vocabulary entries read per query token; very short prefixes stop here
+PREFIX_SCAN_LIMIT = 500
+# Documents checked per query, and matching documents ranked: limit x
+# CANDIDATE_FACTOR, at least CANDIDATE_MINIMUM
+CANDIDATE_SCAN_LIMIT = 5000
+CANDIDATE_FACTOR = 5
+CANDIDATE_MINIMUM = 50
+# Trigrams shared by more words than this are skipped when looking for
+# misspellings (like stop words), unless every trigram of the word is that common
+TRIGRAM_POSTING_LIMIT = 2000
+# pg_trgm-style similarity a vocabulary word needs to stand in for a misspelt one
+TRIGRAM_THRESHOLD = 0.4
+
+# Token weights: exact word, word prefix, misspelling (times its similarity)
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.9
+FUZZY_WEIGHT = 0.8
+# Matches in the name, and fields starting with the whole query, rank higher
+NAME_BONUS = 0.25
+PHRASE_BONUS = 0.5
+
+_token_re = re.compile(r'[0-9a-z]+')
+
+
+def tokenize(text):
+    return [sys.intern(token) for token in _token_re.findall(text.lower())] if text else []
+
+
+def trigrams(word):
+    """pg_trgm-style trigrams of one word, padded with two spaces in front and one behind."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Document:
+    __slots__ = ('kind', 'pk', 'company_id', 'values', 'field_tokens')
+
+    def __init__(self, kind, pk, company_id, values):
+        self.kind = kind
+        self.pk = pk
+        self.company_id = company_id
+        self.values = tuple(values)
+        self.field_tokens = tuple(tuple(tokenize(value)) for value in self.values)
+
+    @property
+    def tokens(self):
+        return {token for tokens in self.field_tokens for token in tokens}
+
+    def result(self, score, matched_field):
+        return {
+            'type': self.kind, 'id': self.pk, 'score': round(score, 3), 'matched_field': matched_field,
+            **dict(zip(SEARCH_FIELDS[self.kind], self.values)),
+        }
+
+
+class MemorySearchIndex:
+    """
+    In-process prefix and trigram index over product and vendor text fields.
+
+    Distinct words form a sorted vocabulary, each with the set of documents
+    containing it, so a prefix lookup is a bisect plus a short scan of the
+    vocabulary. Alphabetic words also have trigram postings, used to find
+    the vocabulary words a misspelt query word most likely meant. A query is
+    driven by its most selective word, the other words' document sets are
+    intersected with it, and a bounded window of matches is ranked.
+
+    The index loads on first use and then follows Product/Vendor signals. A
+    counter in the 'default' cache tells other processes to reload when they
+    missed a change; that only reaches them through a shared cache
+    (REDIS_URL). With the per-process LocMem default, run a single process
+    or use the postgres backend, or other processes keep a stale index.
+    """
+    VERSION_KEY = 'search:version'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._seen_version = None
+        self._reset()
+
+    def _reset(self):
+        self._docs = {}
+        self._slots = {}
+        self._next_slot = 0
+        self._vocabulary = []
+        self._word_docs = {}
+        self._gram_words = defaultdict(set)
+
+    # -- maintenance --------------------------------------------------------
+
+    def _shared_version(self):
+        return caches[VERSION_CACHE_ALIAS].get(self.VERSION_KEY, 0)
+
+    def _bump_shared_version(self):
+        cache = caches[VERSION_CACHE_ALIAS]
+        cache.add(self.VERSION_KEY, 0, timeout=None)
+        try:
+            return cache.incr(self.VERSION_KEY)
+        except ValueError:
+            return None
+
+    def load(self):
+        """(Re)build the whole index from the database."""
+        with self._lock:
+            version = self._shared_version()
+            self._reset()
+            for kind, model in SEARCH_MODELS.items():
+                rows = model.objects.order_by().values_list('id', 'company_id', *SEARCH_FIELDS[kind])
+                for pk, company_id, *values in rows.iterator(chunk_size=5000):
+                    self._add(Document(kind, pk, company_id, values), sort=False)
+            self._vocabulary.sort()
+            self._seen_version = version
+            self._loaded = True
+
+    def _ensure_current(self):
+        if not self._loaded or self._shared_version() != self._seen_version:
+            self.load()
+
+    def _add(self, doc, sort=True):
+        slot = self._next_slot
+        self._next_slot += 1
+        self._docs[slot] = doc
+        self._slots[(doc.kind, doc.pk)] = slot
+        for word in doc.tokens:
+            docs = self._word_docs.get(word)
+            if docs is None:
+                docs = self._word_docs[word] = set()
+                if sort:
+                    insort(self._vocabulary, word)
+                else:
+                    self._vocabulary.append(word)
+                # Codes and numbers are found by prefix; only words get spelling help
+                if word.isalpha():
+                    for gram in trigrams(word):
+                        self._gram_words[gram].add(word)
+            docs.add(slot)
+
+    def _remove(self, kind, pk):
+        slot = self._slots.pop((kind, pk), None)
+        if slot is None:
+            return
+        doc = self._docs.pop(slot)
+        for word in doc.tokens:
+            docs = self._word_docs[word]
+            docs.discard(slot)
+            if docs:
+                continue
+            del self._word_docs[word]
+            del self._vocabulary[bisect_left(self._vocabulary, word)]
+            if word.isalpha():
+                for gram in trigrams(word):
+                    words = self._gram_words[gram]
+                    words.discard(word)
+                    if not words:
+                        del self._gram_words[gram]
+
+    def _apply(self, change):
+        with self._lock:
+            if self._loaded:
+                change()
+            version = self._bump_shared_version()
+            if self._loaded and version is not None:
+                if version == self._seen_version + 1:
+                    self._seen_version = version
+                else:
+                    # Another process changed the data too; reload on next search
+                    self._loaded = False
+
+    def update(self, kind, instance):
+        """Re-index a saved product or vendor once the transaction commits."""
+        doc = Document(kind, instance.pk, instance.company_id,
+                       [getattr(instance, field) for field in SEARCH_FIELDS[kind]])
+
+        def change():
+            self._remove(kind, instance.pk)
+            self._add(doc)
+        transaction.on_commit(lambda: self._apply(change))
+
+    def remove(self, kind, pk):
+        """Drop a deleted product or vendor once the transaction commits."""
+        transaction.on_commit(lambda: self._apply(lambda: self._remove(kind, pk)))
+
+    # -- queries ------------------------------------------------------------
+
+    def _expand(self, token):
+        """
+        Vocabulary words ``token`` stands for, with their weights, and whether
+        that is all of them (very short prefixes stop at ``PREFIX_SCAN_LIMIT``).
+        """
+        words = {}
+        vocabulary = self._vocabulary
+        index = bisect_left(vocabulary, token)
+        end = min(index + PREFIX_SCAN_LIMIT, len(vocabulary))
+        while index < end and vocabulary[index].startswith(token):
+            word = vocabulary[index]
+            words[word] = EXACT_WEIGHT if word == token else PREFIX_WEIGHT
+            index += 1
+        if words or len(token) < 3 or not token.isalpha():
+            complete = index == len(vocabulary) or not vocabulary[index].startswith(token)
+            return words, complete
+
+        # No word starts with it: look for words it is a misspelling of
+        grams = trigrams(token)
+        postings = sorted((self._gram_words.get(gram, ()) for gram in grams), key=len)
+        usable = [words for words in postings if len(words) <= TRIGRAM_POSTING_LIMIT] or postings[:1]
+        shared = Counter()
+        for candidates in usable:
+            shared.update(candidates)
+        for word, count in shared.items():
+            similarity = count / (len(grams) + len(word) + 2 - count)
+            if similarity >= TRIGRAM_THRESHOLD:
+                words[word] = FUZZY_WEIGHT * similarity
+        return words, True
+
+    def search(self, query, company_id=None, kinds=None, limit=10):
+        """
+        Ranked matches for ``query``: documents with a word matching every
+        query word, where a query word matches words it prefixes or, failing
+        that, words it is a likely misspelling of.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        phrase = ' '.join(tokens)
+
+        with self._lock:
+            self._ensure_current()
+            expanded = [self._expand(token) for token in tokens]
+            expansions = [words for words, _ in expanded]
+            if not all(expansions):
+                return []
+
+            # The query word matching the fewest documents drives the scan; the
+            # others become set intersections when their document sets are known
+            word_docs = self._word_docs
+            sizes = [sum(len(word_docs[word]) for word in words) for words in expansions]
+            driver = sizes.index(min(sizes))
+            filters = [
+                set().union(*(word_docs[word] for word in words))
+                for position, (words, complete) in enumerate(expanded)
+                if position != driver and complete
+            ]
+            filters.sort(key=len)
+
+            candidates, seen = [], set()
+            wanted = max(limit * CANDIDATE_FACTOR, CANDIDATE_MINIMUM)
+            scanned = 0
+            # Exact words first, then prefixes, then misspellings
+            for word, _ in sorted(expansions[driver].items(), key=lambda item: (-item[1], item[0])):
+                slots = word_docs[word]
+                for matching in filters:
+                    slots = slots & matching
+                for slot in slots:
+                    if slot in seen:
+                        continue
+                    seen.add(slot)
+                    scanned += 1
+                    doc = self._docs[slot]
+                    if (kinds is not None and doc.kind not in kinds) or (
+                        company_id is not None and doc.company_id != company_id
+                    ):
+                        continue
+                    ranked = self._score(doc, tokens, expansions, phrase)
+                    if ranked is not None:
+                        candidates.append(ranked)
+                        if len(candidates) >= wanted:
+                            break
+                    if scanned >= CANDIDATE_SCAN_LIMIT:
+                        break
+                if len(candidates) >= wanted or scanned >= CANDIDATE_SCAN_LIMIT:
+                    break
+
+            candidates.sort(key=lambda item: (-item[0], item[1].values[0] or '', item[1].kind, item[1].pk))
+            return [doc.result(score, field) for score, doc, field in candidates[:limit]]
+
+    @staticmethod
+    def _score(doc, tokens, expansions, phrase):
+        # Per field, the best weight of each query word; every word must match
+        # somewhere. Returns (score, doc, matched field) or None.
+        fields = SEARCH_FIELDS[doc.kind]
+        best = [0.0] * len(tokens)
+        best_field, best_field_score, phrase_bonus = None, 0.0, 0.0
+        for field, field_tokens in zip(fields, doc.field_tokens):
+            if not field_tokens:
+                continue
+            field_score = 0.0
+            for position, token in enumerate(tokens):
+                expansion = expansions[position]
+                weight = 0.0
+                for word in field_tokens:
+                    if word.startswith(token):
+                        weight = EXACT_WEIGHT if word == token else max(weight, PREFIX_WEIGHT)
+                        if weight == EXACT_WEIGHT:
+                            break
+                    else:
+                        weight = max(weight, expansion.get(word, 0.0))
+                if weight:
+                    field_score += weight
+                    if weight > best[position]:
+                        best[position] = weight
+            if field_score > best_field_score:
+                best_field, best_field_score = field, field_score
+            if not phrase_bonus and ' '.join(field_tokens).startswith(phrase):
+                phrase_bonus = PHRASE_BONUS
+        if not all(best):
+            return None
+
+        score = 1 + sum(best) / len(tokens) + phrase_bonus
+        if best_field == fields[0]:
+            score += NAME_BONUS
+        return score, doc, best_field
+
+
+class PostgresSearchIndex:
+    """
+    Trigram search in PostgreSQL (pg_trgm): word similarity over the same
+    fields, answered from the GIN indexes added by migration 0018. Nothing
+    is held in memory, so there is nothing to keep in sync.
+    """
+
+    def update(self, kind, instance):
+        pass
+
+    def remove(self, kind, pk):
+        pass
+
+    def search(self, query, company_id=None, kinds=None, limit=10):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        from django.db.models.functions import Greatest
+
+        query = query.strip()
+        if not query:
+            return []
+        results = []
+        for kind, fields in SEARCH_FIELDS.items():
+            if kinds is not None and kind not in kinds:
+                continue
+            queryset = SEARCH_MODELS[kind].objects.all()
+            if company_id is not None:
+                queryset = queryset.filter(company_id=company_id)
+            similarities = {f'score_{field}': TrigramWordSimilarity(query, field) for field in fields}
+            rows = queryset.filter(
+                reduce(or_, [Q(**{f'{field}__trigram_word_similar': query}) for field in fields])
+            ).annotate(**similarities).annotate(
+                score=Greatest(*similarities)
+            ).order_by('-score', 'name').values('id', 'score', *fields, *similarities)[:limit]
+            for row in rows:
+                matched_field = max(fields, key=lambda field: row[f'score_{field}'] or 0)
+                results.append({
+                    'type': kind, 'id': row['id'], 'score': round(row['score'], 3),
+                    'matched_field': matched_field, **{field: row[field] for field in fields},
+                })
+        results.sort(key=lambda result: -result['score'])
+        return results[:limit]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """The process-wide index for ``settings.SEARCH_BACKEND`` ('memory' or 'postgres')."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PostgresSearchIndex() if settings.SEARCH_BACKEND == 'postgres' else MemorySearchIndex()
+    return _index
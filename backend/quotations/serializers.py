@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Company, Vendor, Product, Quotation, OrderRequest, ComparisonResult, UserProfile, ProductGroup, ProductCategory
+from .models import Company, Vendor, Product, Quotation, OrderRequest, ComparisonResult, UserProfile, ProductGroup, ProductCategory, CompareJob, QuotationPriceHistory, ProductBestQuote
+from .fieldsets import DynamicFieldsMixin
 
 
 class CompanySerializer(serializers.ModelSerializer):
@@ -19,6 +20,9 @@ class ProductGroupSerializer(serializers.ModelSerializer):
         fields = '__all__'
     
     def get_product_count(self, obj):
+        # Annotated by the viewset queryset; fall back to a count for single objects
+        if hasattr(obj, 'product_count'):
+            return obj.product_count
         return obj.products.count()
 
 
@@ -32,19 +36,37 @@ class ProductCategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
     
     def get_product_count(self, obj):
+        # Annotated by the viewset queryset; fall back to a count for single objects
+        if hasattr(obj, 'product_count'):
+            return obj.product_count
         return obj.products.count()
 
 
-class VendorSerializer(serializers.ModelSerializer):
+class ProductGroupSummarySerializer(serializers.ModelSerializer):
+    # Nested form for ?expand=product_group (no per-row product count)
+    class Meta:
+        model = ProductGroup
+        fields = ['id', 'name', 'description']
+
+
+class ProductCategorySummarySerializer(serializers.ModelSerializer):
+    # Nested form for ?expand=product_category (no per-row product count)
+    class Meta:
+        model = ProductCategory
+        fields = ['id', 'name', 'description']
+
+
+class VendorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.name', read_only=True)
     company = serializers.PrimaryKeyRelatedField(queryset=Company.objects.all(), required=False)
     
     class Meta:
         model = Vendor
         fields = '__all__'
+        expandable_fields = {'company': CompanySerializer}
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.name', read_only=True)
     product_group_name = serializers.CharField(source='product_group.name', read_only=True)
     product_category_name = serializers.CharField(source='product_category.name', read_only=True)
@@ -53,9 +75,14 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+        expandable_fields = {
+            'company': CompanySerializer,
+            'product_group': ProductGroupSummarySerializer,
+            'product_category': ProductCategorySummarySerializer,
+        }
 
 
-class QuotationSerializer(serializers.ModelSerializer):
+class QuotationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     vendor_name = serializers.CharField(source='vendor.name', read_only=True)
     vendor_city = serializers.CharField(source='vendor.city', read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -63,39 +90,152 @@ class QuotationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Quotation
+        # product_group is an internal copy of the product's group (product_group_name covers it)
+        exclude = ('product_group',)
+        expandable_fields = {'vendor': VendorSerializer, 'product': ProductSerializer}
+
+
+class QuotationPriceHistorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuotationPriceHistory
+        fields = '__all__'
+
+
+class ProductBestQuoteSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    best_vendor_name = serializers.CharField(source='best_vendor.name', read_only=True)
+    runner_up_vendor_name = serializers.CharField(source='runner_up_vendor.name', read_only=True, allow_null=True)
+
+    class Meta:
+        model = ProductBestQuote
         fields = '__all__'
 
 
-class OrderRequestSerializer(serializers.ModelSerializer):
+class OrderRequestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     company_name = serializers.CharField(source='company.name', read_only=True)
     
     class Meta:
         model = OrderRequest
         fields = '__all__'
+        expandable_fields = {'product': ProductSerializer, 'company': CompanySerializer}
 
 
-class ComparisonResultSerializer(serializers.ModelSerializer):
-    vendor_name = serializers.CharField(source='vendor.name', read_only=True)
-    vendor_city = serializers.CharField(source='vendor.city', read_only=True)
-    vendor_state = serializers.CharField(source='vendor.state', read_only=True)
-    product_price = serializers.DecimalField(source='quotation.product_price', max_digits=10, decimal_places=2, read_only=True)
-    delivery_price = serializers.DecimalField(source='quotation.delivery_price', max_digits=10, decimal_places=2, read_only=True)
-    kilo_price = serializers.DecimalField(source='quotation.kilo_price', max_digits=10, decimal_places=2, read_only=True)
-    grade_spec = serializers.CharField(source='quotation.grade_spec', read_only=True)
-    lead_time_days = serializers.IntegerField(source='quotation.lead_time_days', read_only=True)
-    
+class ComparisonResultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Vendor and quotation fields are snapshot columns, so no joins are needed
     class Meta:
         model = ComparisonResult
-        fields = '__all__'
+        fields = [
+            'id', 'vendor_name', 'vendor_city', 'vendor_state', 'product_price', 'delivery_price',
+            'kilo_price', 'grade_spec', 'lead_time_days', 'total_cost_per_unit', 'total_order_cost',
+            'score', 'rank', 'created_at', 'order_request', 'vendor', 'quotation',
+            'is_interstate', 'base_delivery_price', 'adjusted_delivery_price'
+        ]
+        expandable_fields = {
+            'order_request': OrderRequestSerializer,
+            'vendor': VendorSerializer,
+            'quotation': QuotationSerializer,
+        }
 
 
 class CompareVendorsInputSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
-    order_qty = serializers.IntegerField()
+    order_qty = serializers.IntegerField(min_value=1)
     delivery_location = serializers.CharField(max_length=200)
     required_date = serializers.DateField(required=False)
     company_id = serializers.IntegerField(required=False)
+    persist = serializers.BooleanField(required=False, default=True)
+    top_k = serializers.IntegerField(required=False, min_value=1)
+    offset = serializers.IntegerField(required=False, min_value=0, default=0)
+    # Rank prices as they stood at this moment (price history); always a preview
+    as_of = serializers.DateTimeField(required=False)
+
+
+class CompareBatchLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    order_qty = serializers.IntegerField(min_value=1)
+    delivery_location = serializers.CharField(max_length=200)
+    required_date = serializers.DateField(required=False)
+
+
+class CompareBatchInputSerializer(serializers.Serializer):
+    lines = CompareBatchLineSerializer(many=True, allow_empty=False)
+    persist = serializers.BooleanField(required=False, default=True)
+
+
+class CompareSweepInputSerializer(serializers.Serializer):
+    MAX_QUANTITIES = 1000
+
+    product_id = serializers.IntegerField()
+    delivery_location = serializers.CharField(max_length=200)
+    quantities = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    qty_from = serializers.IntegerField(min_value=1, required=False)
+    qty_to = serializers.IntegerField(min_value=1, required=False)
+    qty_step = serializers.IntegerField(min_value=1, required=False, default=1)
+    top_k = serializers.IntegerField(min_value=1, required=False, default=5)
+
+    def validate(self, data):
+        if 'quantities' not in data:
+            if 'qty_from' not in data or 'qty_to' not in data:
+                raise serializers.ValidationError("Provide either quantities or qty_from and qty_to")
+            if data['qty_to'] < data['qty_from']:
+                raise serializers.ValidationError("qty_to must be greater than or equal to qty_from")
+            quantities = range(data['qty_from'], data['qty_to'] + 1, data['qty_step'])
+            # Checked on the range so an oversized sweep is never materialized
+            if len(quantities) > self.MAX_QUANTITIES:
+                raise serializers.ValidationError(f"A sweep can cover at most {self.MAX_QUANTITIES} quantities")
+            data['quantities'] = list(quantities)
+        if len(set(data['quantities'])) > self.MAX_QUANTITIES:
+            raise serializers.ValidationError(f"A sweep can cover at most {self.MAX_QUANTITIES} quantities")
+        return data
+
+
+class BasketLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    order_qty = serializers.IntegerField(min_value=1)
+
+
+class BasketInputSerializer(serializers.Serializer):
+    lines = BasketLineSerializer(many=True, allow_empty=False, max_length=1000)
+    delivery_location = serializers.CharField(max_length=200)
+    time_limit_ms = serializers.IntegerField(min_value=10, max_value=30000, required=False, default=2000)
+
+
+class CompareJobInputSerializer(serializers.Serializer):
+    lines = CompareBatchLineSerializer(many=True, required=False, allow_empty=False)
+    product_group_id = serializers.IntegerField(required=False)
+    order_qty = serializers.IntegerField(min_value=1, required=False)
+    delivery_location = serializers.CharField(max_length=200, required=False)
+    required_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if 'lines' in data:
+            return data
+        missing = [f for f in ('product_group_id', 'order_qty', 'delivery_location') if f not in data]
+        if missing:
+            raise serializers.ValidationError(
+                "Provide lines, or product_group_id with order_qty and delivery_location"
+            )
+        return data
+
+
+class QuotationImportInputSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    mode = serializers.ChoiceField(choices=['create', 'upsert'], default='create')
+    atomic = serializers.BooleanField(default=False)
+
+
+class CompareJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CompareJob
+        exclude = ['lines']
+
+    def get_progress(self, obj):
+        if not obj.total_lines:
+            return 100.0
+        return round(obj.completed_lines * 100 / obj.total_lines, 1)
 
 
 class UserSerializer(serializers.ModelSerializer):
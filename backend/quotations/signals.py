@@ -1,7 +1,21 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import Signal, receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, Quotation, Vendor, Company, Product, ProductGroup, ProductCategory, OrderRequest
+from .bestquotes import schedule_best_quote_refresh
+from .cache import bump_quotation_versions
+from .conditional import bump_model_version
+from .history import (
+    forget_recorded_deletes, record_deleted_quotations, record_quotation_history, take_recorded_delete
+)
+from .search import get_search_index
+from .tenancy import invalidate_company
+
+
+# Sent by bulk quotation writes (imports, /api/quotations/bulk/), which skip
+# post_save, with the lists of created and updated Quotation instances and the
+# ids of every product whose quotations changed
+quotations_bulk_changed = Signal()
 
 
 @receiver(post_save, sender=User)
@@ -14,3 +28,118 @@ def create_user_profile(sender, instance, created, **kwargs):
 def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+
+@receiver(post_save, sender=Quotation)
+@receiver(post_delete, sender=Quotation)
+def invalidate_quotation_compare_cache(sender, instance, **kwargs):
+    bump_quotation_versions([instance.product_id])
+
+
+@receiver(post_save, sender=Quotation)
+def record_saved_quotation_history(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_quotation_history([instance])
+
+
+@receiver(post_delete, sender=Quotation)
+def record_deleted_quotation_history(sender, instance, **kwargs):
+    if not take_recorded_delete(instance.pk):
+        record_quotation_history([instance], deleted=True)
+
+
+@receiver(pre_delete, sender=Vendor)
+@receiver(pre_delete, sender=Product)
+def record_cascaded_quotation_history(sender, instance, **kwargs):
+    # The cascade deletes these next; tombstone them in one insert rather than
+    # one per quotation post_delete
+    record_deleted_quotations(Quotation.objects.filter(**{sender._meta.model_name: instance}))
+
+
+@receiver(post_delete, sender=Vendor)
+@receiver(post_delete, sender=Product)
+def end_cascaded_quotation_history(sender, instance, **kwargs):
+    forget_recorded_deletes()
+
+
+@receiver(quotations_bulk_changed)
+def record_bulk_quotation_history(sender, created, updated, **kwargs):
+    record_quotation_history([*created, *updated])
+
+
+@receiver(post_save, sender=Quotation)
+@receiver(post_delete, sender=Quotation)
+def refresh_quotation_best_quote(sender, instance, **kwargs):
+    # Only this product is recomputed, plus any it left after a product change
+    schedule_best_quote_refresh([instance.product_id], quotation_id=instance.pk)
+
+
+@receiver(quotations_bulk_changed)
+def refresh_bulk_best_quotes(sender, product_ids, **kwargs):
+    schedule_best_quote_refresh(product_ids)
+
+
+@receiver(quotations_bulk_changed)
+def invalidate_bulk_quotation_caches(sender, product_ids, **kwargs):
+    bump_quotation_versions(product_ids)
+    bump_model_version(Quotation)
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_vendor_compare_cache(sender, instance, **kwargs):
+    # Vendor state feeds the interstate surcharge for every product it quotes
+    bump_quotation_versions(
+        Quotation.objects.filter(vendor_id=instance.pk).values_list('product_id', flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=Product)
+def copy_product_group_to_quotations(sender, instance, created, raw=False, **kwargs):
+    # Quotation.product_group mirrors its product's group for indexed listings
+    if created or raw:
+        return
+    Quotation.objects.filter(product_id=instance.pk).exclude(
+        product_group_id=instance.product_group_id
+    ).update(product_group_id=instance.product_group_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Vendor)
+def index_for_search(sender, instance, **kwargs):
+    get_search_index().update(sender._meta.model_name, instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Vendor)
+def remove_from_search(sender, instance, **kwargs):
+    get_search_index().remove(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_cached_company(sender, instance, **kwargs):
+    invalidate_company(instance.id)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=ProductGroup)
+@receiver(post_delete, sender=ProductGroup)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Quotation)
+@receiver(post_delete, sender=Quotation)
+@receiver(post_save, sender=OrderRequest)
+@receiver(post_delete, sender=OrderRequest)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_conditional_get_version(sender, instance, **kwargs):
+    # Collection ETags include these versions; see ConditionalGetMixin
+    bump_model_version(sender)
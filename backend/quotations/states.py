@@ -0,0 +1,51 @@
+# Common state mappings (Indian states), compiled once at import
+STATE_MAPPINGS = {
+    'ap': 'andhra pradesh',
+    'ar': 'arunachal pradesh',
+    'as': 'assam',
+    'br': 'bihar',
+    'cg': 'chhattisgarh',
+    'ga': 'goa',
+    'gj': 'gujarat',
+    'hr': 'haryana',
+    'hp': 'himachal pradesh',
+    'jk': 'jammu and kashmir',
+    'jh': 'jharkhand',
+    'ka': 'karnataka',
+    'kl': 'kerala',
+    'mp': 'madhya pradesh',
+    'mh': 'maharashtra',
+    'mn': 'manipur',
+    'ml': 'meghalaya',
+    'mz': 'mizoram',
+    'nl': 'nagaland',
+    'or': 'odisha',
+    'pb': 'punjab',
+    'rj': 'rajasthan',
+    'sk': 'sikkim',
+    'tn': 'tamil nadu',
+    'tg': 'telangana',
+    'tr': 'tripura',
+    'up': 'uttar pradesh',
+    'uk': 'uttarakhand',
+    'wb': 'west bengal',
+    'dl': 'delhi',
+    'dd': 'daman and diu',
+    'dn': 'dadra and nagar haveli',
+    'ld': 'lakshadweep',
+    'py': 'puducherry',
+}
+
+
+def normalize_state(state_str):
+    """
+    Normalize state name to handle abbreviations and formatting variations.
+    Returns lowercase normalized state name for comparison.
+    """
+    if not state_str:
+        return ''
+
+    normalized = state_str.strip().lower()
+
+    # If it's an abbreviation, expand it
+    return STATE_MAPPINGS.get(normalized, normalized)
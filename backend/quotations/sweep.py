@@ -0,0 +1,93 @@
+from decimal import Decimal
+import numpy as np
+from .comparison import INTERSTATE_SURCHARGE, SURCHARGE_DENOMINATOR, SURCHARGE_NUMERATOR
+from .states import normalize_state
+
+
+# Integer cost keys are in paise x SURCHARGE_DENOMINATOR
+COST_KEY_SCALE = Decimal(100 * SURCHARGE_DENOMINATOR)
+CENT = Decimal('0.01')
+
+
+def _cents(values):
+    return np.rint(np.asarray(values, dtype=np.float64) * 100).astype(np.int64)
+
+
+def sweep_quantities(quotations, quantities, delivery_location, top_k=None):
+    """
+    Rank every quotation at every order quantity in one vectorized pass.
+
+    ``quotations`` is a sequence of dicts from ``Quotation.objects.values()``
+    (with ``vendor__name`` and ``vendor__state_normalized``) in the queryset's
+    newest-first order, limited to rows with a delivery price and lead time.
+    Costs are compared as exact integer keys (the same key as the database
+    ranker), so the ordering and tie-breaks match ``compare_vendors``.
+
+    Returns (curve, break_points): the ranked vendors per quantity and the
+    quantities at which the winning quotation changes.
+    """
+    quantities = sorted(set(quantities))
+    if not quotations or not quantities:
+        return [], []
+
+    delivery_state_normalized = normalize_state(delivery_location)
+    interstate = np.array(
+        [q['vendor__state_normalized'] != delivery_state_normalized for q in quotations]
+    )
+    price_cents = _cents([q['product_price'] for q in quotations])
+    delivery_cents = _cents([q['delivery_price'] for q in quotations])
+    lead_time = np.array([q['lead_time_days'] for q in quotations], dtype=np.int64)
+    position = np.arange(len(quotations))
+
+    # (quantities x quotations) matrix of exact total order cost keys
+    qty = np.array(quantities, dtype=np.int64)[:, None]
+    delivery_key = delivery_cents * np.where(interstate, SURCHARGE_NUMERATOR, SURCHARGE_DENOMINATOR)
+    cost_key = price_cents * qty * SURCHARGE_DENOMINATOR + delivery_key
+
+    # Sort each row by cost, then lead time, then queryset order (last key is primary)
+    shape = cost_key.shape
+    order = np.lexsort((
+        np.broadcast_to(position, shape),
+        np.broadcast_to(lead_time, shape),
+        cost_key,
+    ), axis=-1)
+    if top_k is not None:
+        order = order[:, :top_k]
+
+    curve = []
+    break_points = []
+    previous_winner = None
+
+    for row, order_qty in enumerate(quantities):
+        rankings = []
+        for rank, index in enumerate(order[row], start=1):
+            quotation = quotations[index]
+            total_order_cost = Decimal(int(cost_key[row, index])) / COST_KEY_SCALE
+            base_delivery_price = quotation['delivery_price']
+            rankings.append({
+                'rank': rank,
+                'quotation': quotation['id'],
+                'vendor': quotation['vendor_id'],
+                'vendor_name': quotation['vendor__name'],
+                'is_interstate': bool(interstate[index]),
+                'product_price': str(quotation['product_price'].quantize(CENT)),
+                'adjusted_delivery_price': str(
+                    base_delivery_price * INTERSTATE_SURCHARGE if interstate[index] else base_delivery_price
+                ),
+                'total_cost_per_unit': str((total_order_cost / order_qty).quantize(CENT)),
+                'total_order_cost': str(total_order_cost.quantize(CENT)),
+                'lead_time_days': quotation['lead_time_days'],
+            })
+
+        winner = rankings[0]
+        if previous_winner is not None and winner['quotation'] != previous_winner['quotation']:
+            break_points.append({
+                'order_qty': order_qty,
+                'previous_winner': {k: previous_winner[k] for k in ('quotation', 'vendor', 'vendor_name')},
+                'winner': {k: winner[k] for k in ('quotation', 'vendor', 'vendor_name')},
+            })
+        previous_winner = winner
+
+        curve.append({'order_qty': order_qty, 'rankings': rankings})
+
+    return curve, break_points
@@ -0,0 +1,56 @@
+import threading
+from django.utils.functional import SimpleLazyObject
+from .models import Company
+
+
+# Single-tenant mode: every request belongs to this company
+DEFAULT_COMPANY_ID = 1
+
+_companies = {}
+_companies_lock = threading.Lock()
+
+
+def get_default_company():
+    """
+    Get or create the default company for single-tenant mode.
+
+    The company is cached in-process after the first lookup, so the hot path
+    runs no query. Company save/delete signals drop the cached copy.
+    """
+    company = _companies.get(DEFAULT_COMPANY_ID)
+    if company is None:
+        company, created = Company.objects.get_or_create(
+            id=DEFAULT_COMPANY_ID,
+            defaults={
+                'name': 'My Company',
+                'industry_type': 'Manufacturing',
+                'address': 'Company Address',
+                'contact_email': 'contact@mycompany.com'
+            }
+        )
+        with _companies_lock:
+            _companies[DEFAULT_COMPANY_ID] = company
+    return company
+
+
+def invalidate_company(company_id):
+    with _companies_lock:
+        _companies.pop(company_id, None)
+
+
+class TenantMiddleware:
+    """
+    Resolve the tenant once per request.
+
+    Sets request.company_id, which querysets filter on directly, and a lazy
+    request.company that is only loaded (from the in-process cache) when an
+    object has to be saved against it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.company_id = DEFAULT_COMPANY_ID
+        request.company = SimpleLazyObject(get_default_company)
+        return self.get_response(request)
@@ -1,3 +1,971 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from . import jobs
+from .comparison import rank_quotations, rank_quotations_in_db
+from .history import rank_quotations_as_of
+from .search import get_search_index
+from .tenancy import get_default_company
+from .models import (
+    Company, Vendor, Product, ProductGroup, ProductCategory, Quotation, CompareJob, OrderRequest, ComparisonResult, QuotationPriceHistory, ProductBestQuote
+)
 
-# Create your tests here.
+
+class QuotationFixtures:
+    """The default company with one product and a few vendors, and fresh caches."""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.company = Company.objects.create(
+            id=1, name='My Company', industry_type='Manufacturing',
+            address='Company Address', contact_email='contact@mycompany.com'
+        )
+        self.product = Product.objects.create(
+            company=self.company, name='HDPE Film', category='HDPE', grade_spec='Film', unit_type='kg'
+        )
+        self.vendors = [
+            Vendor.objects.create(company=self.company, name=f'Vendor {index}', city='Hyderabad', state=state)
+            for index, state in enumerate(['Telangana', 'Kerala', 'Telangana'])
+        ]
+        self.client = APIClient()
+
+    def quote(self, vendor, price, delivery='100.00', quantity=100, lead_time=5, product=None):
+        return Quotation.objects.create(
+            vendor=vendor, product=product or self.product, product_price=Decimal(price),
+            delivery_price=Decimal(delivery) if delivery is not None else None,
+            quantity=quantity, lead_time_days=lead_time
+        )
+
+    def compare(self, **data):
+        body = {'product_id': self.product.id, 'order_qty': 100, 'delivery_location': 'Telangana',
+                'persist': False, **data}
+        return self.client.post('/api/compare/', body, format='json')
+
+
+class RankingTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        prices = ['10.00', '10.00', '9.50', '10.00', '11.25', '9.50', '10.00']
+        deliveries = ['100.00', '100.00', '150.00', '80.00', None, '150.00', '100.00']
+        lead_times = [5, 5, 3, 5, 2, 3, 4]
+        for index, (price, delivery, lead_time) in enumerate(zip(prices, deliveries, lead_times)):
+            self.quote(self.vendors[index % 3], price, delivery=delivery, lead_time=lead_time)
+
+    def ranked_ids(self, ranking):
+        results, total = ranking
+        return [result['quotation'].id for result in results], [result['rank'] for result in results], total
+
+    def test_database_ranking_matches_python(self):
+        # The Python ranker's stable sort keeps the queryset's newest-first order on ties
+        quotations = Quotation.objects.filter(product=self.product).select_related('vendor').order_by('-created_at', '-id')
+        for order_qty in (1, 7, 100, 2500):
+            for location in ('Telangana', 'KL', 'Goa'):
+                for top_k, offset in ((None, 0), (3, 0), (2, 3)):
+                    with self.subTest(order_qty=order_qty, location=location, top_k=top_k, offset=offset):
+                        self.assertEqual(
+                            self.ranked_ids(rank_quotations_in_db(quotations, order_qty, location, top_k, offset)),
+                            self.ranked_ids(rank_quotations(list(quotations), order_qty, location, top_k, offset))
+                        )
+
+    def test_ties_go_to_the_newest_quotation(self):
+        first = self.quote(self.vendors[0], '1.00', delivery='0.00', lead_time=1)
+        second = self.quote(self.vendors[2], '1.00', delivery='0.00', lead_time=1)
+        results, _ = rank_quotations_in_db(Quotation.objects.filter(product=self.product), 100, 'Telangana', top_k=2)
+
+        self.assertEqual([result['quotation'].id for result in results], [second.id, first.id])
+        self.assertEqual([result['rank'] for result in results], [1, 2])
+
+    def test_batch_ranking_matches_single_compare(self):
+        # Ties must break the same way in the batch path, which ranks in Python and caches the result
+        first = self.quote(self.vendors[0], '1.00', delivery='0.00', lead_time=1)
+        second = self.quote(self.vendors[2], '1.00', delivery='0.00', lead_time=1)
+        Quotation.objects.filter(id__in=[first.id, second.id]).update(created_at=first.created_at)
+        line = {'product_id': self.product.id, 'order_qty': 100, 'delivery_location': 'Telangana'}
+        batch = self.client.post('/api/compare/batch/', {'lines': [line], 'persist': False}, format='json')
+        caches['compare'].clear()
+        single = self.compare()
+
+        self.assertEqual(batch.status_code, 200)
+        self.assertEqual(
+            [(row['vendor'], row['rank']) for row in batch.data['lines'][0]['comparisons']],
+            [(row['vendor'], row['rank']) for row in single.data['comparisons']]
+        )
+
+    def test_incomplete_quotations_are_skipped(self):
+        response = self.compare()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_vendors'], 6)
+
+
+class ComparePreviewTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.quote(self.vendors[0], '10.00')
+        self.quote(self.vendors[1], '9.00')
+
+    def test_preview_writes_nothing(self):
+        response = self.compare()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['persisted'])
+        self.assertIsNone(response.data['order_request_id'])
+        self.assertEqual(len(response.data['comparisons']), 2)
+        self.assertFalse(OrderRequest.objects.exists())
+        self.assertFalse(ComparisonResult.objects.exists())
+
+    def test_persisted_compare_matches_the_preview(self):
+        preview = self.compare()
+        response = self.compare(persist=True)
+
+        self.assertTrue(response.data['persisted'])
+        self.assertEqual(OrderRequest.objects.count(), 1)
+        self.assertEqual(ComparisonResult.objects.count(), 2)
+        self.assertEqual(
+            [(row['vendor'], row['rank']) for row in response.data['comparisons']],
+            [(row['vendor'], row['rank']) for row in preview.data['comparisons']]
+        )
+
+    def test_non_positive_order_qty_is_rejected(self):
+        for order_qty in (0, -5):
+            with self.subTest(order_qty=order_qty):
+                response = self.compare(order_qty=order_qty)
+
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('order_qty', response.data)
+
+
+class BatchCompareTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Product.objects.create(
+            company=self.company, name='PP Raffia', category='PP', grade_spec='Raffia', unit_type='kg'
+        )
+        self.bare = Product.objects.create(
+            company=self.company, name='PVC Pipe', category='PVC', grade_spec='Pipe', unit_type='kg'
+        )
+        for vendor, price in zip(self.vendors, ['10.00', '9.00', '11.00']):
+            self.quote(vendor, price)
+            self.quote(vendor, price, product=self.other)
+
+    def line(self, product_id, order_qty=100):
+        return {'product_id': product_id, 'order_qty': order_qty, 'delivery_location': 'Telangana'}
+
+    def batch(self, lines, **data):
+        return self.client.post('/api/compare/batch/', {'lines': lines, **data}, format='json')
+
+    def test_lines_fail_on_their_own(self):
+        response = self.batch([
+            self.line(self.product.id), self.line(999999), self.line(self.bare.id), self.line(self.other.id)
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['compared'], response.data['failed']), (2, 2))
+        lines = response.data['lines']
+        self.assertEqual([line['line'] for line in lines], [0, 1, 2, 3])
+        self.assertIn('error', lines[1])
+        self.assertIn('error', lines[2])
+        self.assertEqual([row['rank'] for row in lines[3]['comparisons']], [1, 2, 3])
+        self.assertEqual(OrderRequest.objects.count(), 2)
+        self.assertEqual(ComparisonResult.objects.count(), 6)
+        self.assertTrue(all(row['id'] for line in (lines[0], lines[3]) for row in line['comparisons']))
+
+    def test_queries_do_not_grow_with_lines(self):
+        def count(lines):
+            caches['compare'].clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.batch(lines).status_code, 200)
+            return len(queries)
+
+        count([self.line(self.product.id)])  # resolves and caches the tenant
+        few = count([self.line(self.product.id), self.line(self.other.id)])
+        many = count([self.line(product_id, qty) for product_id in (self.product.id, self.other.id)
+                      for qty in (10, 50, 250, 1000)])
+
+        self.assertEqual(many, few)
+
+    def test_bare_list_and_empty_batch(self):
+        response = self.client.post('/api/compare/batch/', [self.line(self.product.id)], format='json')
+
+        self.assertEqual(response.data['compared'], 1)
+        self.assertEqual(self.batch([]).status_code, 400)
+
+
+class SweepTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Fixed freight against a higher unit price: equal at 500 units
+        self.freight = self.quote(self.vendors[0], '10.00', delivery='1000.00')
+        self.unit = self.quote(self.vendors[2], '12.00', delivery='0.00')
+        self.interstate = self.quote(self.vendors[1], '13.00', delivery='100.00')
+
+    def sweep(self, **data):
+        body = {'product_id': self.product.id, 'delivery_location': 'Telangana', **data}
+        return self.client.post('/api/compare/sweep/', body, format='json')
+
+    def test_break_points_mark_a_new_winner(self):
+        response = self.sweep(quantities=[1000, 100, 499, 501])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([point['order_qty'] for point in response.data['curve']], [100, 499, 501, 1000])
+        self.assertEqual(len(response.data['break_points']), 1)
+        point = response.data['break_points'][0]
+        self.assertEqual(point['order_qty'], 501)
+        self.assertEqual((point['previous_winner']['quotation'], point['winner']['quotation']),
+                         (self.unit.id, self.freight.id))
+
+    def test_curve_matches_compare(self):
+        response = self.sweep(qty_from=50, qty_to=1050, qty_step=250, top_k=3)
+
+        for point in response.data['curve']:
+            with self.subTest(order_qty=point['order_qty']):
+                compared = self.compare(order_qty=point['order_qty']).data['comparisons']
+                self.assertEqual(
+                    [(row['quotation'], row['total_order_cost']) for row in point['rankings']],
+                    [(row['quotation'], row['total_order_cost']) for row in compared]
+                )
+
+    def test_oversized_ranges_are_rejected(self):
+        for data in ({'qty_from': 1, 'qty_to': 10 ** 9}, {'qty_from': 10, 'qty_to': 5},
+                     {'quantities': list(range(1, 1100))}, {'qty_from': 1}):
+            with self.subTest(data=data):
+                self.assertEqual(self.sweep(**data).status_code, 400)
+
+
+class BasketTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Product.objects.create(
+            company=self.company, name='PP Raffia', category='PP', grade_spec='Raffia', unit_type='kg'
+        )
+
+    def basket(self, lines, **data):
+        body = {'lines': lines, 'delivery_location': 'Telangana', **data}
+        return self.client.post('/api/compare/basket/', body, format='json')
+
+    def lines(self, order_qty=100):
+        return [{'product_id': self.product.id, 'order_qty': order_qty},
+                {'product_id': self.other.id, 'order_qty': order_qty}]
+
+    def test_shared_freight_consolidates_vendors(self):
+        # Per line each product goes to a different vendor and pays freight twice
+        self.quote(self.vendors[0], '10.00', delivery='500.00')
+        self.quote(self.vendors[0], '10.00', delivery='500.00', product=self.other)
+        self.quote(self.vendors[2], '9.90', delivery='500.00')
+        self.quote(self.vendors[2], '10.10', delivery='500.00', product=self.other)
+        response = self.basket(self.lines())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['per_line_total_cost'], '2990.00')
+        self.assertEqual(response.data['total_cost'], '2500.00')
+        self.assertEqual(response.data['savings'], '490.00')
+        self.assertEqual(len(response.data['vendors']), 1)
+
+    def test_basket_never_costs_more_than_per_line(self):
+        rng = random.Random(7)
+        for vendor in self.vendors:
+            for product in (self.product, self.other):
+                self.quote(vendor, f'{rng.uniform(8, 12):.2f}', delivery=f'{rng.uniform(0, 900):.2f}',
+                           lead_time=rng.randint(1, 9), product=product)
+        for order_qty in (1, 10, 100, 1000):
+            with self.subTest(order_qty=order_qty):
+                data = self.basket(self.lines(order_qty)).data
+
+                self.assertGreaterEqual(Decimal(data['savings']), 0)
+                self.assertEqual(Decimal(data['total_cost']),
+                                 sum(Decimal(vendor['total_cost']) for vendor in data['vendors']))
+
+    def test_lines_without_quotations(self):
+        self.assertEqual(self.basket(self.lines()).status_code, 404)
+        self.quote(self.vendors[0], '10.00')
+        response = self.basket(self.lines())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['lines']), 1)
+        self.assertEqual(len(response.data['unassigned']), 1)
+
+
+class CompareCacheTests(QuotationFixtures, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cheap = self.quote(self.vendors[0], '10.00')
+        self.quote(self.vendors[1], '12.00')
+
+    def test_repeated_compare_is_served_from_cache(self):
+        self.assertFalse(self.compare().data['cached'])
+        self.assertTrue(self.compare().data['cached'])
+
+    def test_quotation_save_invalidates(self):
+        self.compare()
+        self.cheap.product_price = Decimal('20.00')
+        self.cheap.save()
+
+        response = self.compare()
+        self.assertFalse(response.data['cached'])
+        self.assertEqual(response.data['comparisons'][0]['vendor'], self.vendors[1].id)
+
+    def test_vendor_state_change_invalidates(self):
+        self.compare(delivery_location='Kerala')
+        self.vendors[0].state = 'Kerala'
+        self.vendors[0].save()
+
+        response = self.compare(delivery_location='Kerala')
+        self.assertFalse(response.data['cached'])
+        self.assertFalse(response.data['comparisons'][0]['is_interstate'])
+
+
+class CompareJobTests(QuotationFixtures, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        for vendor, price in zip(self.vendors, ['10.00', '9.00', '11.00']):
+            self.quote(vendor, price)
+
+    def wait(self, job_id, timeout=10):
+        # Wait on the worker pool rather than polling the API: the in-memory
+        # test database locks whole tables against reads from another thread
+        deadline = time.monotonic() + timeout
+        while job_id in jobs._held_jobs and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return self.client.get(f'/api/compare/jobs/{job_id}/')
+
+    def test_job_ranks_every_line(self):
+        lines = [{'product_id': self.product.id, 'order_qty': qty, 'delivery_location': 'Telangana'}
+                 for qty in (10, 100)] + [{'product_id': 999999, 'order_qty': 5, 'delivery_location': 'Goa'}]
+        submitted = self.client.post('/api/compare/jobs/', {'lines': lines}, format='json')
+
+        self.assertEqual(submitted.status_code, 202)
+        response = self.wait(submitted.data['id'])
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual((response.data['completed_lines'], response.data['failed_lines']), (3, 1))
+        self.assertEqual([result['order_qty'] for result in response.data['results']], [10, 100])
+        self.assertEqual([row['rank'] for row in response.data['results'][0]['comparisons']], [1, 2, 3])
+        self.assertEqual(OrderRequest.objects.filter(job_id=submitted.data['id']).count(), 2)
+
+    def test_stale_jobs_are_failed(self):
+        stale = CompareJob.objects.create(company=self.company, lines=[], status='running')
+        fresh = CompareJob.objects.create(company=self.company, lines=[])
+        CompareJob.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(self.client.get(f'/api/compare/jobs/{stale.id}/').data['status'], 'failed')
+        self.assertIn('Interrupted', CompareJob.objects.get(id=stale.id).error)
+        self.assertEqual(self.client.get(f'/api/compare/jobs/{fresh.id}/').data['status'], 'queued')
+
+    def test_invalid_jobs_are_rejected(self):
+        self.assertEqual(self.client.post('/api/compare/jobs/', {}, format='json').status_code, 400)
+        self.assertEqual(self.client.get('/api/compare/jobs/999999/').status_code, 404)
+
+
+class QuotationBulkTests(QuotationFixtures, TestCase):
+    def item(self, **values):
+        return {'vendor': self.vendors[0].id, 'product': self.product.id, 'product_price': '10.00',
+                'quantity': 100, 'delivery_price': '50.00', **values}
+
+    def test_missing_required_field_rejects_the_list(self):
+        missing = self.item()
+        del missing['product_price']
+        response = self.client.post('/api/quotations/bulk/', [self.item(), missing], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['rolled_back'])
+        self.assertEqual(response.data['errors'], [{'index': 1, 'errors': {'product_price': ['This field is required.']}}])
+        self.assertFalse(Quotation.objects.exists())
+
+    def test_missing_required_field_is_skipped_when_partial(self):
+        missing = self.item()
+        del missing['product_price']
+        response = self.client.post('/api/quotations/bulk/?partial=true', [missing, self.item()], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        self.assertEqual(response.data['errors'][0]['index'], 0)
+        self.assertEqual(Quotation.objects.get().landing_price, Decimal('10.50'))
+
+    def test_patch_changes_only_given_fields(self):
+        quotation = self.quote(self.vendors[0], '20.00')
+        response = self.client.patch(
+            '/api/quotations/bulk/', [{'id': quotation.id, 'lead_time_days': 9}], format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        quotation.refresh_from_db()
+        self.assertEqual((quotation.lead_time_days, quotation.product_price), (9, Decimal('20.00')))
+
+    def test_bulk_writes_record_history(self):
+        response = self.client.post('/api/quotations/bulk/', [self.item(), self.item()], format='json')
+
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(QuotationPriceHistory.objects.filter(quotation_id__in=ids).count(), 2)
+
+
+class QuotationImportTests(QuotationFixtures, TestCase):
+    def upload(self, rows, **fields):
+        file = io.BytesIO(('vendor,product,product_price,quantity,delivery_price\n' + rows).encode())
+        file.name = 'prices.csv'
+        return self.client.post('/api/quotations/import/', {'file': file, **fields}, format='multipart')
+
+    def rows(self):
+        return (
+            f'{self.vendors[0].id},{self.product.id},10.00,100,50.00\n'
+            f'999,{self.product.id},11.00,100,50.00\n'
+            f'{self.vendors[1].id},{self.product.id},abc,100,50.00\n'
+        )
+
+    def test_row_errors_are_reported_by_row_number(self):
+        response = self.upload(self.rows())
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertIn('vendor', response.data['errors'][0]['errors'])
+        self.assertIn('product_price', response.data['errors'][1]['errors'])
+
+    def test_atomic_import_rolls_back(self):
+        response = self.upload(self.rows(), atomic='true')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['rolled_back'])
+        self.assertEqual(response.data['created'], 0)
+        self.assertFalse(Quotation.objects.exists())
+        self.assertFalse(QuotationPriceHistory.objects.exists())
+
+    def test_upsert_updates_the_newest_quotation(self):
+        quotation = self.quote(self.vendors[0], '20.00')
+        response = self.upload(f'{self.vendors[0].id},{self.product.id},15.00,100,50.00\n', mode='upsert')
+
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+        quotation.refresh_from_db()
+        self.assertEqual(quotation.product_price, Decimal('15.00'))
+
+
+class ListResponseTests(QuotationFixtures, TestCase):
+    def test_cursor_pagination_visits_every_row_once(self):
+        created = [self.quote(self.vendors[index % 3], '10.00').id for index in range(7)]
+        seen = []
+        url = '/api/quotations/?pagination=cursor&page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, sorted(created, reverse=True))
+
+    def test_quotations_carry_their_company(self):
+        # The listing filters on quotation.company, so every write path must fill it
+        response = self.client.post('/api/quotations/', {
+            'vendor': self.vendors[0].id, 'product': self.product.id, 'product_price': '12.00'
+        }, format='json')
+        created = self.quote(self.vendors[1], '10.00')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Quotation.objects.get(id=response.data['id']).company_id, self.company.id)
+        self.assertEqual(created.company_id, self.company.id)
+        listed = self.client.get('/api/quotations/?pagination=cursor').data['results']
+        self.assertEqual([row['id'] for row in listed], [created.id, response.data['id']])
+
+    def test_product_group_filter_follows_the_product(self):
+        # ?product_group_id= reads the quotation's copy of its product's group
+        films = ProductGroup.objects.create(company=self.company, name='Films')
+        saved = self.quote(self.vendors[0], '10.00')
+        response = self.client.post('/api/quotations/bulk/', [
+            {'vendor': self.vendors[1].id, 'product': self.product.id, 'product_price': '11.00'}
+        ], format='json')
+        bulk_id = response.data['results'][0]['id']
+        url = f'/api/quotations/?product_group_id={films.id}'
+
+        self.assertEqual(self.client.get(url).data['count'], 0)
+        self.product.product_group = films
+        self.product.save()
+        self.assertEqual({row['id'] for row in self.client.get(url).data['results']}, {saved.id, bulk_id})
+        created = self.quote(self.vendors[2], '9.00')
+        self.assertEqual(created.product_group_id, films.id)
+        films.delete()
+        self.assertFalse(Quotation.objects.filter(product_group__isnull=False).exists())
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/quotations/?pagination=cursor&cursor=garbage')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_revalidates_until_a_write(self):
+        response = self.client.get('/api/vendors/')
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get('/api/vendors/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendors[0].delete()
+        self.assertEqual(self.client.get('/api/vendors/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_expanded_etag_follows_nested_models(self):
+        self.quote(self.vendors[0], '10.00')
+        url = '/api/quotations/?expand=vendor'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.name = 'Renamed'
+            self.company.save()
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SparseFieldsetTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.quotation = self.quote(self.vendors[0], '10.00')
+
+    def list_sql(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # The page query, not the count
+        sql = next(query['sql'] for query in queries.captured_queries
+                   if 'quotations_quotation' in query['sql'] and 'COUNT(' not in query['sql'])
+        return response, sql
+
+    def test_fields_narrow_the_output_and_the_select(self):
+        response, sql = self.list_sql('/api/quotations/?fields=id,vendor_name,product_price')
+
+        self.assertEqual(set(response.data['results'][0]), {'id', 'vendor_name', 'product_price'})
+        self.assertIn('"quotations_vendor"."name"', sql)
+        self.assertNotIn('delivery_price', sql)
+        self.assertNotIn('quotations_product', sql)
+
+    def test_expand_nests_the_related_object(self):
+        response, sql = self.list_sql('/api/quotations/?expand=vendor&fields=id,vendor')
+        vendor = response.data['results'][0]['vendor']
+
+        self.assertEqual((vendor['id'], vendor['name'], vendor['company_name']),
+                         (self.vendors[0].id, 'Vendor 0', 'My Company'))
+        self.assertIn('quotations_company', sql)
+        self.assertNotIn('quotations_product', sql)
+
+    def test_without_parameters_output_is_unchanged(self):
+        detail = self.client.get(f'/api/quotations/{self.quotation.id}/?fields=id,unknown').data
+
+        self.assertEqual(set(detail), {'id'})
+        row = self.client.get('/api/quotations/').data['results'][0]
+        self.assertEqual(row['vendor'], self.vendors[0].id)
+        self.assertEqual(row['product_name'], 'HDPE Film')
+        # The product has no group: DRF leaves the name out, and the internal copy is never shown
+        self.assertNotIn('product_group_name', row)
+        self.assertNotIn('product_group', row)
+
+
+class FastListTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        group = ProductGroup.objects.create(company=self.company, name='Films')
+        category = ProductCategory.objects.create(company=self.company, name='Polymers')
+        grouped = Product.objects.create(
+            company=self.company, name='LDPE Film', category='LDPE', grade_spec='Film', unit_type='kg',
+            product_group=group
+        )
+        categorised = Product.objects.create(
+            company=self.company, name='PP Raffia', category='PP', grade_spec='Raffia', unit_type='kg',
+            product_category=category
+        )
+        for index, product in enumerate([self.product, grouped, categorised]):
+            self.quote(self.vendors[index], '10.50', product=product)
+
+    def assertFastMatches(self, url):
+        separator = '&' if '?' in url else '?'
+        regular = self.client.get(url)
+        fast = self.client.get(f'{url}{separator}fast=true')
+
+        self.assertEqual(fast.status_code, 200)
+        fast, regular = json.loads(fast.content), json.loads(regular.content)
+        # Page links carry the fast flag along
+        for key in ('next', 'previous'):
+            fast.pop(key, None)
+            regular.pop(key, None)
+        self.assertEqual(fast, regular)
+
+    def test_fast_list_matches_regular_list(self):
+        # Products with and without a group or category: name fields through a null relation are left out
+        for url in ('/api/products/', '/api/quotations/', '/api/vendors/',
+                    '/api/quotations/?pagination=cursor&page_size=2',
+                    '/api/products/?fields=id,name,product_group_name'):
+            with self.subTest(url=url):
+                self.assertFastMatches(url)
+
+
+class QueryBudgetTests(QuotationFixtures, TestCase):
+    def populate(self, count):
+        group = ProductGroup.objects.create(company=self.company, name=f'Group {count}')
+        category = ProductCategory.objects.create(company=self.company, name=f'Category {count}')
+        for index in range(count):
+            vendor = Vendor.objects.create(company=self.company, name=f'Extra {count}.{index}', state='Goa')
+            product = Product.objects.create(
+                company=self.company, name=f'Extra {count}.{index}', grade_spec='Film', unit_type='kg',
+                product_group=group, product_category=category
+            )
+            self.quote(vendor, '10.00', product=product)
+            user = User.objects.create_user(username=f'user{count}.{index}')
+            user.profile.company = self.company
+            user.profile.save()
+        self.compare(persist=True)
+
+    def test_header_reports_the_request_queries(self):
+        self.quote(self.vendors[0], '10.00')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/quotations/')
+
+        self.assertEqual(int(response['X-Query-Count']), len(queries))
+        self.assertGreaterEqual(float(response['X-Query-Time-Ms']), 0)
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        urls = ['/api/vendors/', '/api/products/', '/api/quotations/', '/api/orders/', '/api/comparison-results/',
+                '/api/product-groups/', '/api/product-categories/', '/api/users/', '/api/best-quotes/']
+        self.populate(2)
+        before = {url: self.client.get(url)['X-Query-Count'] for url in urls}
+        self.populate(8)
+
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url)['X-Query-Count'], before[url])
+
+    def test_requests_over_budget_are_logged(self):
+        budget = {'ENABLED': True, 'MAX_QUERIES': 0, 'MAX_SQL_MS': 500}
+        with self.settings(QUERY_BUDGET=budget), self.assertLogs('backend.quotations.middleware', 'WARNING') as logs:
+            APIClient().get('/api/vendors/')
+
+        self.assertIn('Query budget exceeded: GET /api/vendors/', logs.output[0])
+
+
+class TenancyTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.own = self.quote(self.vendors[0], '10.00')
+        other = Company.objects.create(name='Other Company', contact_email='other@example.com')
+        other_vendor = Vendor.objects.create(company=other, name='Other Vendor', city='Goa', state='Goa')
+        self.other_product = Product.objects.create(
+            company=other, name='Other Film', grade_spec='Film', unit_type='kg'
+        )
+        self.foreign = self.quote(other_vendor, '1.00', product=self.other_product)
+
+    def test_requests_only_see_the_default_company(self):
+        for url, own_ids in (('/api/vendors/', {vendor.id for vendor in self.vendors}),
+                             ('/api/products/', {self.product.id}),
+                             ('/api/quotations/', {self.own.id})):
+            with self.subTest(url=url):
+                self.assertEqual({row['id'] for row in self.client.get(url).data['results']}, own_ids)
+        self.assertEqual(self.client.get(f'/api/quotations/{self.foreign.id}/').status_code, 404)
+        self.assertEqual(self.compare(product_id=self.other_product.id).status_code, 404)
+
+    def test_writes_are_forced_to_the_default_company(self):
+        response = self.client.post('/api/vendors/', {
+            'name': 'New Vendor', 'city': 'Pune', 'state': 'Maharashtra', 'company': self.foreign.company_id
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Vendor.objects.get(id=response.data['id']).company_id, self.company.id)
+
+    def test_company_is_cached_until_it_changes(self):
+        get_default_company()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_default_company().name, 'My Company')
+        self.assertEqual(len(queries), 0)
+
+        self.company.name = 'Renamed Company'
+        self.company.save()
+        self.assertEqual(get_default_company().name, 'Renamed Company')
+
+
+class ExportTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        group = ProductGroup.objects.create(company=self.company, name='Films')
+        grouped = Product.objects.create(
+            company=self.company, name='LDPE Film', grade_spec='Film', unit_type='kg', product_group=group
+        )
+        for index in range(5):
+            self.quote(self.vendors[index % 3], f'1{index}.00', product=grouped if index % 2 else None)
+
+    def export(self, query=''):
+        response = self.client.get(f'/api/quotations/export/{query}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def listed(self, query=''):
+        return self.client.get(f'/api/quotations/?page_size=100{query}').data['results']
+
+    def test_csv_matches_the_list(self):
+        rows = list(csv.DictReader(io.StringIO(self.export())))
+        listed = self.listed()
+
+        self.assertEqual(len(rows), 5)
+        for row, item in zip(rows, listed):
+            # Fields the list leaves out (no product group) are empty cells
+            self.assertEqual(row, {name: '' if item.get(name) is None else str(item[name]) for name in row})
+
+    def test_ndjson_matches_the_list(self):
+        lines = self.export('?format=ndjson').splitlines()
+
+        self.assertEqual([json.loads(line) for line in lines], json.loads(json.dumps(self.listed())))
+
+    def test_filters_and_fields_apply(self):
+        rows = list(csv.DictReader(io.StringIO(self.export(f'?fields=id,vendor_name&vendor_id={self.vendors[0].id}'))))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(set(rows[0]), {'id', 'vendor_name'})
+        self.assertEqual(self.client.get('/api/quotations/export/?expand=vendor').status_code, 400)
+
+    def test_comparison_results_export(self):
+        self.compare(persist=True)
+        lines = self.client.get('/api/comparison-results/export/', HTTP_ACCEPT='application/x-ndjson')
+
+        ranks = [json.loads(line)['rank'] for line in b''.join(lines.streaming_content).splitlines()]
+        self.assertEqual(ranks, [1, 2, 3])
+
+
+class DashboardTests(QuotationFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Product.objects.create(
+            company=self.company, name='PP Raffia', category='PP', grade_spec='Raffia', unit_type='kg'
+        )
+        self.quote(self.vendors[0], '10.00')
+        self.quote(self.vendors[1], '12.00')
+        self.quote(self.vendors[2], '20.00', product=self.other)
+
+    def stats(self, query=''):
+        response = self.client.get(f'/api/dashboard/stats/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_and_landing_prices(self):
+        data = self.stats()
+
+        self.assertEqual(data['counts']['vendors'], 3)
+        self.assertEqual(data['counts']['quotations'], 3)
+        self.assertEqual(data['vendors_by_city'], [{'city': 'Hyderabad', 'count': 3}])
+        self.assertEqual(data['quotations_by_month'][-1]['count'], 3)
+        first = data['landing_price_by_product'][0]
+        self.assertEqual((first['product_id'], first['quotations']), (self.product.id, 2))
+        # Landing prices per unit: 10.00 and 12.00 plus 100.00 freight over 100 units
+        self.assertEqual((first['avg_landing_price'], first['min_landing_price']), ('12.00', '11.00'))
+
+    def test_writes_invalidate_the_cached_stats(self):
+        self.assertFalse(self.stats()['cached'])
+        self.assertTrue(self.stats()['cached'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quote(self.vendors[2], '9.00')
+        data = self.stats()
+
+        self.assertFalse(data['cached'])
+        self.assertEqual(data['counts']['quotations'], 4)
+
+    def test_truncation_is_reported(self):
+        full = self.stats()
+        top = self.stats('?top_products=1')
+
+        self.assertEqual((full['products_quoted'], full['landing_price_by_product_truncated']), (2, False))
+        self.assertEqual((top['products_quoted'], top['landing_price_by_product_truncated']), (2, True))
+        self.assertEqual(len(top['landing_price_by_product']), 1)
+        self.assertEqual(len(self.stats('?top_products=0')['landing_price_by_product']), 1)
+        self.assertEqual(self.client.get('/api/dashboard/stats/?top_products=many').status_code, 400)
+
+
+class PriceHistoryTests(QuotationFixtures, TestCase):
+    def test_as_of_compare_uses_the_prices_then(self):
+        quotation = self.quote(self.vendors[0], '10.00')
+        other = self.quote(self.vendors[1], '12.00')
+        other_id = other.id
+        before = timezone.now()
+        quotation.product_price = Decimal('20.00')
+        quotation.save()
+        other.delete()
+
+        results, total = rank_quotations_as_of(self.product.id, self.company.id, before, 100, 'Telangana')
+        self.assertEqual(total, 2)
+        self.assertEqual([result['quotation'].id for result in results], [quotation.id, other_id])
+        self.assertEqual(results[0]['quotation'].product_price, Decimal('10.00'))
+
+        response = self.compare(as_of=timezone.now().isoformat())
+        self.assertEqual(response.data['total_vendors'], 1)
+        self.assertEqual(response.data['comparisons'][0]['product_price'], '20.00')
+
+    def test_as_of_before_any_quotation_is_not_found(self):
+        self.quote(self.vendors[0], '10.00')
+
+        response = self.compare(as_of=(timezone.now() - timedelta(days=1)).isoformat())
+        self.assertEqual(response.status_code, 404)
+
+    def test_history_endpoint_lists_versions(self):
+        quotation = self.quote(self.vendors[0], '10.00')
+        quotation.product_price = Decimal('11.00')
+        quotation.save()
+
+        response = self.client.get(f'/api/quotations/{quotation.id}/history/')
+        self.assertEqual([row['product_price'] for row in response.data], ['10.00', '11.00'])
+
+    def test_cascade_writes_tombstones_in_one_insert(self):
+        ids = [self.quote(self.vendors[0], '10.00').id for _ in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            self.vendors[0].delete()
+
+        history_table = QuotationPriceHistory._meta.db_table
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith(f'INSERT INTO "{history_table}"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(QuotationPriceHistory.objects.filter(quotation_id__in=ids, deleted=True).count(), 5)
+
+
+class BestQuoteTests(QuotationFixtures, TransactionTestCase):
+    def best(self):
+        return ProductBestQuote.objects.filter(product=self.product).first()
+
+    def test_best_and_runner_up_follow_quotation_changes(self):
+        cheap = self.quote(self.vendors[0], '10.00')
+        middle = self.quote(self.vendors[1], '11.00')
+        self.quote(self.vendors[2], '12.00')
+        best = self.best()
+        self.assertEqual((best.best_quotation_id, best.runner_up_quotation_id, best.quotation_count),
+                         (cheap.id, middle.id, 3))
+
+        cheap.product_price = Decimal('30.00')
+        cheap.save()
+        self.assertEqual(self.best().best_quotation_id, middle.id)
+
+        middle.delete()
+        self.assertEqual(self.best().quotation_count, 2)
+        self.assertNotEqual(self.best().best_quotation_id, middle.id)
+
+    def test_moving_a_quotation_refreshes_both_products(self):
+        other = Product.objects.create(company=self.company, name='PP Raffia', grade_spec='Raffia', unit_type='kg')
+        quotation = self.quote(self.vendors[0], '10.00')
+        quotation.product = other
+        quotation.save()
+
+        self.assertIsNone(self.best())
+        self.assertEqual(ProductBestQuote.objects.get(product=other).best_quotation_id, quotation.id)
+
+    def test_vendor_cascade_refreshes_once(self):
+        for index in range(5):
+            self.quote(self.vendors[0], f'{10 + index}.00')
+        kept = self.quote(self.vendors[1], '50.00')
+        with CaptureQueriesContext(connection) as queries:
+            self.vendors[0].delete()
+
+        self.assertEqual(self.best().best_quotation_id, kept.id)
+        refreshes = [query for query in queries.captured_queries if 'ROW_NUMBER' in query['sql']]
+        self.assertEqual(len(refreshes), 1)
+
+    def test_bulk_writes_refresh(self):
+        self.client.post('/api/quotations/bulk/', [
+            {'vendor': self.vendors[0].id, 'product': self.product.id, 'product_price': '9.00',
+             'quantity': 100, 'delivery_price': '0.00'},
+        ], format='json')
+
+        self.assertEqual(self.best().best_landing_price, Decimal('9.00'))
+        self.assertEqual(self.client.get('/api/best-quotes/').data['results'][0]['product'], self.product.id)
+
+
+class SeederTests(QuotationFixtures, TestCase):
+    def seed(self, **options):
+        options = {'vendors': 4, 'groups': 2, 'categories': 2, 'products': 5, 'quotations': 40, **options}
+        call_command('seed_synthetic_data', stdout=io.StringIO(), **options)
+
+    def test_clear_empties_the_derived_tables_without_tombstones(self):
+        # One capture: the transaction's single best-quote refresh runs when it ends
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quote(self.vendors[0], '10.00')
+            self.compare(persist=True)
+            self.seed()
+            self.seed(clear=True)
+
+        self.assertEqual(Quotation.objects.count(), 40)
+        self.assertEqual(Vendor.objects.count(), 4)
+        self.assertFalse(OrderRequest.objects.exists())
+        self.assertFalse(ComparisonResult.objects.exists())
+        # Only the new quotations' history; the cleared rows leave no tombstones behind
+        self.assertEqual(QuotationPriceHistory.objects.count(), 40)
+        self.assertFalse(QuotationPriceHistory.objects.filter(deleted=True).exists())
+        self.assertEqual(
+            set(ProductBestQuote.objects.values_list('product_id', flat=True)),
+            set(Quotation.objects.filter(landing_price__isnull=False).values_list('product_id', flat=True))
+        )
+
+    def test_clear_runs_one_delete_per_table(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed()
+        with CaptureQueriesContext(connection) as queries:
+            self.seed(clear=True, vendors=0, groups=0, categories=0, products=0, quotations=0)
+
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        self.assertEqual(statements.count('DELETE'), 9)
+        # No per-row receivers: no tombstones or best-quote rows are written on the way
+        self.assertNotIn('INSERT', statements)
+        self.assertFalse(Vendor.objects.exists())
+        self.assertFalse(QuotationPriceHistory.objects.exists())
+
+
+class SearchTests(QuotationFixtures, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, grade_spec, category in (('HDPE Pipe', 'Pipe', 'HDPE'), ('LDPE Film', 'Film', 'LDPE'),
+                                           ('PP Raffia', 'Raffia', 'PP'), ('Woven Sack', 'Raffia', 'PP')):
+            Product.objects.create(
+                company=self.company, name=name, grade_spec=grade_spec, category=category, unit_type='kg'
+            )
+        Vendor.objects.create(company=self.company, name='Filmtech Polymers', city='Chennai', state='Tamil Nadu')
+        other = Company.objects.create(name='Other Company', contact_email='other@example.com')
+        Product.objects.create(company=other, name='HDPE Foreign', grade_spec='Film', unit_type='kg')
+        # The index is process-wide: rebuild it from this test's rows
+        get_search_index().load()
+
+    def search(self, q, **params):
+        response = self.client.get('/api/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def names(self, q, **params):
+        return [result['name'] for result in self.search(q, **params)]
+
+    def test_name_matches_rank_first(self):
+        results = self.search('raff')
+
+        self.assertEqual([(result['name'], result['matched_field']) for result in results],
+                         [('PP Raffia', 'name'), ('Woven Sack', 'grade_spec')])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.names('hdpe fi'), ['HDPE Film'])
+        self.assertEqual(self.names('hdpe'), ['HDPE Film', 'HDPE Pipe'])
+        self.assertEqual(self.names('fil', type='vendor'), ['Filmtech Polymers'])
+
+    def test_misspellings_find_the_word(self):
+        results = self.search('hydrabad')
+
+        self.assertEqual({result['name'] for result in results}, {vendor.name for vendor in self.vendors})
+        self.assertEqual({result['matched_field'] for result in results}, {'city'})
+        self.assertLess(results[0]['score'], self.search('hyderabad')[0]['score'])
+
+    def test_saves_and_deletes_refresh_the_index(self):
+        product = Product.objects.create(company=self.company, name='Nylon Yarn', grade_spec='Yarn', unit_type='kg')
+        self.assertEqual(self.names('nylon'), ['Nylon Yarn'])
+
+        product.name = 'Polyester Yarn'
+        product.save()
+        self.assertEqual(self.names('nylon'), [])
+        self.assertEqual(self.names('polyester'), ['Polyester Yarn'])
+
+        product.delete()
+        self.assertEqual(self.names('yarn'), [])
+
+    def test_invalid_queries(self):
+        for params in ({}, {'q': 'film', 'type': 'order'}, {'q': 'film', 'limit': 'all'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/search/', params).status_code, 400)
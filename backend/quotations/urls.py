@@ -2,9 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CompanyViewSet, VendorViewSet, ProductViewSet, ProductGroupViewSet, ProductCategoryViewSet,
-    QuotationViewSet, OrderRequestViewSet, ComparisonResultViewSet,
+    QuotationViewSet, OrderRequestViewSet, ComparisonResultViewSet, ProductBestQuoteViewSet,
     UserProfileViewSet, UserViewSet,
-    compare_vendors
+    compare_vendors, compare_vendors_batch, compare_sweep, compare_basket, compare_cache_stats,
+    compare_jobs, compare_job_detail, dashboard_stats_view, search
 )
 
 router = DefaultRouter()
@@ -16,10 +17,19 @@ router.register(r'products', ProductViewSet)
 router.register(r'quotations', QuotationViewSet)
 router.register(r'orders', OrderRequestViewSet)
 router.register(r'comparison-results', ComparisonResultViewSet)
+router.register(r'best-quotes', ProductBestQuoteViewSet)
 router.register(r'user-profiles', UserProfileViewSet)
 router.register(r'users', UserViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('compare/', compare_vendors, name='compare-vendors'),
+    path('compare/batch/', compare_vendors_batch, name='compare-vendors-batch'),
+    path('compare/sweep/', compare_sweep, name='compare-sweep'),
+    path('compare/basket/', compare_basket, name='compare-basket'),
+    path('compare/jobs/', compare_jobs, name='compare-jobs'),
+    path('compare/jobs/<int:job_id>/', compare_job_detail, name='compare-job-detail'),
+    path('compare/cache-stats/', compare_cache_stats, name='compare-cache-stats'),
+    path('dashboard/stats/', dashboard_stats_view, name='dashboard-stats'),
+    path('search/', search, name='search'),
 ]
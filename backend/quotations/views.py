@@ -1,39 +1,47 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view
+from django.conf import settings
+from rest_framework.decorators import action, api_view
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from django.db.models import Q
-from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q, Count
 from django.contrib.auth.models import User
-from .models import Company, Vendor, Product, Quotation, OrderRequest, ComparisonResult, UserProfile, ProductGroup, ProductCategory
+from .models import Company, Vendor, Product, Quotation, OrderRequest, ComparisonResult, UserProfile, ProductGroup, ProductCategory, CompareJob, QuotationPriceHistory, ProductBestQuote
 from .serializers import (
     CompanySerializer, VendorSerializer, ProductSerializer, 
     QuotationSerializer, OrderRequestSerializer, ComparisonResultSerializer,
-    CompareVendorsInputSerializer, UserProfileSerializer, UserWithProfileSerializer, ProductGroupSerializer, ProductCategorySerializer
+    CompareVendorsInputSerializer, CompareBatchInputSerializer, CompareSweepInputSerializer, BasketInputSerializer,
+    CompareJobInputSerializer, CompareJobSerializer, QuotationImportInputSerializer, QuotationPriceHistorySerializer,
+    ProductBestQuoteSerializer,
+    UserProfileSerializer, UserWithProfileSerializer, ProductGroupSerializer, ProductCategorySerializer
 )
-
-
-def get_default_company():
-    """Get or create the default company for single-tenant mode."""
-    company, created = Company.objects.get_or_create(
-        id=1,
-        defaults={
-            'name': 'My Company',
-            'industry_type': 'Manufacturing',
-            'address': 'Company Address',
-            'contact_email': 'contact@mycompany.com'
-        }
-    )
-    return company
-
-
-class CompanyViewSet(viewsets.ModelViewSet):
+from .comparison import rank_quotations_in_db, build_comparison_results, comparison_payload, compare_order_lines
+from .history import rank_quotations_as_of
+from .sweep import sweep_quantities
+from .basket import BasketOptimizer
+from .jobs import fail_stale_jobs, submit_compare_job, QueueFull
+from .cache import get_cached_ranking, set_cached_ranking, cache_stats
+from .dashboard import MAX_TOP_PRODUCTS, TOP_PRODUCTS, dashboard_stats
+from .search import SEARCH_FIELDS, get_search_index
+from .states import normalize_state
+from .pagination import TopKPaginationMixin, KeysetPaginationMixin
+from .tenancy import DEFAULT_COMPANY_ID
+from .fieldsets import SparseFieldsetMixin
+from .fastpath import FastListMixin, values_plan
+from .conditional import ConditionalGetMixin
+from .export import StreamingExportMixin
+from .bulk import import_quotations, write_items
+
+
+class CompanyViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     # Single-tenant mode: Allow updates to the default company but prevent create/delete
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
+    conditional_models = (Company,)
 
     def get_queryset(self):
         # Return only the default company for single-tenant mode
-        return Company.objects.filter(id=1)
+        return Company.objects.filter(id=DEFAULT_COMPANY_ID)
     
     def create(self, request, *args, **kwargs):
         # Prevent creation of new companies
@@ -50,115 +58,137 @@ class CompanyViewSet(viewsets.ModelViewSet):
         )
 
 
-class ProductGroupViewSet(viewsets.ModelViewSet):
+class ProductGroupViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = ProductGroup.objects.all()
     serializer_class = ProductGroupSerializer
+    conditional_models = (ProductGroup, Company, Product)
 
     def perform_create(self, serializer):
         # Auto-assign default company (force it to prevent override)
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def perform_update(self, serializer):
         # Force default company on update to prevent override
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def get_queryset(self):
         # Return all product groups for the default company
-        return ProductGroup.objects.filter(company=get_default_company())
+        # product_count is annotated so the serializer does not count per row; GROUP BY
+        # queries ignore Meta.ordering, so the order is repeated explicitly
+        return ProductGroup.objects.filter(
+            company_id=self.request.company_id
+        ).select_related('company').annotate(product_count=Count('products')).order_by('-created_at')
 
 
-class ProductCategoryViewSet(viewsets.ModelViewSet):
+class ProductCategoryViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = ProductCategory.objects.all()
     serializer_class = ProductCategorySerializer
+    conditional_models = (ProductCategory, Company, Product)
 
     def perform_create(self, serializer):
         # Auto-assign default company (force it to prevent override)
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def perform_update(self, serializer):
         # Force default company on update to prevent override
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def get_queryset(self):
         # Return all product categories for the default company
-        return ProductCategory.objects.filter(company=get_default_company())
+        # product_count is annotated so the serializer does not count per row; GROUP BY
+        # queries ignore Meta.ordering, so the order is repeated explicitly
+        return ProductCategory.objects.filter(
+            company_id=self.request.company_id
+        ).select_related('company').annotate(product_count=Count('products')).order_by('-created_at')
 
 
-class VendorViewSet(viewsets.ModelViewSet):
+class VendorViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
+    conditional_models = (Vendor, Company)
 
     def perform_create(self, serializer):
         # Auto-assign default company (force it to prevent override)
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def perform_update(self, serializer):
         # Force default company on update to prevent override
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def get_queryset(self):
         # Return all vendors for the default company
-        return Vendor.objects.filter(company=get_default_company())
+        return Vendor.objects.filter(company_id=self.request.company_id).select_related('company')
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    conditional_models = (Product, Company, ProductGroup, ProductCategory)
 
     def perform_create(self, serializer):
         # Auto-assign default company (force it to prevent override)
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def perform_update(self, serializer):
         # Force default company on update to prevent override
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def get_queryset(self):
         # Return all products for the default company
-        return Product.objects.filter(company=get_default_company())
+        return Product.objects.filter(company_id=self.request.company_id).select_related(
+            'company',
+            'product_group',
+            'product_category'
+        )
 
 
-class QuotationViewSet(viewsets.ModelViewSet):
+class QuotationViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetMixin, KeysetPaginationMixin, StreamingExportMixin,
+                       viewsets.ModelViewSet):
+    # ?pagination=cursor pages by (created_at, id) without OFFSET; ?page= still works
+    keyset_ordering = ('-created_at', '-id')
     queryset = Quotation.objects.all()
     serializer_class = QuotationSerializer
+    conditional_models = (Quotation, Vendor, Product, ProductGroup)
+    expand_conditional_models = {'vendor': (Company,), 'product': (Company, ProductCategory)}
+    # /export/ streams in index order (quotation_company_created_idx)
+    export_ordering = ('-created_at', '-id')
+    export_filename = 'quotations'
 
     def perform_create(self, serializer):
         # Validate vendor and product belong to default company
         vendor = serializer.validated_data.get('vendor')
         product = serializer.validated_data.get('product')
-        default_company = get_default_company()
+        company_id = self.request.company_id
         
-        if vendor and vendor.company != default_company:
+        if vendor and vendor.company_id != company_id:
             from rest_framework.exceptions import ValidationError
             raise ValidationError("Vendor must belong to the default company")
-        if product and product.company != default_company:
+        if product and product.company_id != company_id:
             from rest_framework.exceptions import ValidationError
             raise ValidationError("Product must belong to the default company")
         
-        serializer.save()
+        serializer.save(company=self.request.company)
 
     def perform_update(self, serializer):
         # Validate vendor and product belong to default company
         vendor = serializer.validated_data.get('vendor')
         product = serializer.validated_data.get('product')
-        default_company = get_default_company()
+        company_id = self.request.company_id
         
-        if vendor and vendor.company != default_company:
+        if vendor and vendor.company_id != company_id:
             from rest_framework.exceptions import ValidationError
             raise ValidationError("Vendor must belong to the default company")
-        if product and product.company != default_company:
+        if product and product.company_id != company_id:
             from rest_framework.exceptions import ValidationError
             raise ValidationError("Product must belong to the default company")
         
-        serializer.save()
+        serializer.save(company=self.request.company)
 
     def get_queryset(self):
-        # Filter by vendors of the default company
-        default_company = get_default_company()
-        
+        # Filter on the quotation's company so quotation_company_created_idx serves the listing
         # Optimize with select_related to prevent N+1 queries
         queryset = Quotation.objects.filter(
-            vendor__company=default_company
+            company_id=self.request.company_id
         ).select_related(
             'vendor',
             'product',
@@ -175,37 +205,161 @@ class QuotationViewSet(viewsets.ModelViewSet):
         if vendor_id:
             queryset = queryset.filter(vendor_id=vendor_id)
         if product_group_id:
-            queryset = queryset.filter(product__product_group_id=product_group_id)
+            queryset = queryset.filter(product_group_id=product_group_id)
         
         return queryset
 
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        Every recorded version of a quotation, oldest first, including a
+        final ``deleted`` row once it is removed (so deleted ids still answer).
+        """
+        rows = QuotationPriceHistory.objects.filter(
+            quotation_id=pk,
+            vendor__company_id=request.company_id
+        ).order_by('valid_from', 'id') if str(pk).isdigit() else QuotationPriceHistory.objects.none()
+        data = QuotationPriceHistorySerializer(rows, many=True).data
+        if not data:
+            return Response({"error": "No price history for this quotation"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """
+        Import a vendor price list (CSV, or XLSX with openpyxl installed).
+
+        Multipart fields: file, mode=create|upsert, atomic=true|false. Rows
+        name the vendor and product by id (vendor, product) or by name
+        (vendor_name, product_name), plus the quotation value columns; an
+        /export/ CSV can be imported as is. Returns per-row errors and
+        rows-per-second stats.
+        """
+        serializer = QuotationImportInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        report = import_quotations(
+            data['file'], data['file'].name, request.company_id,
+            mode=data['mode'], atomic=data['atomic']
+        )
+        if report['rolled_back'] or (report['failed'] and not report['created'] + report['updated']):
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Create (POST) or update (PATCH) many quotations in one transaction.
+
+        The body is a list: POST items look like single-quotation POSTs,
+        PATCH items carry an "id" plus the fields to change. Vendor and
+        product ownership is checked once per distinct id. Any invalid item
+        rejects the whole list unless ?partial=true, which writes the valid
+        items. Errors are reported by list index; "results" holds the
+        written quotations in input order.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a list of quotations"}, status=status.HTTP_400_BAD_REQUEST)
+        max_items = settings.QUOTATION_IMPORT['BULK_MAX_ITEMS']
+        if len(items) > max_items:
+            return Response(
+                {"error": f"At most {max_items} quotations per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        partial = request.query_params.get('partial', '').lower() in ('1', 'true', 'yes')
+        writer = write_items(
+            request.company_id, items,
+            mode='create' if request.method == 'POST' else 'update',
+            partial=partial
+        )
+        report = writer.report()
+        report['results'] = self._bulk_results(writer.written_ids)
+        if writer.failed and not writer.written_ids:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK)
+
+    def _bulk_results(self, ids):
+        # Read back with one values() query, in the shape of the list endpoint
+        queryset = self.get_queryset().filter(pk__in=ids)
+        plan = values_plan(self.get_serializer(), queryset)
+        if plan is None:
+            by_id = {quotation.pk: quotation for quotation in queryset}
+            rows = self.get_serializer([by_id[pk] for pk in ids if pk in by_id], many=True).data
+        else:
+            rows = plan.render(queryset.values(*plan.columns))
+        position = {pk: index for index, pk in enumerate(ids)}
+        return sorted(rows, key=lambda row: position[row['id']])
+
+
+class ProductBestQuoteViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    # Read-only: rows are derived from quotations (see bestquotes.py)
+    queryset = ProductBestQuote.objects.all()
+    serializer_class = ProductBestQuoteSerializer
+    conditional_models = (ProductBestQuote, Product, Vendor)
+
+    def get_queryset(self):
+        # One range scan of best_quote_company_idx; names come from primary-key joins
+        queryset = ProductBestQuote.objects.filter(
+            company_id=self.request.company_id
+        ).select_related('product', 'best_vendor', 'runner_up_vendor')
+
+        product_group_id = self.request.query_params.get('product_group_id', None)
+        if product_group_id:
+            queryset = queryset.filter(product_group_id=product_group_id)
+
+        return queryset
+
 
-class OrderRequestViewSet(viewsets.ModelViewSet):
+class OrderRequestViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = OrderRequest.objects.all()
     serializer_class = OrderRequestSerializer
+    conditional_models = (OrderRequest, Company, Product)
+    expand_conditional_models = {'product': (ProductGroup, ProductCategory)}
 
     def perform_create(self, serializer):
         # Force default company on create
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def perform_update(self, serializer):
         # Force default company on update to prevent override
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def get_queryset(self):
         # Return all order requests for the default company
-        return OrderRequest.objects.filter(company=get_default_company())
+        return OrderRequest.objects.filter(company_id=self.request.company_id).select_related('company', 'product')
 
 
-class ComparisonResultViewSet(viewsets.ReadOnlyModelViewSet):
+class ComparisonResultViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetMixin, TopKPaginationMixin, KeysetPaginationMixin,
+                              StreamingExportMixin, viewsets.ReadOnlyModelViewSet):
     # Read-only: ComparisonResults are only created by the compare_vendors function
+    # ?top_k=&offset= pages by rank like the compare endpoint, ?pagination=cursor
+    # pages by (rank, id) without OFFSET; ?page= still works
+    keyset_ordering = ('rank', 'id')
     queryset = ComparisonResult.objects.all()
     serializer_class = ComparisonResultSerializer
+    # Results are never edited; they go away when their order request, vendor
+    # or quotation is deleted
+    conditional_models = (OrderRequest, Vendor, Quotation)
+    expand_conditional_models = {
+        'order_request': (Product, Company),
+        'vendor': (Company,),
+        'quotation': (Product, ProductGroup),
+    }
+    last_modified_field = 'created_at'
+    # /export/ streams each order request's ranking in turn (comparison_order_rank_idx)
+    export_ordering = ('order_request_id', 'rank', 'id')
+    export_filename = 'comparison-results'
 
     def get_queryset(self):
-        # Filter by order requests of the default company
-        default_company = get_default_company()
-        queryset = ComparisonResult.objects.filter(order_request__company=default_company)
+        # Filter by order requests of the default company; a semi-join keeps the
+        # history read on comparison results alone (all fields are snapshots)
+        queryset = ComparisonResult.objects.filter(
+            order_request__in=OrderRequest.objects.filter(company_id=self.request.company_id)
+        )
         
         order_request_id = self.request.query_params.get('order_request_id', None)
         
@@ -215,22 +369,22 @@ class ComparisonResultViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = UserProfile.objects.select_related('user', 'company').all()
     serializer_class = UserProfileSerializer
+    conditional_models = (UserProfile, User, Company)
 
     def perform_create(self, serializer):
         # Force default company on create
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def perform_update(self, serializer):
         # Force default company on update to prevent override
-        serializer.save(company=get_default_company())
+        serializer.save(company=self.request.company)
 
     def get_queryset(self):
         # Return all user profiles for the default company
-        default_company = get_default_company()
-        queryset = UserProfile.objects.select_related('user', 'company').filter(company=default_company)
+        queryset = UserProfile.objects.select_related('user', 'company').filter(company_id=self.request.company_id)
         
         role = self.request.query_params.get('role', None)
         if role:
@@ -239,64 +393,17 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+class UserViewSet(FastListMixin, viewsets.ModelViewSet):
+    # profile.user is filled by the reverse one-to-one join, so full_name needs no extra query
+    queryset = User.objects.select_related('profile__company').all()
     serializer_class = UserWithProfileSerializer
 
 
-def normalize_state(state_str):
-    """
-    Normalize state name to handle abbreviations and formatting variations.
-    Returns lowercase normalized state name for comparison.
-    """
-    if not state_str:
-        return ''
-    
-    # Common state mappings (Indian states)
-    state_mappings = {
-        'ap': 'andhra pradesh',
-        'ar': 'arunachal pradesh',
-        'as': 'assam',
-        'br': 'bihar',
-        'cg': 'chhattisgarh',
-        'ga': 'goa',
-        'gj': 'gujarat',
-        'hr': 'haryana',
-        'hp': 'himachal pradesh',
-        'jk': 'jammu and kashmir',
-        'jh': 'jharkhand',
-        'ka': 'karnataka',
-        'kl': 'kerala',
-        'mp': 'madhya pradesh',
-        'mh': 'maharashtra',
-        'mn': 'manipur',
-        'ml': 'meghalaya',
-        'mz': 'mizoram',
-        'nl': 'nagaland',
-        'or': 'odisha',
-        'pb': 'punjab',
-        'rj': 'rajasthan',
-        'sk': 'sikkim',
-        'tn': 'tamil nadu',
-        'tg': 'telangana',
-        'tr': 'tripura',
-        'up': 'uttar pradesh',
-        'uk': 'uttarakhand',
-        'wb': 'west bengal',
-        'dl': 'delhi',
-        'dd': 'daman and diu',
-        'dn': 'dadra and nagar haveli',
-        'ld': 'lakshadweep',
-        'py': 'puducherry',
-    }
-    
-    normalized = state_str.strip().lower()
-    
-    # If it's an abbreviation, expand it
-    if normalized in state_mappings:
-        return state_mappings[normalized]
-    
-    return normalized
+def wants_persist(request, serializer):
+    """Compare results are persisted unless ``persist=false`` is sent in the body or query string."""
+    if 'persist' in serializer.initial_data:
+        return serializer.validated_data['persist']
+    return request.query_params.get('persist', 'true').lower() not in ('false', '0', 'no')
 
 
 @api_view(['POST'])
@@ -310,11 +417,23 @@ def compare_vendors(request):
         "order_qty": 100,
         "delivery_location": "Andhra Pradesh",
         "required_date": "2025-12-31",
-        "company_id": 1
+        "company_id": 1,
+        "persist": true,
+        "top_k": 10,
+        "offset": 0,
+        "as_of": "2025-06-30T00:00:00Z"
     }
     
     Output:
     List of vendors with comparison metrics sorted by best value
+    
+    With "persist": false (or ?persist=false) the ranking is returned as a
+    preview and nothing is written to the database. "top_k" and "offset"
+    return a slice of the ranking; "total_vendors" is the full ranked count.
+    
+    "as_of" ranks the quotations in effect at that moment, from the price
+    history, with vendors' current locations. It is always a preview and
+    bypasses the compare cache.
     """
     
     serializer = CompareVendorsInputSerializer(data=request.data)
@@ -326,119 +445,420 @@ def compare_vendors(request):
     order_qty = data['order_qty']
     delivery_location = data['delivery_location']
     required_date = data.get('required_date', None)
+    as_of = data.get('as_of')
+    # Persisted results reference live quotations, which an as-of ranking may predate
+    persist = wants_persist(request, serializer) and as_of is None
     
     # Always use default company for single-tenant mode (ignore company_id input)
-    company = get_default_company()
+    company_id = request.company_id
     
     try:
-        product = Product.objects.get(id=product_id, company=company)
+        product = Product.objects.get(id=product_id, company_id=company_id)
     except Product.DoesNotExist:
         return Response(
             {"error": "Product not found or does not belong to your company"}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Filter quotations to only include those from vendors belonging to the default company
-    quotations = Quotation.objects.filter(
-        product=product,
-        vendor__company=company
-    ).select_related('vendor')
-    
-    if not quotations.exists():
-        return Response(
-            {"error": "No quotations found for this product from your company's vendors"}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
-    order_request = OrderRequest.objects.create(
-        company=company,
-        product=product,
-        order_qty=order_qty,
-        delivery_location=delivery_location,
-        required_date=required_date or '2025-12-31'
-    )
+    # The full ranking is computed when it has to be persisted; otherwise only
+    # the requested slice is ranked (LIMIT/OFFSET on the ranking query)
+    top_k = data.get('top_k')
+    offset = data.get('offset', 0)
+    persist_full_ranking = persist and not settings.COMPARE_PERSIST_SLICE_ONLY
+    rank_top_k, rank_offset = (None, 0) if persist_full_ranking else (top_k, offset)
     
-    comparison_results = []
+    # A cache hit skips the quotation scan and ranking entirely
+    delivery_state = normalize_state(delivery_location)
+    ranking = None
+    if as_of is None:
+        ranking = get_cached_ranking(product.id, order_qty, delivery_state, rank_top_k, rank_offset)
+    cached = ranking is not None
     
-    for quotation in quotations:
-        # Skip quotations that don't have complete data for comparison
-        if quotation.delivery_price is None or quotation.lead_time_days is None:
-            continue
-        
-        base_delivery_price = quotation.delivery_price
+    if as_of is not None:
+        ranking = rank_quotations_as_of(
+            product.id, company_id, as_of, order_qty, delivery_location, rank_top_k, rank_offset
+        )
+        if not ranking[1]:
+            return Response(
+                {"error": "No quotations with complete data were in effect at as_of"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+    elif not cached:
+        # Filter quotations to only include those from vendors belonging to the default company
+        quotations = Quotation.objects.filter(
+            product=product,
+            vendor__company_id=company_id
+        ).select_related('vendor')
         
-        # Apply interstate shipping surcharge if vendor is in different state
-        vendor_state_normalized = normalize_state(quotation.vendor.state)
-        delivery_state_normalized = normalize_state(delivery_location)
+        # Costs, surcharge and rank are computed by the database
+        ranking = rank_quotations_in_db(quotations, order_qty, delivery_location, rank_top_k, rank_offset)
         
-        # Check if it's interstate delivery (vendor state != delivery state)
-        if vendor_state_normalized != delivery_state_normalized:
-            # Add 20% interstate shipping surcharge
-            adjusted_delivery_price = base_delivery_price * Decimal('1.20')
-            is_interstate = True
-        else:
-            # Local delivery - use base price
-            adjusted_delivery_price = base_delivery_price
-            is_interstate = False
+        if not ranking[1] and not quotations.exists():
+            return Response(
+                {"error": "No quotations found for this product from your company's vendors"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        delivery_per_unit = adjusted_delivery_price / Decimal(order_qty)
-        total_cost_per_unit = quotation.product_price + delivery_per_unit
-        total_order_cost = total_cost_per_unit * Decimal(order_qty)
+        # Check if any quotations have complete data for comparison
+        if not ranking[1]:
+            return Response(
+                {"error": "No quotations with complete data (delivery price and lead time) found for comparison"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        comparison_results.append({
-            'quotation': quotation,
-            'total_cost_per_unit': total_cost_per_unit,
-            'total_order_cost': total_order_cost,
-            'lead_time_days': quotation.lead_time_days,
-            'is_interstate': is_interstate,
-            'base_delivery_price': base_delivery_price,
-            'adjusted_delivery_price': adjusted_delivery_price
-        })
-    
-    # Check if any quotations have complete data for comparison
-    if not comparison_results:
+        set_cached_ranking(product.id, order_qty, delivery_state, rank_top_k, rank_offset, ranking)
+    
+    comparison_results, total_ranked = ranking
+    order_request = None
+    comparisons = [None] * len(comparison_results)
+    
+    if persist:
+        # One atomic block: the order request plus a single bulk insert for all results
+        with transaction.atomic():
+            order_request = OrderRequest.objects.create(
+                company_id=company_id,
+                product=product,
+                order_qty=order_qty,
+                delivery_location=delivery_location,
+                required_date=required_date or '2025-12-31'
+            )
+            comparisons = ComparisonResult.objects.bulk_create(
+                build_comparison_results(order_request, comparison_results)
+            )
+    
+    response_rows = list(zip(comparison_results, comparisons))
+    if persist_full_ranking:
+        end = offset + top_k if top_k is not None else None
+        response_rows = response_rows[offset:end]
+    
+    response_data = [
+        comparison_payload(result, comparison)
+        for result, comparison in response_rows
+    ]
+    
+    return Response({
+        'order_request_id': order_request.id if order_request else None,
+        'persisted': persist,
+        'cached': cached,
+        'product_name': product.name,
+        'order_qty': order_qty,
+        'delivery_location': delivery_location,
+        'total_vendors': total_ranked,
+        'top_k': top_k,
+        'offset': offset,
+        'as_of': as_of,
+        'comparisons': response_data
+    })
+
+
+@api_view(['POST'])
+def compare_vendors_batch(request):
+    """
+    Compare vendors for many order lines in a single request.
+    
+    Input:
+    {
+        "lines": [
+            {"product_id": 1, "order_qty": 100, "delivery_location": "Andhra Pradesh", "required_date": "2025-12-31"},
+            {"product_id": 2, "order_qty": 250, "delivery_location": "Telangana"}
+        ],
+        "persist": true
+    }
+    
+    All quotations for the requested products are loaded in one query and every
+    order request and comparison result is written with bulk inserts inside a
+    single transaction. Lines that cannot be compared are reported with an error
+    instead of failing the whole batch. "persist": false returns a preview only.
+    """
+    
+    payload = {'lines': request.data} if isinstance(request.data, list) else request.data
+    serializer = CompareBatchInputSerializer(data=payload)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    lines = serializer.validated_data['lines']
+    persist = wants_persist(request, serializer)
+    
+    # Always use default company for single-tenant mode
+    company = request.company
+    
+    result = compare_order_lines(lines, company, persist)
+    result['persisted'] = persist
+    return Response(result)
+
+
+@api_view(['POST'])
+def compare_sweep(request):
+    """
+    Rank vendors for one product across many order quantities.
+    
+    Input:
+    {
+        "product_id": 1,
+        "delivery_location": "Telangana",
+        "quantities": [10, 50, 100, 500],
+        "top_k": 5
+    }
+    or a range with "qty_from", "qty_to" and "qty_step" instead of "quantities".
+    
+    Every quotation x quantity pair is evaluated in one vectorized pass. The
+    response lists the ranked vendors per quantity and the break points where
+    the winning quotation changes. Nothing is persisted.
+    """
+    
+    serializer = CompareSweepInputSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    company_id = request.company_id
+    
+    try:
+        product = Product.objects.get(id=data['product_id'], company_id=company_id)
+    except Product.DoesNotExist:
         return Response(
-            {"error": "No quotations with complete data (delivery price and lead time) found for comparison"}, 
+            {"error": "Product not found or does not belong to your company"}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Sort by: 1st Total Landing Price, 2nd Landing Price per kg, 3rd Lead Time
-    comparison_results.sort(key=lambda x: (
-        float(x['total_order_cost']),      # 1st priority: Total Landing Price (lowest wins)
-        float(x['total_cost_per_unit']),   # 2nd priority: Landing Price per kg (lowest wins)
-        x['lead_time_days']                # 3rd priority: Lead Time (shortest wins)
+    quotations = list(Quotation.objects.filter(
+        product=product,
+        vendor__company_id=company_id,
+        delivery_price__isnull=False,
+        lead_time_days__isnull=False
+    ).order_by('-created_at', '-id').values(
+        'id', 'vendor_id', 'vendor__name', 'vendor__state_normalized',
+        'product_price', 'delivery_price', 'lead_time_days'
     ))
     
-    saved_results = []
-    response_data = []
-    
-    for rank, result in enumerate(comparison_results, start=1):
-        # Calculate score for historical tracking (lower is better)
-        # Priority: Total Landing Price > Landing Price per kg > Lead Time
-        score = float(result['total_order_cost']) + float(result['total_cost_per_unit']) + (result['lead_time_days'] * 0.01)
-        
-        comparison = ComparisonResult.objects.create(
-            order_request=order_request,
-            vendor=result['quotation'].vendor,
-            quotation=result['quotation'],
-            total_cost_per_unit=result['total_cost_per_unit'],
-            total_order_cost=result['total_order_cost'],
-            score=score,
-            rank=rank
+    if not quotations:
+        return Response(
+            {"error": "No quotations with complete data (delivery price and lead time) found for comparison"}, 
+            status=status.HTTP_404_NOT_FOUND
         )
-        saved_results.append(comparison)
-        
-        # Add interstate flag to response
-        comparison_dict = ComparisonResultSerializer(comparison).data
-        comparison_dict['is_interstate'] = result['is_interstate']
-        comparison_dict['base_delivery_price'] = str(result['base_delivery_price'])
-        comparison_dict['adjusted_delivery_price'] = str(result['adjusted_delivery_price'])
-        response_data.append(comparison_dict)
+    
+    curve, break_points = sweep_quantities(
+        quotations, data['quantities'], data['delivery_location'], data['top_k']
+    )
     
     return Response({
-        'order_request_id': order_request.id,
+        'product_id': product.id,
         'product_name': product.name,
-        'order_qty': order_qty,
-        'delivery_location': delivery_location,
-        'comparisons': response_data
+        'delivery_location': data['delivery_location'],
+        'total_vendors': len(quotations),
+        'break_points': break_points,
+        'curve': curve
     })
+
+
+@api_view(['POST'])
+def compare_basket(request):
+    """
+    Find the cheapest assignment of a basket of products to vendors.
+    
+    Input:
+    {
+        "lines": [{"product_id": 1, "order_qty": 100}, {"product_id": 2, "order_qty": 40}],
+        "delivery_location": "Telangana",
+        "time_limit_ms": 2000
+    }
+    
+    Lines bought from the same vendor share one freight charge (the largest
+    interstate-adjusted delivery price among them). The response reports the
+    assignment, per-vendor shipments, solve time and the savings over ranking
+    each line on its own. Nothing is persisted.
+    """
+    
+    serializer = BasketInputSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    company_id = request.company_id
+    product_ids = {line['product_id'] for line in data['lines']}
+    
+    quotations = list(Quotation.objects.filter(
+        product_id__in=product_ids,
+        product__company_id=company_id,
+        vendor__company_id=company_id,
+        delivery_price__isnull=False,
+        lead_time_days__isnull=False
+    ).order_by('-created_at', '-id').values(
+        'id', 'product_id', 'vendor_id', 'vendor__name', 'vendor__state_normalized',
+        'product_price', 'delivery_price', 'lead_time_days'
+    ))
+    
+    optimizer = BasketOptimizer(
+        data['lines'], quotations, data['delivery_location'], time_limit=data['time_limit_ms'] / 1000
+    )
+    result = optimizer.solve()
+    
+    if not result['lines']:
+        return Response(
+            {"error": "No quotations with complete data (delivery price and lead time) found for any basket line"}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    result['delivery_location'] = data['delivery_location']
+    return Response(result)
+
+
+@api_view(['POST'])
+def compare_jobs(request):
+    """
+    Submit a background compare job and return its id immediately.
+    
+    Input: the same "lines" as /api/compare/batch/, or a whole product group:
+    {
+        "product_group_id": 3,
+        "order_qty": 100,
+        "delivery_location": "Telangana",
+        "required_date": "2025-12-31"
+    }
+    
+    Poll /api/compare/jobs/<id>/ for progress and results.
+    """
+    
+    serializer = CompareJobInputSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    company = request.company
+    
+    if 'lines' in data:
+        lines = data['lines']
+    else:
+        product_ids = Product.objects.filter(
+            company=company,
+            product_group_id=data['product_group_id']
+        ).values_list('id', flat=True)
+        lines = [
+            {
+                'product_id': product_id,
+                'order_qty': data['order_qty'],
+                'delivery_location': data['delivery_location'],
+                'required_date': data.get('required_date')
+            }
+            for product_id in product_ids
+        ]
+        if not lines:
+            return Response(
+                {"error": "No products found in this product group"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    # Store JSON-friendly lines on the job; dates go back in as ISO strings
+    job_lines = [
+        {**line, 'required_date': line['required_date'].isoformat() if line.get('required_date') else None}
+        for line in lines
+    ]
+    job = CompareJob.objects.create(company=company, lines=job_lines, total_lines=len(job_lines))
+    
+    try:
+        submit_compare_job(job)
+    except QueueFull:
+        job.status = 'failed'
+        job.error = "Compare job queue is full"
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return Response(
+            {"error": "Compare job queue is full, try again later", "job_id": job.id}, 
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    
+    return Response(CompareJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def compare_job_detail(request, job_id):
+    """
+    Progress of a background compare job. Once completed, the ranked results
+    stored against each OrderRequest are included (skip with ?results=false).
+    """
+    
+    company_id = request.company_id
+    # Jobs lost with a restarted process would otherwise show progress forever
+    fail_stale_jobs()
+    try:
+        job = CompareJob.objects.get(id=job_id, company_id=company_id)
+    except CompareJob.DoesNotExist:
+        return Response({"error": "Compare job not found"}, status=status.HTTP_404_NOT_FOUND)
+    
+    data = CompareJobSerializer(job).data
+    
+    include_results = request.query_params.get('results', 'true').lower() not in ('false', '0', 'no')
+    if job.status == 'completed' and include_results:
+        order_requests = OrderRequest.objects.filter(job=job).select_related('product').prefetch_related(
+            'comparison_results'
+        ).order_by('id')
+        data['results'] = [
+            {
+                'order_request_id': order_request.id,
+                'product_id': order_request.product_id,
+                'product_name': order_request.product.name,
+                'order_qty': order_request.order_qty,
+                'delivery_location': order_request.delivery_location,
+                'comparisons': ComparisonResultSerializer(order_request.comparison_results.all(), many=True).data
+            }
+            for order_request in order_requests
+        ]
+    
+    return Response(data)
+
+
+@api_view(['GET'])
+def compare_cache_stats(request):
+    """Hit/miss counters for the compare result cache in this process."""
+    return Response(cache_stats())
+
+
+@api_view(['GET'])
+def search(request):
+    """
+    Typeahead over products (name, grade_spec, category) and vendors (name,
+    city, state).
+
+    ?q= is the text typed so far; ?type=product|vendor narrows the kinds and
+    ?limit= (default 10, at most 50) caps the results. Prefix matches rank
+    first, then fuzzy (trigram) matches; each result names the field it
+    matched in.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    kind = request.query_params.get('type')
+    if kind is not None and kind not in SEARCH_FIELDS:
+        return Response(
+            {"error": f"type must be one of: {', '.join(SEARCH_FIELDS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = get_search_index().search(
+        query, company_id=request.company_id, kinds=(kind,) if kind else None, limit=limit
+    )
+    return Response({'query': query, 'backend': settings.SEARCH_BACKEND, 'results': results})
+
+
+@api_view(['GET'])
+def dashboard_stats_view(request):
+    """
+    Every aggregate the dashboard shows (entity counts, vendors per city,
+    quotations per month, group and category, landing prices per product and
+    recent compare activity), cached until the underlying data changes.
+
+    ?top_products= (default 50, at most 500) sets how many of the most quoted
+    products landing_price_by_product lists; products_quoted and
+    landing_price_by_product_truncated tell whether any were left out.
+    """
+    try:
+        top_products = min(max(int(request.query_params.get('top_products', TOP_PRODUCTS)), 1), MAX_TOP_PRODUCTS)
+    except ValueError:
+        return Response({"error": "top_products must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    stats, cached = dashboard_stats(request.company_id, top_products)
+    return Response({**stats, 'cached': cached})
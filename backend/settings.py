@@ -44,12 +44,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so session/auth queries count towards the request's budget
+    'backend.quotations.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backend.quotations.tenancy.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -93,6 +96,96 @@ else:
         }
     }
 
+USING_POSTGRES = DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+
+# /api/search/ backend: 'memory' (in-process prefix/trigram index) or 'postgres'
+# (pg_trgm GIN indexes); PostgreSQL databases use pg_trgm unless overridden
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'postgres' if USING_POSTGRES else 'memory')
+
+if USING_POSTGRES:
+    # Registers the trigram lookups used by the postgres search backend
+    INSTALLED_APPS.append('django.contrib.postgres')
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# The version counters behind ETags, compare-cache invalidation and the search
+# index live in these caches. LocMem is per process: set REDIS_URL (needs
+# `pip install redis`) whenever more than one process serves the API, or
+# other processes keep serving data from before a write.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        # Ranked compare results, keyed by product, quantity, destination and quotation version
+        'compare': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'compare',
+            'TIMEOUT': None,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        # Ranked compare results, keyed by product, quantity, destination and quotation version
+        'compare': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'compare-results',
+            'TIMEOUT': None,
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('COMPARE_CACHE_MAX_ENTRIES', 2000)),
+            },
+        },
+    }
+
+# Seconds a cached compare ranking stays valid (quotation changes invalidate it sooner)
+COMPARE_CACHE_TIMEOUT = int(os.environ.get('COMPARE_CACHE_TIMEOUT', 3600))
+
+# When a compare asks for top_k/offset, persist only that slice instead of the full ranking
+COMPARE_PERSIST_SLICE_ONLY = os.environ.get('COMPARE_PERSIST_SLICE_ONLY', 'False') == 'True'
+
+# In-process background compare jobs (no external broker)
+COMPARE_JOBS = {
+    'MAX_WORKERS': int(os.environ.get('COMPARE_JOB_WORKERS', 2)),
+    'MAX_QUEUE_DEPTH': int(os.environ.get('COMPARE_JOB_QUEUE_DEPTH', 20)),
+    'CHUNK_SIZE': int(os.environ.get('COMPARE_JOB_CHUNK_SIZE', 50)),
+    # Seconds without progress after which a queued/running job is taken to
+    # have died with its process and is marked failed
+    'STALE_AFTER': int(os.environ.get('COMPARE_JOB_STALE_AFTER', 900)),
+}
+
+# Upper bound on how long /api/dashboard/stats/ serves cached aggregates; writes
+# invalidate them immediately, this only ages the date windows
+DASHBOARD_STATS_TIMEOUT = int(os.environ.get('DASHBOARD_STATS_TIMEOUT', 300))
+
+# Rows fetched per database round trip by the streaming CSV/NDJSON exports
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# CSV/XLSX quotation imports and /api/quotations/bulk/: rows validated and
+# written per batch, the most row errors listed in the report, and the largest
+# list a bulk request may send
+QUOTATION_IMPORT = {
+    'BATCH_SIZE': int(os.environ.get('QUOTATION_IMPORT_BATCH_SIZE', 1000)),
+    'MAX_ERRORS': int(os.environ.get('QUOTATION_IMPORT_MAX_ERRORS', 1000)),
+    'BULK_MAX_ITEMS': int(os.environ.get('QUOTATION_BULK_MAX_ITEMS', 5000)),
+}
+
+# Per-request query instrumentation: X-Query-Count / X-Query-Time-Ms headers,
+# and a warning for requests over either budget
+QUERY_BUDGET = {
+    'ENABLED': os.environ.get('QUERY_BUDGET_ENABLED', 'True') == 'True',
+    'MAX_QUERIES': int(os.environ.get('QUERY_BUDGET_MAX_QUERIES', 20)),
+    'MAX_SQL_MS': int(os.environ.get('QUERY_BUDGET_MAX_SQL_MS', 500)),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -137,6 +230,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_EXPOSE_HEADERS = ['X-Query-Count', 'X-Query-Time-Ms', 'ETag', 'Last-Modified']
 
 # REST Framework Settings
 REST_FRAMEWORK = {
@@ -74,6 +74,11 @@ import { LoadingService } from '../services/loading.service';
           <div class="value">{{ stats.quotations }}</div>
           <button mat-button color="primary" routerLink="/quotations">View All</button>
         </div>
+        <div class="stat-card">
+          <h3>Compares (Last {{ stats.compareDays }} Days)</h3>
+          <div class="value">{{ stats.compares }}</div>
+          <button mat-button color="primary" routerLink="/compare">Compare</button>
+        </div>
       </div>
 
       <div class="charts-grid">
@@ -102,6 +107,19 @@ import { LoadingService } from '../services/loading.service';
             </canvas>
           </mat-card-content>
         </mat-card>
+
+        <mat-card class="chart-card">
+          <mat-card-header>
+            <mat-card-title>Quotations by Product Group</mat-card-title>
+          </mat-card-header>
+          <mat-card-content>
+            <canvas baseChart
+              [data]="groupChartData"
+              [options]="groupChartOptions"
+              [type]="'bar'">
+            </canvas>
+          </mat-card-content>
+        </mat-card>
       </div>
     </div>
   `,
@@ -170,7 +188,9 @@ export class DashboardComponent implements OnInit {
     companies: 0,
     vendors: 0,
     products: 0,
-    quotations: 0
+    quotations: 0,
+    compares: 0,
+    compareDays: 14
   };
 
   barChartData: ChartConfiguration['data'] = {
@@ -212,115 +232,92 @@ export class DashboardComponent implements OnInit {
     }
   };
 
+  groupChartData: ChartConfiguration['data'] = {
+    labels: [],
+    datasets: [
+      { data: [], label: 'Quotations', backgroundColor: '#4caf50' }
+    ]
+  };
+
+  groupChartOptions: ChartConfiguration['options'] = {
+    responsive: true,
+    maintainAspectRatio: true,
+    indexAxis: 'y',
+    plugins: {
+      legend: { display: false }
+    },
+    scales: {
+      x: { beginAtZero: true }
+    }
+  };
+
   constructor(
     private apiService: ApiService,
     private loadingService: LoadingService
   ) {}
 
   ngOnInit() {
-    this.loadStats();
-    this.loadVendorDistribution();
-    this.loadRecentActivity();
-  }
-
-  loadStats() {
-    this.loadingService.show();
-    this.apiService.getCompanies().subscribe({
-      next: (data) => {
-        this.stats.companies = data.count || data.results?.length || data.length || 0;
-        this.loadingService.hide();
-      },
-      error: (err: any) => {
-        console.error('Error loading companies:', err);
-        this.loadingService.hide();
-      }
-    });
-    
-    this.apiService.getVendors().subscribe({
-      next: (data) => this.stats.vendors = data.count || data.results?.length || data.length || 0
-    });
-    
-    this.apiService.getProducts().subscribe({
-      next: (data) => this.stats.products = data.count || data.results?.length || data.length || 0
-    });
-    
-    this.apiService.getQuotations().subscribe({
-      next: (data) => this.stats.quotations = data.count || data.results?.length || data.length || 0
-    });
+    this.loadDashboard();
   }
 
-  loadVendorDistribution() {
+  // Every number comes from one server-side aggregate request
+  loadDashboard() {
     this.loadingService.show();
-    this.apiService.getVendors().subscribe({
+    this.apiService.getDashboardStats().subscribe({
       next: (data) => {
-        const vendors = data.results || data;
-        
-        // Group vendors by city
-        const cityCount: { [key: string]: number } = {};
-        vendors.forEach((vendor: any) => {
-          const city = vendor.city || 'Unknown';
-          cityCount[city] = (cityCount[city] || 0) + 1;
-        });
-
-        // Convert to chart data
-        const cities = Object.keys(cityCount);
-        const counts = Object.values(cityCount);
-
-        this.pieChartData = {
-          labels: cities,
-          datasets: [{
-            data: counts,
-            backgroundColor: ['#3f51b5', '#ff4081', '#4caf50', '#ff9800', '#9c27b0', '#00bcd4', '#ffc107', '#e91e63']
-          }]
+        this.stats = {
+          companies: data.counts.companies,
+          vendors: data.counts.vendors,
+          products: data.counts.products,
+          quotations: data.counts.quotations,
+          compares: data.compare_activity.order_requests,
+          compareDays: data.compare_activity.days
         };
+        this.setVendorDistribution(data.vendors_by_city);
+        this.setRecentActivity(data.quotations_by_month);
+        this.setGroupBreakdown(data.quotations_by_group);
         this.loadingService.hide();
       },
       error: (err: any) => {
-        console.error('Error loading vendor distribution:', err);
+        console.error('Error loading dashboard stats:', err);
         this.loadingService.hide();
       }
     });
   }
 
-  loadRecentActivity() {
-    this.loadingService.show();
-    this.apiService.getQuotations().subscribe({
-      next: (data) => {
-        const quotations = data.results || data;
-        
-        // Group quotations by month
-        const monthCount: { [key: string]: number } = {};
-        const monthNames = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
-        
-        quotations.forEach((quotation: any) => {
-          if (quotation.created_at) {
-            const date = new Date(quotation.created_at);
-            const monthYear = `${monthNames[date.getMonth()]} ${date.getFullYear()}`;
-            monthCount[monthYear] = (monthCount[monthYear] || 0) + 1;
-          }
-        });
+  setVendorDistribution(cities: { city: string | null, count: number }[]) {
+    this.pieChartData = {
+      labels: cities.map(row => row.city || 'Unknown'),
+      datasets: [{
+        data: cities.map(row => row.count),
+        backgroundColor: ['#3f51b5', '#ff4081', '#4caf50', '#ff9800', '#9c27b0', '#00bcd4', '#ffc107', '#e91e63']
+      }]
+    };
+  }
 
-        // Sort by date and get last 6 months
-        const sortedMonths = Object.keys(monthCount).sort((a, b) => {
-          const dateA = new Date(a);
-          const dateB = new Date(b);
-          return dateA.getTime() - dateB.getTime();
-        }).slice(-6);
+  setRecentActivity(months: { month: string, count: number }[]) {
+    // "2025-06" -> "Jun 2025"
+    const monthNames = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+    const labels = months.map(row => {
+      const [year, month] = row.month.split('-');
+      return `${monthNames[Number(month) - 1]} ${year}`;
+    });
 
-        const counts = sortedMonths.map(month => monthCount[month]);
+    this.barChartData = {
+      labels,
+      datasets: [
+        { data: months.map(row => row.count), label: 'Quotations', backgroundColor: '#3f51b5' }
+      ]
+    };
+  }
 
-        this.barChartData = {
-          labels: sortedMonths,
-          datasets: [
-            { data: counts, label: 'Quotations', backgroundColor: '#3f51b5' }
-          ]
-        };
-        this.loadingService.hide();
-      },
-      error: (err: any) => {
-        console.error('Error loading recent activity:', err);
-        this.loadingService.hide();
-      }
-    });
+  setGroupBreakdown(groups: { name: string | null, count: number }[]) {
+    const top = groups.slice(0, 10);
+    this.groupChartData = {
+      labels: top.map(row => row.name || 'Ungrouped'),
+      datasets: [
+        { data: top.map(row => row.count), label: 'Quotations', backgroundColor: '#4caf50' }
+      ]
+    };
   }
 }
@@ -35,6 +35,10 @@ export class ApiService {
     return this.http.get(`${this.apiUrl}/quotations/${queryString}`);
   }
 
+  getDashboardStats(): Observable<any> {
+    return this.http.get(`${this.apiUrl}/dashboard/stats/`);
+  }
+
   compareVendors(data: any): Observable<any> {
     return this.http.post(`${this.apiUrl}/compare/`, data);
   }